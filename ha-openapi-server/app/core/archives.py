@@ -0,0 +1,482 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.clients import FileManager, file_mgr
+from app.core.config import settings
+from app.core.file_index import FileIndex, file_index
+from app.core.file_walker import FileWalker, WalkSpec, file_walker
+
+logger = logging.getLogger(__name__)
+
+# zstd support is optional (pip install zstandard)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+_ZSTD_ERRORS = (zstandard.ZstdError,) if zstandard else ()
+
+# Bytes per hand-off between the archiving thread and the event loop, and hand-offs buffered in between
+CHUNK_BYTES = 64 * 1024
+QUEUE_CHUNKS = 16
+# Per-member details kept in an import report (counts are always exact)
+MAX_REPORTED_MEMBERS = 200
+# Written at the end of an export when files could not be read
+ERRORS_MEMBER = ".archive_errors.json"
+
+ZIP_MAGIC = b"PK\x03\x04"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+FORMATS = {"tar", "zip"}
+COMPRESSIONS = {"gzip", "zstd", "none"}
+
+
+class ArchiveError(ValueError):
+    """An archive request or upload that cannot be processed."""
+
+
+class ArchiveTooLarge(ArchiveError):
+    """Upload or extracted content over ARCHIVE_IMPORT_MAX_BYTES."""
+
+
+def archive_filename(fmt: str, compression: str) -> str:
+    suffix = {"gzip": ".gz", "zstd": ".zst", "none": ""}[compression]
+    return f"config.{fmt}{suffix}" if fmt == "tar" else "config.zip"
+
+
+def check_format(fmt: str, compression: str):
+    """Raise ArchiveError for unknown or unavailable format/compression combinations."""
+    if fmt not in FORMATS:
+        raise ArchiveError(f"Unknown archive format {fmt!r} (use tar or zip)")
+    if compression not in COMPRESSIONS:
+        raise ArchiveError(f"Unknown compression {compression!r} (use gzip, zstd or none)")
+    if compression == "zstd":
+        if fmt == "zip":
+            raise ArchiveError("zstd is only supported for tar archives (zip uses gzip/deflate or none)")
+        if zstandard is None:
+            raise ArchiveError("zstd compression requires the zstandard package")
+
+
+class _QueueSink(io.RawIOBase):
+    """Write-only stream that hands CHUNK_BYTES blocks to `put` (not seekable; zipfile copes)."""
+
+    def __init__(self, put: Callable[[bytes], None]):
+        super().__init__()
+        self._put = put
+        self._buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        if len(self._buf) >= CHUNK_BYTES:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+        return len(b)
+
+    def close(self):
+        if not self.closed and self._buf:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+        super().close()
+
+
+class _QueueSource(io.RawIOBase):
+    """Read-only stream over the chunks `get` returns (b"" = end of input)."""
+
+    def __init__(self, get: Callable[[], bytes]):
+        super().__init__()
+        self._get = get
+        self._buf = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf and not self._eof:
+            self._buf = self._get()
+            self._eof = not self._buf
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+class ArchiveService:
+    """Streams tar/zip archives of /config subtrees out of and into the config directory.
+
+    Export walks the selected paths with the FileWalker (same include/exclude
+    globs as search_files) and writes the archive on a worker thread into a
+    bounded queue the response drains, so memory stays at a few chunks
+    whatever the size of the tree and a slow client throttles the disk reads.
+    Import runs the other way: request body chunks feed a streaming tarfile
+    reader on a worker thread (zip needs its central directory, so zip
+    uploads are spooled to a temp file first). Every member path goes through
+    FileManager.ha_resolve_path; links, devices and paths outside /config are
+    skipped and reported, and files are written atomically.
+    """
+
+    def __init__(self, files: FileManager, walker: FileWalker, index: FileIndex, workers: int, max_import_bytes: int):
+        self.files = files
+        self.walker = walker
+        self.index = index
+        self.max_import_bytes = max_import_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive")
+
+    # --- export -------------------------------------------------------------
+
+    def export(self, roots: List[Path], fmt: str, compression: str,
+               include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        """Archive bytes for `roots` (resolved files or directories under /config), streamed."""
+        check_format(fmt, compression)
+
+        def job(put: Callable[[bytes], None], cancel: threading.Event):
+            sink = _QueueSink(put)
+            self._write_archive(sink, roots, fmt, compression, include, exclude, cancel)
+            sink.close()
+
+        return self._stream(job)
+
+    def _members(self, roots: List[Path], include: Optional[List[str]], exclude: Optional[List[str]],
+                 cancel: threading.Event) -> Iterator[Tuple[str, Any]]:
+        """("file", relpath) / ("error", {...}) for every file under `roots`, each path once."""
+        seen = set()
+        for root in roots:
+            if root.is_file():
+                entries = iter([("match", os.path.relpath(root, self.files.base_path))])
+            else:
+                spec = WalkSpec(root=root, accept=lambda name: True, include=include, exclude=exclude)
+                entries = self.walker.entries(spec, cancel)
+            for kind, value in entries:
+                if kind == "error":
+                    yield kind, value
+                elif value not in seen:
+                    seen.add(value)
+                    yield "file", value
+
+    def _write_archive(self, out, roots: List[Path], fmt: str, compression: str,
+                       include: Optional[List[str]], exclude: Optional[List[str]], cancel: threading.Event):
+        errors: List[Dict[str, str]] = []
+        error_count = 0
+        compressor = None
+        if compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=3).stream_writer(out, closefd=False)
+            out = compressor
+
+        if fmt == "tar":
+            archive = tarfile.open(fileobj=out, mode="w|gz" if compression == "gzip" else "w|",
+                                   dereference=True, format=tarfile.PAX_FORMAT)
+            add = lambda path, arcname: archive.add(path, arcname, recursive=False)
+            add_bytes = lambda arcname, data: archive.addfile(_tar_info(arcname, len(data)), io.BytesIO(data))
+        else:
+            method = zipfile.ZIP_DEFLATED if compression == "gzip" else zipfile.ZIP_STORED
+            archive = zipfile.ZipFile(out, "w", compression=method, allowZip64=True)
+            add = archive.write
+            add_bytes = archive.writestr
+
+        base = os.path.realpath(self.files.base_path)
+        with archive:
+            for kind, value in self._members(roots, include, exclude, cancel):
+                if cancel.is_set():
+                    return
+                if kind == "file":
+                    # Links are followed, but only to files inside the config directory
+                    path = os.path.realpath(os.path.join(base, value))
+                    if os.path.commonpath([path, base]) != base:
+                        value = {"path": value, "error": "Symlink target is outside the config directory"}
+                    else:
+                        try:
+                            add(path, value)
+                            continue
+                        except OSError as e:  # vanished or unreadable since the walk
+                            value = {"path": value, "error": e.strerror or str(e)}
+                error_count += 1
+                if len(errors) < MAX_REPORTED_MEMBERS:
+                    errors.append(value)
+            if error_count:
+                logger.warning(f"Archive export: {error_count} path(s) could not be read, listed in {ERRORS_MEMBER}")
+                add_bytes(ERRORS_MEMBER, json.dumps({"error_count": error_count, "errors": errors}, indent=2).encode())
+        if compressor:
+            compressor.close()
+
+    def _stream(self, job: Callable[[Callable[[bytes], None], threading.Event], None]) -> AsyncIterator[bytes]:
+        """Run `job(put, cancel)` on the archive pool, yielding what it puts.
+
+        Same bridge as FileWalker._stream: a bounded queue gives backpressure
+        and a disconnect sets `cancel`, which stops the job at its next put.
+        """
+        async def gen():
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+            cancel = threading.Event()
+            done = object()
+            failure: List[BaseException] = []
+
+            def put(item) -> bool:
+                future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+                while not cancel.is_set():
+                    try:
+                        future.result(timeout=0.5)
+                        return True
+                    except FutureTimeout:
+                        continue
+                future.cancel()
+                return False
+
+            def put_chunk(chunk: bytes):
+                if not put(chunk):
+                    raise ArchiveError("Export cancelled")
+
+            def run():
+                try:
+                    job(put_chunk, cancel)
+                except Exception as e:
+                    if not cancel.is_set():
+                        logger.error(f"Archive export failed: {e}")
+                        failure.append(e)
+                finally:
+                    put(done)
+
+            task = loop.run_in_executor(self._executor, run)
+            try:
+                while True:
+                    chunk = await queue.get()
+                    if chunk is done:
+                        break
+                    yield chunk
+                if failure:
+                    # Headers are already sent: abort the body so the client sees a truncated download
+                    raise failure[0]
+            finally:
+                cancel.set()
+                await asyncio.shield(task)
+
+        return gen()
+
+    # --- import -------------------------------------------------------------
+
+    async def import_stream(self, chunks: AsyncIterator[bytes], dest: Path, fmt: str = "auto",
+                            compression: str = "auto", overwrite: bool = False) -> Dict[str, Any]:
+        """Extract an uploaded archive under `dest` (a resolved directory in /config) as it arrives.
+
+        `fmt` is tar, zip or auto (sniffed); `compression` applies to tar
+        (gzip/zstd/none or auto). Existing files are kept unless `overwrite`.
+        """
+        if fmt not in FORMATS | {"auto"}:
+            raise ArchiveError(f"Unknown archive format {fmt!r} (use auto, tar or zip)")
+        if compression not in COMPRESSIONS | {"auto"}:
+            raise ArchiveError(f"Unknown compression {compression!r} (use auto, gzip, zstd or none)")
+        if compression == "zstd" and zstandard is None:
+            raise ArchiveError("zstd compression requires the zstandard package")
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+        cancel = threading.Event()
+
+        def get() -> bytes:
+            future = asyncio.run_coroutine_threadsafe(queue.get(), loop)
+            while not cancel.is_set():
+                try:
+                    return future.result(timeout=0.5)
+                except FutureTimeout:
+                    continue
+            future.cancel()
+            raise ArchiveError("Upload aborted")
+
+        source = io.BufferedReader(_QueueSource(get), buffer_size=CHUNK_BYTES)
+        task = loop.run_in_executor(self._executor, self._extract, source, dest, fmt, compression, overwrite, cancel)
+        received = 0
+
+        async def feed(chunk: bytes) -> bool:
+            """Queue a chunk for the extractor; False if it finished (or failed) without needing it."""
+            put = asyncio.ensure_future(queue.put(chunk))
+            await asyncio.wait([put, task], return_when=asyncio.FIRST_COMPLETED)
+            if put.done():
+                return True
+            put.cancel()
+            return False
+
+        try:
+            async for chunk in chunks:
+                received += len(chunk)
+                if received > self.max_import_bytes:
+                    raise ArchiveTooLarge(f"Upload exceeds {self.max_import_bytes} bytes")
+                if chunk and not await feed(chunk):
+                    break
+            else:
+                await feed(b"")
+            result = await task
+        finally:
+            cancel.set()
+            if not task.done():
+                await asyncio.wait([task])
+            if not task.cancelled():
+                task.exception()  # already reported (or superseded by the error being raised)
+        result["received_bytes"] = received
+        return result
+
+    def _extract(self, source: io.BufferedReader, dest: Path, fmt: str, compression: str,
+                 overwrite: bool, cancel: threading.Event) -> Dict[str, Any]:
+        head = source.peek(4)[:4]
+        if fmt == "auto":
+            fmt = "zip" if head == ZIP_MAGIC else "tar"
+        report = _ImportReport(self, dest, overwrite)
+        try:
+            if fmt == "zip":
+                self._extract_zip(source, report, cancel)
+            else:
+                if compression == "zstd" or (compression == "auto" and head == ZSTD_MAGIC):
+                    if zstandard is None:
+                        raise ArchiveError("Upload is zstd-compressed; zstd requires the zstandard package")
+                    stream = zstandard.ZstdDecompressor().stream_reader(source)
+                    mode = "r|"
+                else:
+                    stream = source
+                    mode = {"gzip": "r|gz", "none": "r|", "auto": "r|*"}[compression]
+                with tarfile.open(fileobj=stream, mode=mode) as archive:
+                    for member in archive:
+                        if cancel.is_set():
+                            break
+                        kind = "dir" if member.isdir() else "file" if member.isfile() else None
+                        report.add(member.name, kind, member.size,
+                                   lambda: archive.extractfile(member), member.mode)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError) as e:
+            raise ArchiveError(f"Invalid {fmt} archive after {report.files} file(s): {e}") from e
+        except _ZSTD_ERRORS as e:
+            raise ArchiveError(f"Invalid zstd stream after {report.files} file(s): {e}") from e
+        return report.result(fmt)
+
+    def _extract_zip(self, source: io.BufferedReader, report: "_ImportReport", cancel: threading.Event):
+        with tempfile.TemporaryFile() as spool:
+            shutil.copyfileobj(source, spool, CHUNK_BYTES)
+            spool.seek(0)
+            with zipfile.ZipFile(spool) as archive:
+                for info in archive.infolist():
+                    if cancel.is_set():
+                        break
+                    mode = info.external_attr >> 16
+                    if info.is_dir():
+                        kind = "dir"
+                    elif stat.S_IFMT(mode) and not stat.S_ISREG(mode):
+                        kind = None  # symlink or special file (no type bits = regular file)
+                    else:
+                        kind = "file"
+                    report.add(info.filename, kind, info.file_size,
+                               lambda: archive.open(info), stat.S_IMODE(mode) or None)
+
+
+def _tar_info(name: str, size: int) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    return info
+
+
+class _ImportReport:
+    """Per-import bookkeeping: path checks, atomic writes and the counts returned to the caller."""
+
+    def __init__(self, service: ArchiveService, dest: Path, overwrite: bool):
+        self.service = service
+        self.dest = dest
+        self.dest_rel = os.path.relpath(dest, service.files.base_path)
+        self.overwrite = overwrite
+        self.files = self.dirs = self.bytes = self.skipped_count = 0
+        self.written: List[str] = []
+        self.skipped: List[Dict[str, str]] = []
+
+    def skip(self, name: str, reason: str):
+        self.skipped_count += 1
+        if len(self.skipped) < MAX_REPORTED_MEMBERS:
+            self.skipped.append({"name": name, "reason": reason})
+
+    def add(self, name: str, kind: Optional[str], size: int, open_member: Callable, mode: Optional[int]):
+        if kind is None:
+            return self.skip(name, "not a regular file or directory (links and devices are not extracted)")
+        if name.strip("/") in ("", ERRORS_MEMBER):
+            return
+        try:
+            target = self.service.files.ha_resolve_path(f"{self.dest_rel}/{name.lstrip('/')}")
+        except ValueError:
+            return self.skip(name, "outside config directory")
+        if target != self.dest and self.dest not in target.parents:
+            return self.skip(name, "outside destination directory")
+        if kind == "dir":
+            target.mkdir(parents=True, exist_ok=True)
+            self.service.index.note(target)
+            self.dirs += 1
+            return
+        if target.is_dir():
+            return self.skip(name, "a directory exists at this path")
+        if target.exists() and not self.overwrite:
+            return self.skip(name, "exists (pass overwrite=true to replace)")
+        if self.bytes + size > self.service.max_import_bytes:
+            raise ArchiveTooLarge(f"Extracted content exceeds {self.service.max_import_bytes} bytes")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open_member() as member:
+            self.bytes += self._write(target, member, mode)
+        self.service.index.note(target.parent)
+        self.service.index.note(target)
+        self.files += 1
+        if len(self.written) < MAX_REPORTED_MEMBERS:
+            self.written.append(os.path.relpath(target, self.service.files.base_path))
+
+    def _write(self, target: Path, member, mode: Optional[int]) -> int:
+        """Copy a member to a temp file next to `target` and os.replace() it into place; returns bytes written.
+
+        Counts the bytes actually read, so a member whose header understates
+        its size still cannot exceed the import limit.
+        """
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+        written = 0
+        try:
+            with open(tmp, "wb") as f:
+                while True:
+                    block = member.read(CHUNK_BYTES)
+                    if not block:
+                        break
+                    written += len(block)
+                    if self.bytes + written > self.service.max_import_bytes:
+                        raise ArchiveTooLarge(f"Extracted content exceeds {self.service.max_import_bytes} bytes")
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            if target.exists():
+                shutil.copymode(target, tmp)
+            elif mode:
+                os.chmod(tmp, mode & 0o755 | 0o600)
+            os.replace(tmp, target)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return written
+
+    def result(self, fmt: str) -> Dict[str, Any]:
+        return {
+            "format": fmt,
+            "dest": self.dest_rel.replace("\\", "/"),
+            "files": self.files,
+            "directories": self.dirs,
+            "bytes": self.bytes,
+            "written": self.written,
+            "skipped": self.skipped,
+            "skipped_count": self.skipped_count,
+        }
+
+
+# Initialize global instances
+archive_service = ArchiveService(file_mgr, file_walker, file_index,
+                                 settings.ARCHIVE_WORKERS, settings.ARCHIVE_IMPORT_MAX_BYTES)
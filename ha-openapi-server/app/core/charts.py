@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHART_DPI = 100
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+@dataclass
+class RenderedChart:
+    """A rendered chart image plus the metadata needed to serve it again."""
+    content: bytes
+    media_type: str
+    etag: str
+    points: int
+
+
+class ChartCache:
+    """Small LRU of rendered chart bytes keyed by request shape + time bucket."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, RenderedChart]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[RenderedChart]:
+        with self._lock:
+            chart = self._entries.get(key)
+            if chart is not None:
+                self._entries.move_to_end(key)
+            return chart
+
+    def put(self, key: Tuple, chart: RenderedChart):
+        with self._lock:
+            self._entries[key] = chart
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def render_chart(
+    series: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    chart_type: str,
+    title: str,
+    width: int,
+    height: int,
+    fmt: str,
+    units: Optional[Dict[str, str]] = None,
+) -> RenderedChart:
+    """Render series to PNG/SVG with a per-call Figure (no global pyplot state).
+
+    `series` maps a label to (epoch-second timestamps, values). Safe to run
+    in a worker thread because nothing here touches pyplot's figure manager.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(width / CHART_DPI, height / CHART_DPI), dpi=CHART_DPI)
+    ax = fig.subplots()
+
+    if chart_type == "bar":
+        # Compare entities by their mean over the window
+        labels = list(series.keys())
+        ax.bar(labels, [float(np.mean(v)) if len(v) else 0.0 for _, v in series.values()])
+        ax.tick_params(axis="x", labelrotation=45)
+    else:
+        for label, (ts, vals) in series.items():
+            times = (ts * 1000).astype("datetime64[ms]")
+            if chart_type == "scatter":
+                ax.scatter(times, vals, s=4, label=label)
+            else:
+                ax.plot(times, vals, linewidth=1, label=label)
+        if len(series) > 1:
+            ax.legend(loc="best", fontsize="small")
+        fig.autofmt_xdate()
+
+    if units:
+        distinct = sorted(set(u for u in units.values() if u))
+        if len(distinct) == 1:
+            ax.set_ylabel(distinct[0])
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    content = buf.getvalue()
+    return RenderedChart(
+        content=content,
+        media_type=MEDIA_TYPES[fmt],
+        etag=f'"{hashlib.sha1(content).hexdigest()}"',
+        points=sum(len(ts) for ts, _ in series.values()),
+    )
+
+
+async def render_chart_async(*args, **kwargs) -> RenderedChart:
+    """Render a chart on the dedicated worker pool, keeping the event loop free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_render_pool, lambda: render_chart(*args, **kwargs))
+
+
+# Initialize global instances
+_render_pool = ThreadPoolExecutor(max_workers=settings.CHART_RENDER_WORKERS, thread_name_prefix="chart-render")
+chart_cache = ChartCache(settings.CHART_CACHE_MAX_ENTRIES)
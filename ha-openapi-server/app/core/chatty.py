@@ -0,0 +1,165 @@
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Rolling windows served by /top_chatty_entities
+CHATTY_WINDOWS = {"1m": 60, "15m": 900, "1h": 3600}
+SLOT_SECONDS = 10
+
+
+class SpaceSaving:
+    """Space-Saving top-K summary (Metwally et al.) holding at most `capacity` keys.
+
+    When full, a new key takes over the smallest counter and inherits its
+    count as `error` (the maximum overcount), so any key seen more than
+    total/capacity times is guaranteed to be tracked. Values are
+    [count, error, state_changes].
+
+    The smallest counter is found through a min-heap with one (count, key)
+    entry per key. Increments leave it alone; since counts only grow, a
+    stale entry at the top is re-pushed with its current count until the
+    top is exact, so an eviction costs O(log capacity) amortized.
+    """
+
+    __slots__ = ("capacity", "index", "counters", "heap", "total")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.index = -1
+        self.counters: Dict[str, List[int]] = {}
+        self.heap: List[Tuple[int, str]] = []
+        self.total = 0
+
+    def reset(self, index: int):
+        self.index = index
+        self.counters = {}
+        self.heap = []
+        self.total = 0
+
+    def add(self, key: str, state_changed: bool):
+        self.total += 1
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += 1
+            counter[2] += state_changed
+            return
+        floor = 0
+        if len(self.counters) >= self.capacity:
+            while self.heap[0][0] != self.counters[self.heap[0][1]][0]:
+                victim = self.heap[0][1]
+                heapq.heapreplace(self.heap, (self.counters[victim][0], victim))
+            floor, victim = heapq.heappop(self.heap)
+            del self.counters[victim]
+        self.counters[key] = [floor + 1, floor, int(state_changed)]
+        heapq.heappush(self.heap, (floor + 1, key))
+
+
+class ChattyTracker:
+    """Per-entity state_changed rates over rolling 1m/15m/1h windows.
+
+    Events land in a ring of SLOT_SECONDS slots covering the longest window,
+    each slot a bounded Space-Saving summary, so memory stays constant no
+    matter how many entities flood the bus. A window query merges the slots
+    it spans. A key missing from a full slot may have been evicted from it
+    with up to that slot's smallest count, so the merge adds that floor to
+    its count and error. Merged counts are then upper bounds and
+    `count - error` a guaranteed lower bound.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        n_slots = max(CHATTY_WINDOWS.values()) // SLOT_SECONDS
+        self._slots = [SpaceSaving(capacity) for _ in range(n_slots)]
+        self.started_at: Optional[float] = None
+
+    def on_state_changed(self, event: Dict[str, Any]):
+        """EventStream listener for `state_changed`."""
+        data = event.get("data") or {}
+        entity_id = data.get("entity_id")
+        if not entity_id:
+            return
+        old, new = data.get("old_state"), data.get("new_state")
+        state_changed = not old or not new or old.get("state") != new.get("state")
+        self.record(entity_id, state_changed)
+
+    def record(self, entity_id: str, state_changed: bool = True, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        if self.started_at is None:
+            self.started_at = now
+        index = int(now // SLOT_SECONDS)
+        slot = self._slots[index % len(self._slots)]
+        if slot.index != index:
+            slot.reset(index)
+        slot.add(entity_id, state_changed)
+
+    def top(
+        self,
+        window: str,
+        limit: int = 20,
+        domain: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Merge the slots covering `window` and return the busiest entities."""
+        now = time.time() if now is None else now
+        current = int(now // SLOT_SECONDS)
+        first = current - CHATTY_WINDOWS[window] // SLOT_SECONDS + 1
+
+        merged: Dict[str, List[int]] = {}
+        present_floors: Dict[str, int] = {}
+        total = 0
+        total_floor = 0
+        for index in range(first, current + 1):
+            slot = self._slots[index % len(self._slots)]
+            if slot.index != index:
+                continue
+            total += slot.total
+            # Most a key absent from this slot can have had there (0 unless the slot evicted keys)
+            floor = min(c[0] for c in slot.counters.values()) if len(slot.counters) >= slot.capacity else 0
+            total_floor += floor
+            for entity_id, (count, error, changes) in slot.counters.items():
+                acc = merged.get(entity_id)
+                if acc is None:
+                    merged[entity_id] = [count, error, changes]
+                    present_floors[entity_id] = floor
+                else:
+                    acc[0] += count
+                    acc[1] += error
+                    acc[2] += changes
+                    present_floors[entity_id] += floor
+        if total_floor:
+            for entity_id, acc in merged.items():
+                absent = total_floor - present_floors[entity_id]
+                acc[0] += absent
+                acc[1] += absent
+
+        window_start = max(first * SLOT_SECONDS, self.started_at or now)
+        covered = max(now - window_start, float(SLOT_SECONDS))
+        if domain:
+            prefix = f"{domain}."
+            merged = {k: v for k, v in merged.items() if k.startswith(prefix)}
+
+        ranked = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return {
+            "window": window,
+            "covered_seconds": round(covered, 1),
+            "total_events": total,
+            "events_per_minute": round(total * 60 / covered, 2),
+            "entities": [
+                {
+                    "entity_id": entity_id,
+                    "changes": count,
+                    "changes_per_minute": round(count * 60 / covered, 2),
+                    "state_changes": changes,
+                    "attribute_only_updates": max(0, count - error - changes),
+                    "max_overcount": error,
+                    "share_pct": round(100 * count / max(1, total), 2),
+                }
+                for entity_id, (count, error, changes) in ranked
+            ],
+        }
+
+
+# Initialize global instances
+chatty_tracker = ChattyTracker(settings.CHATTY_TRACKER_CAPACITY)
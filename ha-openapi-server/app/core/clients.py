@@ -3,11 +3,13 @@ import json
 import logging
 import httpx
 import websockets
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
 import aiofiles
+import aiofiles.os
 
 from app.core.config import settings
+from app.core.file_patch import content_etag
 
 logger = logging.getLogger(__name__)
 
@@ -132,6 +134,43 @@ class HomeAssistantWebSocket:
                         error_message = error.get("message", str(error))
                         raise Exception(f"WebSocket command failed: {error_message}")
     
+    async def subscribe_events(self, event_types: List[str],
+                               on_subscribed: Optional[Callable[[], None]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Subscribe to HA events and yield each event as it arrives.
+
+        Use a dedicated client instance for subscriptions: call_command() reads
+        until its own response id and would swallow events on a shared
+        connection. `on_subscribed` is called once HA has confirmed every
+        subscription (no event is missed after that). Ends when the
+        connection closes.
+        """
+        await self.ensure_connected()
+        if not self.ws:
+            raise Exception("Failed to connect to WebSocket")
+
+        subscription_ids = set()
+        for event_type in event_types:
+            msg_id = self.msg_id
+            self.msg_id += 1
+            subscription_ids.add(msg_id)
+            await self.ws.send(json.dumps({"id": msg_id, "type": "subscribe_events", "event_type": event_type}))
+
+        unconfirmed = set(subscription_ids)
+        async for message_text in self.ws:
+            message = json.loads(message_text)
+            if message.get("id") not in subscription_ids:
+                continue
+            if message.get("type") == "event":
+                yield message.get("event", {})
+            elif message.get("type") == "result":
+                if not message.get("success"):
+                    error = message.get("error", {})
+                    raise Exception(f"WebSocket subscription failed: {error.get('message', str(error))}")
+                unconfirmed.discard(message.get("id"))
+                if not unconfirmed and on_subscribed:
+                    on_subscribed()
+                    on_subscribed = None
+
     async def close(self):
         """Close WebSocket connection."""
         if self.ws:
@@ -239,6 +278,9 @@ class HomeAssistantAPI:
 # File Manager
 # ============================================================================
 
+# Block size for head/tail scans
+READ_BLOCK_BYTES = 64 * 1024
+
 class FileManager:
     """File operations in HA config directory"""
     
@@ -263,6 +305,81 @@ class FileManager:
         async with aiofiles.open(path, 'r', encoding='utf-8') as f:
             return await f.read()
     
+    async def read_file_with_etag(self, filepath: str) -> Tuple[str, str]:
+        """Read file content (as read_file) plus the ETag of its bytes."""
+        path = self.ha_resolve_path(filepath)
+        async with aiofiles.open(path, 'rb') as f:
+            data = await f.read()
+        # Same newline translation as text-mode reads
+        content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        return content, content_etag(data)
+    
+    async def read_range(self, filepath: str, offset: int = 0, length: Optional[int] = None) -> Dict[str, Any]:
+        """Read `length` bytes from `offset` (to the end when omitted) without loading the rest."""
+        path = self.ha_resolve_path(filepath)
+        async with aiofiles.open(path, 'rb') as f:
+            size = (await aiofiles.os.stat(path)).st_size
+            await f.seek(min(offset, size))
+            data = await f.read(-1 if length is None else length)
+        return self._slice(data, size, min(offset, size))
+
+    async def read_head(self, filepath: str, lines: int) -> Dict[str, Any]:
+        """First `lines` lines, read forward in blocks until enough newlines are seen."""
+        path = self.ha_resolve_path(filepath)
+        buf = bytearray()
+        newlines = 0
+        async with aiofiles.open(path, 'rb') as f:
+            size = (await aiofiles.os.stat(path)).st_size
+            while newlines < lines:
+                chunk = await f.read(READ_BLOCK_BYTES)
+                if not chunk:
+                    break
+                buf += chunk
+                newlines += chunk.count(b"\n")
+        end = -1
+        for _ in range(lines):
+            end = buf.find(b"\n", end + 1)
+            if end == -1:
+                break
+        data = bytes(buf) if end == -1 else bytes(buf[:end + 1])
+        return self._slice(data, size, 0, lines=data.count(b"\n") + (0 if data.endswith(b"\n") or not data else 1))
+
+    async def read_tail(self, filepath: str, lines: int) -> Dict[str, Any]:
+        """Last `lines` lines, scanning backwards from the end in blocks."""
+        path = self.ha_resolve_path(filepath)
+        async with aiofiles.open(path, 'rb') as f:
+            size = (await aiofiles.os.stat(path)).st_size
+            pos = size
+            chunks: List[bytes] = []
+            newlines = 0
+            # A trailing newline terminates the last line rather than starting a new one
+            needed = lines
+            while pos > 0 and newlines < needed:
+                step = min(READ_BLOCK_BYTES, pos)
+                pos -= step
+                await f.seek(pos)
+                chunk = await f.read(step)
+                if pos + step == size and chunk.endswith(b"\n"):
+                    needed += 1
+                chunks.append(chunk)
+                newlines += chunk.count(b"\n")
+        data = b"".join(reversed(chunks))
+        trailer = b"\n" if data.endswith(b"\n") else b""
+        body = data[:-1] if trailer else data
+        tail = b"\n".join(body.split(b"\n")[-lines:]) + trailer if data else b""
+        return self._slice(tail, size, size - len(tail), lines=min(lines, body.count(b"\n") + 1) if data else 0)
+
+    @staticmethod
+    def _slice(data: bytes, size: int, offset: int, **extra) -> Dict[str, Any]:
+        return {
+            "content": data.decode("utf-8", errors="replace"),
+            "size": size,
+            "offset": offset,
+            "length": len(data),
+            "eof": offset + len(data) >= size,
+            **extra,
+        }
+    
     async def write_file(self, filepath: str, content: str) -> str:
         """Write file content"""
         path = self.ha_resolve_path(filepath)
@@ -23,6 +23,56 @@ class Settings(BaseSettings):
     HA_URL: str = "http://supervisor/core/api"
     HA_CONFIG_PATH: Path = Path("/config")
     
+    # History
+    HISTORY_BACKEND: str = "api"  # "api" (REST/WebSocket) or "recorder" (read-only SQLite)
+    RECORDER_DB_PATH: Optional[Path] = None  # default: HA_CONFIG_PATH/home-assistant_v2.db
+    RECORDER_DB_IMMUTABLE: bool = False  # immutable=1 skips locking; only safe on a copy / stopped HA
+    RECORDER_DB_WORKERS: int = 2
+    RECORDER_ANALYSIS_CACHE_SECONDS: int = 900
+    RECORDER_EXCLUDE_MIN_PCT: float = 1.0  # suggest excluding entities above this share of the DB
+    HISTORY_CHUNK_HOURS: int = 24
+    HISTORY_ENTITY_GROUP_SIZE: int = 25
+    HISTORY_FETCH_CONCURRENCY: int = 3
+    HISTORY_FETCH_RETRIES: int = 2
+    HISTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    HISTORY_CACHE_MIN_REFRESH_SECONDS: float = 5.0
+    HISTORY_CACHE_COMMIT_LAG_SECONDS: float = 10.0  # the recorder commits in batches; newer rows may still arrive
+    
+    # Charts
+    CHART_RENDER_WORKERS: int = 2
+    CHART_CACHE_MAX_ENTRIES: int = 64
+    CHART_CACHE_BUCKET_SECONDS: int = 60
+    CHART_STATISTICS_MIN_HOURS: int = 72
+    
+    # Config files
+    YAML_OFFLOAD_BYTES: int = 64 * 1024  # parse/serialize larger YAML documents in a worker thread
+    RELOAD_DEBOUNCE_SECONDS: float = 2.0  # coalesce automation/script reloads requested within this window
+    RELOAD_MAX_DELAY_SECONDS: float = 10.0  # ...but never postpone a reload longer than this
+    VALIDATION_CACHE_MAX_ENTRIES: int = 5000  # per-object structural validation results
+    VALIDATION_CATALOG_TTL_SECONDS: float = 60.0  # entity/service lists used by the validator
+    
+    # File tools
+    FILE_SCAN_WORKERS: int = 2  # dedicated threads for directory walks (search_files, list_files)
+    FILE_STREAM_QUEUE: int = 64  # NDJSON batches buffered ahead of a slow client
+    FILE_GREP_WORKERS: int = 4  # threads searching file contents in parallel (/grep_files)
+    FILE_GREP_MAX_FILE_BYTES: int = 4 * 1024 * 1024  # /grep_files skips larger files by default
+    FILE_INDEX_ENABLED: bool = True  # in-memory /config metadata index for listings, trees and walks
+    FILE_INDEX_RESCAN_SECONDS: float = 60.0  # full re-scan interval when inotify is unavailable
+    FILE_INDEX_MAX_ENTRIES: int = 200000  # larger trees are not indexed (tools walk the disk)
+    FILE_BULK_CONCURRENCY: int = 8  # concurrent file reads/writes in /read_files and /write_files
+    FILE_BULK_MAX_FILE_BYTES: int = 1024 * 1024  # per-file content returned by /read_files (rest truncated)
+    FILE_BULK_MAX_TOTAL_BYTES: int = 8 * 1024 * 1024  # total content per /read_files response
+    ARCHIVE_WORKERS: int = 2  # threads writing/extracting archives (/export_archive, /import_archive)
+    ARCHIVE_IMPORT_MAX_BYTES: int = 1024 * 1024 * 1024  # cap on upload size and on extracted bytes per import
+    FILE_WATCH_HEARTBEAT_SECONDS: float = 15.0  # /watch_files keep-alive comment interval
+    FILE_WATCH_MAX_PENDING: int = 10000  # coalesced paths per /watch_files subscriber before it gets an overflow
+    
+    # Event stream
+    CHATTY_TRACKER_ENABLED: bool = True  # subscribe to state_changed for /top_chatty_entities
+    CHATTY_TRACKER_CAPACITY: int = 500  # tracked entities per 10s slot (Space-Saving top-K)
+    REFERENCE_DASHBOARD_TTL_SECONDS: float = 300.0  # dashboard list re-read; configs too if the stream is down
+    DASHBOARD_CACHE_TTL_SECONDS: float = 10.0  # cached dashboard configs are trusted this long while the stream is down
+    
     # Auth Tokens
     SUPERVISOR_TOKEN: Optional[str] = None
     HA_TOKEN: Optional[str] = None
@@ -0,0 +1,376 @@
+import asyncio
+import copy
+import logging
+import os
+import re
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import aiofiles
+
+from app.core.config import settings
+from app.core.file_index import FileChange, FileIndex, file_index
+from app.core.yaml_io import dump_yaml_async, load_yaml, load_yaml_async
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigFileCache:
+    """Parsed YAML config files keyed by (path, mtime_ns, size).
+
+    automations.yaml, scripts.yaml and the package files are parsed once and
+    re-parsed only when their stat signature changes. Writes made through
+    dump() replace the cached document directly, so our own edits never
+    trigger a re-parse. Documents returned with mutable=False are shared and
+    must be treated as read-only; pass mutable=True to get a private copy to
+    edit and write back. Hold `edit_lock` from that load to the dump so two
+    concurrent edits cannot overwrite each other's changes.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[int, int, Any]] = {}
+        self.edit_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self, path: Path, default: Any = None, mutable: bool = False) -> Any:
+        """Parsed contents of `path` (`default` if missing or empty)."""
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return copy.deepcopy(default)
+
+        entry = self._entries.get(path)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            self.hits += 1
+            doc = entry[2]
+        else:
+            self.misses += 1
+            async with aiofiles.open(path, 'r') as f:
+                content = await f.read()
+            doc = await load_yaml_async(content)
+            self._entries[path] = (st.st_mtime_ns, st.st_size, doc)
+
+        if doc is None:
+            return copy.deepcopy(default)
+        return copy.deepcopy(doc) if mutable else doc
+
+    async def dump(self, path: Path, data: Any, **dump_kwargs):
+        """Atomically write `data` as YAML and cache it as the file's parsed contents.
+
+        The cache keeps a reference to `data`; don't mutate it afterwards.
+        """
+        entry = self._entries.get(path)
+        content = await dump_yaml_async(data, size_hint=entry[1] if entry else 0, **dump_kwargs)
+        await atomic_write(path, content)
+        st = path.stat()
+        self._entries[path] = (st.st_mtime_ns, st.st_size, data)
+
+    def peek(self, path: Path, st: os.stat_result) -> Tuple[bool, Any]:
+        """(True, doc) if `path` is cached with the signature of `st`."""
+        entry = self._entries.get(path)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return True, entry[2]
+        return False, None
+
+    def prime(self, path: Path, st: os.stat_result, doc: Any):
+        """Store a document parsed elsewhere (e.g. by the index builder thread)."""
+        self._entries[path] = (st.st_mtime_ns, st.st_size, doc)
+
+    async def snapshot(self, path: Path) -> Optional[bytes]:
+        """Raw file contents for restore() (None if the file doesn't exist)."""
+        try:
+            async with aiofiles.open(path, 'rb') as f:
+                return await f.read()
+        except FileNotFoundError:
+            return None
+
+    async def restore(self, path: Path, content: Optional[bytes]):
+        """Put back a snapshot() taken earlier (removing the file if it didn't exist)."""
+        self.invalidate(path)
+        if content is None:
+            path.unlink(missing_ok=True)
+        else:
+            await atomic_write(path, content)
+
+    def invalidate(self, path: Path = None):
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(path, None)
+
+    def on_file_changes(self, changes: List[FileChange]):
+        """FileIndex listener: drop documents whose file changed or disappeared on disk."""
+        base = Path(settings.HA_CONFIG_PATH)
+        for change in changes:
+            self._entries.pop(base / change["path"], None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+async def atomic_write(path: Path, content: Union[str, bytes]):
+    """Write through a temp file in the same directory and os.replace() it into place.
+
+    Readers (including HA reloading mid-write) only ever see the old or the
+    new file, never a truncated one. The original file mode is preserved.
+    The file index (and through it the caches listening to it) is told
+    about the change before this returns.
+    """
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        async with aiofiles.open(tmp, 'wb' if isinstance(content, bytes) else 'w') as f:
+            await f.write(content)
+            await f.flush()
+            await asyncio.to_thread(os.fsync, f.fileno())
+        if path.exists():
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    file_index.note(path)
+
+
+def package_files() -> List[Path]:
+    """YAML files of HA packages (packages/<name>/*.yaml), in a stable order."""
+    packages_dir = Path(settings.HA_CONFIG_PATH) / "packages"
+    if not packages_dir.exists():
+        return []
+    return sorted(
+        yaml_file
+        for pkg_dir in packages_dir.iterdir() if pkg_dir.is_dir()
+        for yaml_file in pkg_dir.glob("*.yaml")
+    )
+
+
+def normalize_alias(alias: str) -> str:
+    """Normalize an automation alias the way HA derives object ids from it."""
+    result = ''.join(c if c.isalnum() else '_' for c in alias.lower())
+    return re.sub(r'_+', '_', result)  # collapse consecutive underscores
+
+
+@dataclass(frozen=True)
+class Definition:
+    """Where one automation or script is defined."""
+    kind: str  # "automation" | "script"
+    path: Path
+    position: Union[int, str]  # list index (automations) or mapping key (scripts)
+    section: Optional[str]  # top-level package key holding it; None for automations.yaml/scripts.yaml
+    id: Optional[str]  # automation id or script name
+    alias: Optional[str]
+
+    def locate(self, doc: Any) -> Any:
+        """The definition's entry inside `doc` (the parsed file)."""
+        container = doc[self.section] if self.section else doc
+        return container[self.position]
+
+    def matches(self, item: Any, name: str) -> bool:
+        """Whether `item` (from locate) is still the definition of `name`."""
+        if not isinstance(item, dict):
+            return False
+        if self.kind == "script":
+            return True
+        return str(item.get("id")) == name or normalize_alias(item.get("alias") or "") == normalize_alias(name)
+
+    def to_dict(self, base_path: Path) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "file": str(self.path.relative_to(base_path)).replace("\\", "/"),
+            "position": self.position,
+            "section": self.section,
+            "id": self.id,
+            "alias": self.alias,
+        }
+
+
+def _definitions(path: Path, doc: Any, top_level: Optional[str]) -> List[Definition]:
+    """Automations/scripts defined in one parsed file.
+
+    `top_level` is "automation" for automations.yaml, "script" for
+    scripts.yaml and None for package files (which nest both).
+    """
+    if top_level:
+        sections = [(top_level, None, doc)]
+    elif isinstance(doc, dict):
+        sections = [(kind, kind, doc.get(kind)) for kind in ("automation", "script")]
+    else:
+        sections = []
+
+    definitions = []
+    for kind, section, container in sections:
+        if kind == "automation" and isinstance(container, list):
+            for i, auto in enumerate(container):
+                if isinstance(auto, dict):
+                    definitions.append(Definition("automation", path, i, section, auto.get("id"), auto.get("alias")))
+        elif kind == "script" and isinstance(container, dict):
+            for name, script in container.items():
+                alias = script.get("alias") if isinstance(script, dict) else None
+                definitions.append(Definition("script", path, name, section, str(name), alias))
+    return definitions
+
+
+class ConfigIndex:
+    """Index of automation ids, normalized aliases and script names to their files.
+
+    Covers automations.yaml, scripts.yaml and every package file. Built in a
+    worker thread at startup and refreshed incrementally: each refresh stats
+    the candidate files and re-parses only those whose (mtime_ns, size)
+    changed, reusing documents already in the ConfigFileCache (so our own
+    writes are never parsed twice). Parsed documents are shared back into
+    the cache.
+
+    Once watch() ties it to an inotify-backed FileIndex, refreshes skip the
+    stat pass entirely until the index reports a change to one of the
+    candidate files.
+    """
+
+    def __init__(self, cache: ConfigFileCache, base_path: Path):
+        self.cache = cache
+        self.base_path = base_path
+        self._files: Dict[Path, Tuple[int, int, List[Definition]]] = {}
+        self._keys: Dict[Tuple[str, str], List[Definition]] = {}
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[FileIndex] = None
+        self._dirty = True
+        self._synced_build: Optional[float] = None  # watcher build the last scan happened under
+        self._task: Optional[asyncio.Task] = None
+        self.scans = 0
+
+    def start(self):
+        """Build the index in the background."""
+        self._task = asyncio.create_task(self.refresh())
+        self._task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Config index build failed: {task.exception()!r}")
+
+    def watch(self, index: FileIndex):
+        """Take change notifications from `index` instead of stat-ing every candidate per refresh."""
+        self._watcher = index
+        index.add_listener(self.on_file_changes)
+
+    def on_file_changes(self, changes: List[FileChange]):
+        """FileIndex listener: mark the index dirty when automations/scripts/packages change."""
+        for change in changes:
+            path = change["path"]
+            if path in ("automations.yaml", "scripts.yaml", "packages") or path.startswith("packages/"):
+                self._dirty = True
+                return
+
+    def _current(self) -> bool:
+        """Nothing can have changed since the last scan (watched, no change reported, same index build)."""
+        watcher = self._watcher
+        return (watcher is not None and watcher.watching and not self._dirty
+                and watcher.built_at == self._synced_build)
+
+    async def refresh(self):
+        if not self._lock.locked() and self._current():
+            return
+        async with self._lock:
+            if self._current():
+                return  # a scan that was in progress covered it
+            watcher = self._watcher
+            self._dirty = False  # changes arriving during the scan mark it dirty again
+            self._synced_build = watcher.built_at if watcher is not None and watcher.watching else None
+            self.scans += 1
+            await asyncio.to_thread(self._scan)
+
+    def _candidates(self) -> List[Tuple[Path, Optional[str]]]:
+        return [
+            (self.base_path / "automations.yaml", "automation"),
+            (self.base_path / "scripts.yaml", "script"),
+        ] + [(path, None) for path in package_files()]
+
+    def _scan(self):
+        changed = False
+        seen = set()
+        for path, top_level in self._candidates():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            seen.add(path)
+            entry = self._files.get(path)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                continue
+
+            cached, doc = self.cache.peek(path, st)
+            if not cached:
+                try:
+                    with open(path, 'r') as f:
+                        doc = load_yaml(f.read())
+                    self.cache.prime(path, st, doc)
+                except Exception as e:
+                    logger.warning(f"Config index: cannot parse {path}: {e}")
+                    doc = None
+            self._files[path] = (st.st_mtime_ns, st.st_size, _definitions(path, doc, top_level))
+            changed = True
+
+        for path in set(self._files) - seen:
+            del self._files[path]
+            changed = True
+        if changed:
+            self._rebuild_keys()
+
+    def _ordered_files(self) -> List[Path]:
+        # automations.yaml / scripts.yaml first, then packages in order (matches the old scan order)
+        return sorted(self._files, key=lambda p: (p.parent != self.base_path, p))
+
+    def _rebuild_keys(self):
+        keys: Dict[Tuple[str, str], List[Definition]] = {}
+        for path in self._ordered_files():
+            for definition in self._files[path][2]:
+                if definition.kind == "automation":
+                    if definition.id:
+                        keys.setdefault(("automation_id", str(definition.id)), []).append(definition)
+                    if definition.alias:
+                        keys.setdefault(("automation_alias", normalize_alias(definition.alias)), []).append(definition)
+                else:
+                    keys.setdefault(("script", definition.id), []).append(definition)
+        self._keys = keys
+
+    async def definitions(self) -> Dict[Path, List[Definition]]:
+        """Every indexed file with its definitions (automations.yaml/scripts.yaml first)."""
+        await self.refresh()
+        return {path: self._files[path][2] for path in self._ordered_files()}
+
+    def definitions_in(self, path: Path, doc: Any) -> List[Definition]:
+        """Definitions in an already-parsed (possibly edited in memory) config file."""
+        top_level = {"automations.yaml": "automation", "scripts.yaml": "script"}.get(path.name) \
+            if path.parent == self.base_path else None
+        return _definitions(path, doc, top_level)
+
+    async def find_automation(self, name: str) -> List[Definition]:
+        """Definitions whose id is `name` or whose normalized alias matches it."""
+        await self.refresh()
+        by_id = self._keys.get(("automation_id", name), [])
+        by_alias = self._keys.get(("automation_alias", normalize_alias(name)), [])
+        return by_id + [d for d in by_alias if d not in by_id]
+
+    async def find_script(self, name: str) -> List[Definition]:
+        await self.refresh()
+        return list(self._keys.get(("script", name), []))
+
+    async def find(self, name: str, kind: Optional[str] = None) -> List[Definition]:
+        """Which files define `name` ("automation.x", "script.x" or a bare id/alias)."""
+        if name.startswith("automation."):
+            kind, name = "automation", name[len("automation."):]
+        elif name.startswith("script."):
+            kind, name = "script", name[len("script."):]
+        found = []
+        if kind in (None, "automation"):
+            found += await self.find_automation(name)
+        if kind in (None, "script"):
+            found += await self.find_script(name)
+        return found
+
+
+# Initialize global instances
+config_cache = ConfigFileCache()
+config_index = ConfigIndex(config_cache, Path(settings.HA_CONFIG_PATH))
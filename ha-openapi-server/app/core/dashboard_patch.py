@@ -0,0 +1,314 @@
+import copy
+import difflib
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+Tokens = List[str]
+
+
+class DashboardPatchError(ValueError):
+    """An operation that does not apply to the dashboard config as it is now."""
+
+
+def parse_pointer(pointer: str) -> Tokens:
+    """RFC 6901 JSON Pointer -> reference tokens ("" is the whole document)."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise DashboardPatchError(f"JSON pointer must start with '/': {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def format_pointer(tokens: List[Union[str, int]]) -> str:
+    return "".join("/" + str(t).replace("~", "~0").replace("/", "~1") for t in tokens)
+
+
+def _index(token: str, size: int, appending: bool) -> int:
+    """List index for a token; "-" (append) and `size` itself only when adding."""
+    if appending and token == "-":
+        return size
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise DashboardPatchError(f"Invalid list index {token!r}")
+    i = int(token)
+    if i > size or (i == size and not appending):
+        raise DashboardPatchError(f"Index {i} out of range (list has {size} items)")
+    return i
+
+
+class _Editor:
+    """Applies edits by path copying: containers on an edited path are copied once per patch.
+
+    Everything else stays shared with the original config, which is never
+    modified, so a patch costs a few shallow copies instead of a deepcopy.
+    `origins` maps each copy (by id) to the container it was copied from,
+    which lets the diff pair an edited card or view with its original.
+    """
+
+    def __init__(self, doc: Any):
+        self.origins: Dict[int, Any] = {}
+        self._copies: List[Any] = []  # keeps copies alive so their ids stay unique
+        self.doc = self._own(doc)
+
+    def _own(self, container: Any) -> Any:
+        if id(container) in self.origins or not isinstance(container, (dict, list)):
+            return container
+        mine = dict(container) if isinstance(container, dict) else list(container)
+        self.origins[id(mine)] = container
+        self._copies.append(mine)
+        return mine
+
+    def get(self, tokens: Tokens) -> Any:
+        node = self.doc
+        for i, token in enumerate(tokens):
+            node = self._child(node, token, tokens[:i + 1])
+        return node
+
+    def _child(self, node: Any, token: str, where: Tokens) -> Any:
+        if isinstance(node, dict):
+            if token not in node:
+                raise DashboardPatchError(f"{format_pointer(where)} does not exist")
+            return node[token]
+        if isinstance(node, list):
+            return node[_index(token, len(node), appending=False)]
+        raise DashboardPatchError(f"{format_pointer(where[:-1])} is not an object or array")
+
+    def _parent(self, tokens: Tokens) -> Any:
+        """Writable container holding the last token of `tokens`."""
+        node = self.doc
+        for i, token in enumerate(tokens[:-1]):
+            child = self._child(node, token, tokens[:i + 1])
+            if not isinstance(child, (dict, list)):
+                raise DashboardPatchError(f"{format_pointer(tokens[:i + 1])} is not an object or array")
+            mine = self._own(child)
+            if mine is not child:
+                node[token if isinstance(node, dict) else int(token)] = mine
+            node = mine
+        return node
+
+    def add(self, tokens: Tokens, value: Any):
+        if not tokens:
+            self.doc = value
+            return
+        parent = self._parent(tokens)
+        if isinstance(parent, dict):
+            parent[tokens[-1]] = value
+        elif isinstance(parent, list):
+            parent.insert(_index(tokens[-1], len(parent), appending=True), value)
+        else:
+            raise DashboardPatchError(f"{format_pointer(tokens[:-1])} is not an object or array")
+
+    def remove(self, tokens: Tokens) -> Any:
+        if not tokens:
+            raise DashboardPatchError("Cannot remove the whole config")
+        parent = self._parent(tokens)
+        value = self._child(parent, tokens[-1], tokens)
+        if isinstance(parent, dict):
+            del parent[tokens[-1]]
+        else:
+            del parent[int(tokens[-1])]
+        return value
+
+    def replace(self, tokens: Tokens, value: Any):
+        if not tokens:
+            self.doc = value
+            return
+        parent = self._parent(tokens)
+        self._child(parent, tokens[-1], tokens)  # must exist
+        parent[tokens[-1] if isinstance(parent, dict) else int(tokens[-1])] = value
+
+
+def _view_index(doc: Any, ref: Union[int, str]) -> int:
+    """Index of a view given its index, its `path` or (failing that) its title."""
+    views = doc.get("views") if isinstance(doc, dict) else None
+    if not isinstance(views, list):
+        raise DashboardPatchError("Dashboard has no views list")
+    if isinstance(ref, int):
+        if not 0 <= ref < len(views):
+            raise DashboardPatchError(f"View index {ref} out of range (0-{len(views) - 1})")
+        return ref
+    for key in ("path", "title"):
+        for i, view in enumerate(views):
+            if isinstance(view, dict) and view.get(key) == ref:
+                return i
+    raise DashboardPatchError(f"No view with path or title {ref!r}")
+
+
+def _cards(editor: _Editor, view: int) -> Tokens:
+    """Pointer tokens of a view's cards list, creating the list if the view has none."""
+    tokens = ["views", str(view), "cards"]
+    node = editor.get(tokens[:2])
+    if not isinstance(node, dict):
+        raise DashboardPatchError(f"View {view} is not an object")
+    if "cards" not in node:
+        editor.add(tokens, [])
+    return tokens
+
+
+def _value(op: Dict[str, Any]) -> Any:
+    if "value" not in op:
+        raise ValueError(f"'{op['op']}' needs a value")
+    return op["value"]
+
+
+def _apply(editor: _Editor, op: Dict[str, Any]):
+    name = op["op"]
+    if op.get("path") is not None:
+        # JSON Patch (RFC 6902)
+        path = parse_pointer(op["path"])
+        if name == "add":
+            editor.add(path, _value(op))
+        elif name in ("remove", "delete"):
+            editor.remove(path)
+        elif name == "replace":
+            editor.replace(path, _value(op))
+        elif name in ("move", "copy"):
+            if op.get("from") is None:
+                raise ValueError(f"'{name}' with a path needs 'from'")
+            source = parse_pointer(op["from"])
+            if name == "move":
+                if path[:len(source)] == source and path != source:
+                    raise DashboardPatchError(f"Cannot move {op['from']} into itself")
+                editor.add(path, editor.remove(source))
+            else:
+                editor.add(path, copy.deepcopy(editor.get(source)))
+        elif name == "test":
+            if editor.get(path) != _value(op):
+                raise DashboardPatchError(f"Test failed: {op['path']} does not have the expected value")
+        else:
+            raise ValueError(f"'{name}' is not a JSON Patch operation (add, remove, replace, move, copy, test)")
+        return
+
+    # Card/view operations addressed by view (index, path or title) and card index
+    view, card = op.get("view"), op.get("card_index")
+    if name in ("add", "remove", "copy", "test"):
+        raise ValueError(f"'{name}' needs a JSON pointer 'path'")
+    if view is None:
+        if name != "insert":
+            raise ValueError(f"'{name}' needs a view (or a JSON pointer 'path')")
+        views = ["views"]
+        if not isinstance(editor.doc, dict):
+            raise DashboardPatchError("Dashboard config is not an object")
+        if "views" not in editor.doc:
+            editor.add(views, [])
+        to = op.get("to_index")
+        editor.add(views + ["-" if to is None else str(to)], _value(op))
+        return
+    v = _view_index(editor.doc, view)
+    if card is None:
+        target = ["views", str(v)]
+        if name == "insert":
+            editor.add(_cards(editor, v) + ["-"], _value(op))
+        elif name == "replace":
+            editor.replace(target, _value(op))
+        elif name == "delete":
+            editor.remove(target)
+        elif name == "move":
+            if op.get("to_index") is None:
+                raise ValueError("Moving a view needs to_index")
+            editor.add(["views", str(op["to_index"])], editor.remove(target))
+        return
+    cards = _cards(editor, v)
+    target = cards + [str(card)]
+    if name == "insert":
+        editor.add(target, _value(op))
+    elif name == "replace":
+        editor.replace(target, _value(op))
+    elif name == "delete":
+        editor.remove(target)
+    elif name == "move":
+        moved = editor.remove(target)
+        to_view = v if op.get("to_view") is None else _view_index(editor.doc, op["to_view"])
+        to = op.get("to_index")
+        editor.add(_cards(editor, to_view) + ["-" if to is None else str(to)], moved)
+
+
+def apply_operations(config: Any, operations: List[Dict[str, Any]]) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Apply operations in order; returns (new config, structural diff). The original is not modified.
+
+    Each operation is a dict with `op` and either a JSON pointer `path` (RFC
+    6902 add/remove/replace/move/copy/test, `from` for move/copy) or a `view`
+    (index, path or title) with an optional `card_index` for insert/replace/
+    move/delete of cards (or of whole views when card_index is omitted;
+    insert without a view adds a view). Moves take `to_view`/`to_index`
+    (final position, default: append). Indexes refer to the config as left
+    by the previous operation. Raises DashboardPatchError (operation does
+    not apply) or ValueError (malformed operation), naming the operation.
+    """
+    editor = _Editor(config)
+    for i, op in enumerate(operations):
+        try:
+            _apply(editor, op)
+        except DashboardPatchError as e:
+            raise DashboardPatchError(f"Operation {i} ({op['op']}): {e}") from e
+        except ValueError as e:
+            raise ValueError(f"Operation {i} ({op['op']}): {e}") from e
+    return editor.doc, structural_diff(config, editor.doc, editor.origins)
+
+
+def structural_diff(old: Any, new: Any, origins: Optional[Dict[int, Any]] = None) -> List[Dict[str, Any]]:
+    """What changed between two configs, as add/remove/replace/move entries with JSON pointers.
+
+    Subtrees shared between both (everything a patch did not touch) are
+    skipped by identity. List items are aligned by identity too, where
+    `origins` (copy id -> original) lets an edited item stand for the one it
+    was copied from: an insertion reports one `add` rather than a change to
+    every later item, and an item removed in one place and added in another
+    is a `move` (followed by any edits made to it). Removals use positions
+    in the old config, everything else positions in the new one.
+    """
+    origins = origins or {}
+    changes: List[Dict[str, Any]] = []
+    _diff(old, new, [], origins, changes)
+
+    def key(value):
+        return id(origins.get(id(value), value))
+
+    removed = {id(c["old"]): c for c in changes if c["op"] == "remove" and isinstance(c["old"], (dict, list))}
+    result = []
+    for change in changes:
+        source = removed.pop(key(change["new"]), None) if change["op"] == "add" else None
+        if source is None:
+            result.append(change)
+            continue
+        source["op"] = "moved"
+        result.append({"op": "move", "from": source["path"], "path": change["path"]})
+        _diff(source["old"], change["new"], parse_pointer(change["path"]), origins, result)
+    return [c for c in result if c["op"] != "moved"]
+
+
+def _diff(old: Any, new: Any, path: List[Union[str, int]], origins: Dict[int, Any], out: List[Dict[str, Any]]):
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                out.append({"op": "remove", "path": format_pointer(path + [key]), "old": old[key]})
+        for key in new:
+            if key not in old:
+                out.append({"op": "add", "path": format_pointer(path + [key]), "new": new[key]})
+            else:
+                _diff(old[key], new[key], path + [key], origins, out)
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        matcher = difflib.SequenceMatcher(
+            None, [id(x) for x in old], [id(origins.get(id(x), x)) for x in new], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                paired = range(i2 - i1)
+            elif tag == "replace":
+                # Different items at the same position are unrelated: only plain values
+                # are reported as replaced, cards and views as removed/added (or moved)
+                paired = [k for k in range(min(i2 - i1, j2 - j1))
+                          if not isinstance(old[i1 + k], (dict, list)) and not isinstance(new[j1 + k], (dict, list))]
+            else:
+                paired = []
+            for k in paired:
+                _diff(old[i1 + k], new[j1 + k], path + [j1 + k], origins, out)
+            for i in range(i1, i2):
+                if i - i1 not in paired:
+                    out.append({"op": "remove", "path": format_pointer(path + [i]), "old": old[i]})
+            for j in range(j1, j2):
+                if j - j1 not in paired:
+                    out.append({"op": "add", "path": format_pointer(path + [j]), "new": new[j]})
+        return
+    if old != new:
+        out.append({"op": "replace", "path": format_pointer(path), "old": old, "new": new})
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.clients import get_ws_client
+from app.core.config import settings
+from app.core.events import event_stream
+from app.core.file_patch import content_etag, normalize_etag
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardVersionMismatch(Exception):
+    """A save whose if_version no longer matches the dashboard's current config."""
+
+    def __init__(self, current: str):
+        super().__init__(f"Dashboard changed since it was read (current version {current})")
+        self.current = current
+
+
+def dashboard_version(config: Any) -> str:
+    """Version stamp of a dashboard config: hash of its canonical JSON."""
+    return content_etag(json.dumps(config, sort_keys=True, separators=(",", ":"), default=str).encode())
+
+
+def _url_path(dashboard_id: Optional[str]) -> Optional[str]:
+    """lovelace/config url_path for a dashboard id (None = the default dashboard)."""
+    return None if not dashboard_id or dashboard_id == "lovelace" else dashboard_id
+
+
+@dataclass
+class _Entry:
+    config: Any
+    version: str
+    fetched: float  # time.monotonic()
+    epoch: Optional[int]  # event_stream.reconnects when fetched, None if the stream was not subscribed
+
+
+class DashboardCache:
+    """Lovelace dashboard configs by dashboard id, kept until HA says they changed.
+
+    Entries are dropped when HA fires `lovelace_updated` for their dashboard
+    (UI edits, our own saves). That only works while the event stream is
+    connected and has been since the entry was fetched; otherwise an entry
+    is trusted for DASHBOARD_CACHE_TTL_SECONDS. An update that arrives while
+    a fetch is in flight bumps the dashboard's generation, and that fetch's
+    result is then returned but not cached. Concurrent misses for one
+    dashboard share a single fetch. Each config carries a version stamp
+    (hash of its content) that saves can pass as `if_version` to refuse
+    overwriting a dashboard someone else changed in the meantime.
+
+    Returned configs are shared: treat them as read-only and copy before
+    editing.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, _Entry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._generations: Dict[str, int] = {}  # bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def on_lovelace_updated(self, event: Dict[str, Any]):
+        """EventStream listener for `lovelace_updated` (url_path None = default dashboard)."""
+        self.invalidate((event.get("data") or {}).get("url_path") or "lovelace")
+
+    def _fresh(self, entry: _Entry) -> bool:
+        if entry.epoch is not None and event_stream.connected and entry.epoch == event_stream.reconnects:
+            return True
+        return time.monotonic() - entry.fetched < self.ttl
+
+    def _lock(self, dashboard_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(dashboard_id, asyncio.Lock())
+
+    async def get(self, dashboard_id: str) -> Tuple[Any, str]:
+        """(config, version) of a dashboard, from memory when still valid."""
+        dashboard_id = dashboard_id or "lovelace"
+        entry = self._entries.get(dashboard_id)
+        if entry and self._fresh(entry):
+            self.hits += 1
+            return entry.config, entry.version
+        async with self._lock(dashboard_id):
+            entry = self._entries.get(dashboard_id)
+            if entry and self._fresh(entry):
+                self.hits += 1
+                return entry.config, entry.version
+            return await self._fetch(dashboard_id)
+
+    async def _fetch(self, dashboard_id: str) -> Tuple[Any, str]:
+        self.misses += 1
+        epoch = event_stream.reconnects if event_stream.connected else None
+        generation = self._generations.get(dashboard_id, 0)
+        ws = await get_ws_client()
+        url_path = _url_path(dashboard_id)
+        if url_path:
+            config = await ws.call_command("lovelace/config", url_path=url_path)
+        else:
+            config = await ws.call_command("lovelace/config")
+        version = await asyncio.to_thread(dashboard_version, config)
+        if self._generations.get(dashboard_id, 0) == generation:
+            self._entries[dashboard_id] = _Entry(config, version, time.monotonic(), epoch)
+        return config, version
+
+    async def save(self, dashboard_id: str, config: Any, if_version: Optional[str] = None) -> Tuple[Any, str]:
+        """Save a full dashboard config; returns (HA's result, new version).
+
+        With `if_version`, raises DashboardVersionMismatch unless the
+        dashboard is still at that version (re-fetched if the cached copy
+        cannot be trusted). Saves to one dashboard are serialized here, but
+        HA itself has no compare-and-swap, so an edit made in the UI at the
+        same instant can still be overwritten.
+        """
+        dashboard_id = dashboard_id or "lovelace"
+        async with self._lock(dashboard_id):
+            if if_version is not None:
+                entry = self._entries.get(dashboard_id)
+                if entry and self._fresh(entry):
+                    current = entry.version
+                else:
+                    _, current = await self._fetch(dashboard_id)
+                if normalize_etag(if_version) != current:
+                    raise DashboardVersionMismatch(current)
+            ws = await get_ws_client()
+            url_path = _url_path(dashboard_id)
+            try:
+                if url_path:
+                    result = await ws.call_command("lovelace/config/save", url_path=url_path, config=config)
+                else:
+                    result = await ws.call_command("lovelace/config/save", config=config)
+            finally:
+                # Re-read on next use: HA's lovelace_updated for this save may arrive before or after this point
+                self.invalidate(dashboard_id)
+        return result, await asyncio.to_thread(dashboard_version, config)
+
+    def invalidate(self, dashboard_id: Optional[str] = None):
+        if dashboard_id is None:
+            self._entries.clear()
+            for key in self._generations:
+                self._generations[key] += 1
+        else:
+            self._entries.pop(dashboard_id, None)
+            self._generations[dashboard_id] = self._generations.get(dashboard_id, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"dashboards": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Initialize global instances
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_TTL_SECONDS)
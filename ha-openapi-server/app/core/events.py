@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.clients import HomeAssistantWebSocket
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EventListener = Callable[[Dict[str, Any]], None]
+
+
+class EventStream:
+    """Dedicated WebSocket connection that fans HA bus events out to listeners.
+
+    Runs separately from the shared command client (get_ws_client) so event
+    traffic never interleaves with call_command() responses. Reconnects with
+    exponential backoff. Listeners are plain callables invoked on the event
+    loop for every event of their type, so they must be cheap and non-blocking.
+    `connected` is True only once HA has confirmed the subscriptions.
+    """
+
+    def __init__(self, url: str, token: str):
+        self.url = url
+        self.token = token
+        self._listeners: Dict[str, List[EventListener]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.events_received = 0
+        self.reconnects = 0
+
+    def add_listener(self, event_type: str, callback: EventListener):
+        """Register `callback` for `event_type` (resubscribes if already running)."""
+        new_type = event_type not in self._listeners
+        self._listeners.setdefault(event_type, []).append(callback)
+        if new_type and self._task is not None:
+            # A resubscribe is a new epoch: events between the old and new subscription are not seen
+            self.connected = False
+            self.reconnects += 1
+            self._task.cancel()
+            self._task = asyncio.create_task(self._run())
+
+    def start(self):
+        """Start the connection loop if anything is listening."""
+        if self._task is None and self._listeners:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            client = HomeAssistantWebSocket(self.url, self.token)
+            try:
+                if await client.connect():
+                    backoff = 1.0
+                    async for event in client.subscribe_events(list(self._listeners), self._subscribed):
+                        self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event stream disconnected: {e}")
+            finally:
+                self.connected = False
+                await asyncio.shield(client.close())
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def _subscribed(self):
+        self.connected = True
+
+    def _dispatch(self, event: Dict[str, Any]):
+        self.events_received += 1
+        for callback in self._listeners.get(event.get("event_type"), ()):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Event listener {callback!r} failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "event_types": sorted(self._listeners),
+            "events_received": self.events_received,
+            "reconnects": self.reconnects,
+        }
+
+
+# Initialize global instances
+event_stream = EventStream(settings.HA_URL, settings.HA_TOKEN or "")
@@ -0,0 +1,469 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import stat
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Entry kinds: "dir" (real directory), "link_dir" (symlink to a directory, not descended),
+# "file" (regular file or symlink to one) and "other"
+Entry = Tuple[str, int, float]  # (kind, size, mtime)
+# {"type": "created"|"modified"|"deleted", "path": relpath, "kind", "size", "mtime"}
+FileChange = Dict[str, Any]
+FileListener = Callable[[List[FileChange]], None]
+
+
+class Inotify:
+    """Minimal inotify binding over ctypes (Linux only)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Pending events as (wd, mask, name); waits up to `timeout` seconds for the first."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def join_relpath(parent: str, name: str) -> str:
+    """Child of an index key ("." is the config root)."""
+    return name if parent == "." else f"{parent}/{name}"
+
+
+def _parent(relpath: str) -> Tuple[str, str]:
+    head, _, name = relpath.rpartition("/")
+    return head or ".", name
+
+
+def _entry(dirent: os.DirEntry) -> Entry:
+    """Classify a scandir entry the way the file tools see it."""
+    if dirent.is_dir(follow_symlinks=False):
+        return ("dir", 0, dirent.stat(follow_symlinks=False).st_mtime)
+    if dirent.is_symlink() and dirent.is_dir():
+        return ("link_dir", 0, 0.0)
+    if dirent.is_file():
+        st = dirent.stat()
+        return ("file", st.st_size, st.st_mtime)
+    return ("other", 0, 0.0)
+
+
+def _change(relpath: str, previous: Optional[Entry], entry: Optional[Entry]) -> Optional[FileChange]:
+    """The change from `previous` to `entry` (None = absent); directories only report create/delete."""
+    if previous == entry:
+        return None
+    if previous is None:
+        kind = "created"
+    elif entry is None:
+        kind = "deleted"
+    elif previous[0] == entry[0] == "dir":
+        return None  # mtime bump from a child changing
+    else:
+        kind = "modified"
+    current = entry or previous
+    return {"type": kind, "path": relpath, "kind": current[0], "size": current[1], "mtime": current[2]}
+
+
+def _diff(parent: str, old: Dict[str, Entry], new: Dict[str, Entry]) -> List[FileChange]:
+    """Changes between two listings of the same directory."""
+    changes = []
+    for name in sorted(old.keys() | new.keys()):
+        change = _change(join_relpath(parent, name), old.get(name), new.get(name))
+        if change:
+            changes.append(change)
+    return changes
+
+
+class FileIndex:
+    """In-memory metadata index of the config directory: relpath -> {name: (kind, size, mtime)}.
+
+    Built by a background thread at startup and kept current with inotify
+    (one watch per directory, via ctypes); where inotify is unavailable or
+    runs out of watches, the tree is re-scanned every FILE_INDEX_RESCAN_SECONDS
+    instead. Directory listings, trees and walks read from it rather than
+    from disk. Until it is ready, or if the tree exceeds
+    FILE_INDEX_MAX_ENTRIES, `listdir` returns None and callers walk the disk.
+    Our own writes are applied immediately through `note()`.
+
+    Every change the index applies (watcher, re-scan or `note()`) is also
+    passed to listeners as a batch of created/modified/deleted FileChange
+    dicts, which makes it the one invalidation source for the config caches
+    and the feed behind /watch_files. Entries inside a directory that
+    appears or disappears as a whole (moved in or out) are reported too.
+    """
+
+    def __init__(self, base_path: Path, rescan_seconds: float, max_entries: int):
+        self.base_path = base_path
+        self.rescan_seconds = rescan_seconds
+        self.max_entries = max_entries
+        self._dirs: Dict[str, Dict[str, Entry]] = {}
+        self._entries = 0
+        self._lock = threading.Lock()
+        self._ready = False
+        self._disabled = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[Inotify] = None
+        self._wds: Dict[int, str] = {}
+        self._watched: Dict[str, int] = {}
+        self._listeners: List[FileListener] = []
+        self.changes = 0
+        self.mode = "starting"
+        self.built_at: Optional[float] = None
+        self.build_ms: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready and not self._disabled
+
+    @property
+    def disabled(self) -> bool:
+        """True once the index gave up (tree over FILE_INDEX_MAX_ENTRIES, or the thread failed)."""
+        return self._disabled
+
+    @property
+    def watching(self) -> bool:
+        """Ready and fed by inotify, so changes are seen within moments (not at the next re-scan)."""
+        return self.ready and self.mode == "inotify"
+
+    def add_listener(self, callback: FileListener):
+        """Call `callback` with each batch of changes.
+
+        Listeners run on the index thread (or on the thread calling note()),
+        so they must be cheap, thread-safe and non-blocking; async consumers
+        should hop onto their loop with call_soon_threadsafe.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def start(self):
+        """Build the index and watch for changes in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="file-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def relative(self, path: Path) -> str:
+        """Index key ("." for the config root) of an absolute path under it."""
+        return os.path.relpath(path, self.base_path).replace("\\", "/")
+
+    def listdir(self, relpath: str) -> Optional[List[Tuple[str, Entry]]]:
+        """(name, (kind, size, mtime)) for a directory, sorted by name; None if not indexed."""
+        if not self.ready:
+            return None
+        with self._lock:
+            listing = self._dirs.get(relpath)
+            if listing is None:
+                return None
+            return sorted(listing.items())
+
+    def note(self, path: Path):
+        """Apply a change we made ourselves (write, delete, move, mkdir) without waiting for the watcher."""
+        if self.ready:
+            try:
+                self._notify(self._refresh(self.relative(path), deep=False))
+            except Exception as e:
+                logger.debug(f"File index: could not refresh {path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "directories": len(self._dirs),
+            "entries": self._entries,
+            "watches": len(self._watched),
+            "build_ms": self.build_ms,
+            "changes": self.changes,
+            "listeners": len(self._listeners),
+        }
+
+    def _notify(self, changes: List[FileChange]):
+        if not changes:
+            return
+        self.changes += len(changes)
+        for callback in list(self._listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"File index listener {callback!r} failed: {e}", exc_info=True)
+
+    # --- building -----------------------------------------------------------
+
+    def _run(self):
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError, TypeError) as e:
+            logger.info(f"File index: inotify unavailable ({e}), re-scanning every {self.rescan_seconds:.0f}s")
+        try:
+            self._rebuild()
+            while not self._stop.is_set():
+                if self._inotify:
+                    self._process(self._inotify.read(1.0))
+                else:
+                    self._stop.wait(self.rescan_seconds)
+                    if not self._stop.is_set():
+                        self._rebuild()
+        except Exception as e:
+            logger.error(f"File index stopped: {e}")
+            self._disabled = True
+        finally:
+            if self._inotify:
+                self._inotify.close()
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        if self._inotify:
+            for wd in list(self._wds):
+                self._inotify.rm_watch(wd)
+            self._wds.clear()
+            self._watched.clear()
+        dirs: Dict[str, Dict[str, Entry]] = {}
+        count = self._scan(".", dirs, 0)
+        if count is None:
+            logger.warning(f"File index disabled: more than {self.max_entries} entries under {self.base_path}")
+            self._disabled = True
+            self._stop.set()
+            return
+        with self._lock:
+            previous, self._dirs = self._dirs, dirs
+            self._entries = count
+        self._ready = True
+        if self.built_at is not None:
+            # Re-scan (polling mode) or rebuild after an overflow: report what changed meanwhile
+            changes = []
+            for key in sorted(previous.keys() | dirs.keys()):
+                changes += _diff(key, previous.get(key, {}), dirs.get(key, {}))
+            self._notify(changes)
+        log = logger.info if self.built_at is None else logger.debug
+        self.mode = "inotify" if self._inotify else "rescan"
+        self.built_at = time.time()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+        log(f"File index: {count} entries in {len(dirs)} directories ({self.build_ms} ms, {self.mode})")
+
+    def _scan(self, relpath: str, dirs: Dict[str, Dict[str, Entry]], count: int) -> Optional[int]:
+        """Index the subtree at `relpath` into `dirs`; returns the running entry count (None over the cap)."""
+        stack = [relpath]
+        while stack:
+            current = stack.pop()
+            path = os.path.join(self.base_path, current)
+            self._watch(current, path)
+            listing: Dict[str, Entry] = {}
+            try:
+                with os.scandir(path) as it:
+                    for dirent in it:
+                        try:
+                            listing[dirent.name] = entry = _entry(dirent)
+                        except OSError:
+                            continue  # vanished while scanning
+                        if entry[0] == "dir":
+                            stack.append(join_relpath(current, dirent.name))
+            except OSError:
+                continue  # unreadable: not indexed, callers fall back to disk and see the error
+            dirs[current] = listing
+            count += len(listing)
+            if count > self.max_entries:
+                return None
+        return count
+
+    def _watch(self, relpath: str, path: str):
+        if not self._inotify or relpath in self._watched:
+            return
+        try:
+            wd = self._inotify.add_watch(path)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.warning("File index: out of inotify watches (fs.inotify.max_user_watches), "
+                               f"switching to re-scanning every {self.rescan_seconds:.0f}s")
+                self._inotify.close()
+                self._inotify = None
+                self._wds.clear()
+                self._watched.clear()
+            return
+        with self._lock:
+            self._wds[wd] = relpath
+            self._watched[relpath] = wd
+
+    # --- change handling ----------------------------------------------------
+
+    def _process(self, events: List[Tuple[int, int, str]]):
+        changed = set()
+        changes: List[FileChange] = []
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("File index: inotify queue overflowed, rebuilding")
+                self._rebuild()
+                return
+            if mask & IN_IGNORED:
+                relpath = self._wds.pop(wd, None)
+                if relpath is not None and self._watched.get(relpath) == wd:
+                    del self._watched[relpath]
+                continue
+            parent = self._wds.get(wd)
+            if parent is None or not name:
+                continue
+            changed.add(join_relpath(parent, name))
+        for relpath in sorted(changed):
+            changes += self._refresh(relpath)
+            if self._inotify is None and not self._stop.is_set():
+                # Ran out of watches while indexing a new subtree: fall back to full re-scans
+                self.mode = "rescan"
+                break
+        self._notify(changes)
+
+    def _refresh(self, relpath: str, deep: bool = True) -> List[FileChange]:
+        """Re-read one path (lstat) and update the index: add, update or remove it; returns the changes.
+
+        New directories are indexed (and watched) recursively when `deep`;
+        otherwise (our own writes, on the caller's thread) only one level is
+        listed and the watcher or the next re-scan completes it.
+        """
+        parent, name = _parent(relpath)
+        path = os.path.join(self.base_path, relpath)
+        entry: Optional[Entry] = None
+        try:
+            st = os.lstat(path)
+            if stat.S_ISDIR(st.st_mode):
+                entry = ("dir", 0, st.st_mtime)
+            elif stat.S_ISLNK(st.st_mode):
+                target = os.stat(path)
+                if stat.S_ISDIR(target.st_mode):
+                    entry = ("link_dir", 0, 0.0)
+                else:
+                    entry = ("file", target.st_size, target.st_mtime)
+            elif stat.S_ISREG(st.st_mode):
+                entry = ("file", st.st_size, st.st_mtime)
+            else:
+                entry = ("other", 0, 0.0)
+        except OSError:
+            entry = None  # gone (or dangling symlink)
+
+        changes: List[FileChange] = []
+        with self._lock:
+            listing = self._dirs.get(parent)
+            if listing is None:
+                return changes  # parent not indexed (unreadable, or itself just removed)
+            previous = listing.pop(name, None)
+            if previous:
+                self._entries -= 1
+            if previous and previous[0] == "dir" and (entry is None or entry[0] != "dir"):
+                changes += self._drop_subtree(relpath)
+            if entry is not None:
+                listing[name] = entry
+                self._entries += 1
+        change = _change(relpath, previous, entry)
+        if change:
+            changes.insert(0, change)
+        if not entry or entry[0] != "dir":
+            return changes
+
+        if deep:
+            if relpath in self._watched and relpath in self._dirs:
+                return changes
+            subtree: Dict[str, Dict[str, Entry]] = {}
+            count = self._scan(relpath, subtree, 0)
+        elif relpath not in self._dirs:
+            subtree = {}
+            try:
+                with os.scandir(path) as it:
+                    subtree[relpath] = {d.name: _entry(d) for d in it}
+            except OSError:
+                return changes
+            count = len(subtree[relpath])
+        else:
+            return changes
+        with self._lock:
+            if count is not None:
+                count += self._entries - sum(len(self._dirs.get(key, {})) for key in subtree)
+            if count is None or count > self.max_entries:
+                # Same as an oversized initial scan: give up and let callers walk the disk
+                logger.warning(f"File index disabled: more than {self.max_entries} entries under {self.base_path}")
+                self._disabled = True
+                self._stop.set()
+                return changes
+            for key, listing in sorted(subtree.items()):
+                old = self._dirs.get(key, {})
+                changes += _diff(key, old, listing)
+                self._entries += len(listing) - len(old)
+                self._dirs[key] = listing
+        return changes
+
+    def _drop_subtree(self, relpath: str) -> List[FileChange]:
+        """Forget a removed/moved directory and everything below it (lock held); returns the deletions."""
+        prefix = relpath + "/"
+        changes = []
+        for key in sorted(k for k in self._dirs if k == relpath or k.startswith(prefix)):
+            listing = self._dirs.pop(key)
+            changes += _diff(key, listing, {})
+            self._entries -= len(listing)
+            wd = self._watched.pop(key, None)
+            if wd is not None:
+                self._wds.pop(wd, None)
+                if self._inotify:
+                    self._inotify.rm_watch(wd)
+        return changes
+
+
+# Initialize global instances
+file_index = FileIndex(settings.HA_CONFIG_PATH, settings.FILE_INDEX_RESCAN_SECONDS, settings.FILE_INDEX_MAX_ENTRIES)
@@ -0,0 +1,191 @@
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+# Line terminators recognised when splitting (same set as universal-newline text mode)
+_LINE_RE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+$")
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """A diff or edit that does not apply to the current file content."""
+
+
+def content_etag(data: bytes) -> str:
+    """ETag of a file's bytes (BLAKE2b-128, hex)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def normalize_etag(value: str) -> str:
+    """Accept HTTP-style ETags too: W/"abc" or "abc" -> abc."""
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    return value.strip('"')
+
+
+def split_lines(text: str) -> List[str]:
+    """Lines with their original terminators."""
+    return _LINE_RE.findall(text)
+
+
+def _bare(line: str) -> str:
+    return line.rstrip("\r\n")
+
+
+def newline_of(lines: List[str]) -> str:
+    """The file's line terminator (from its first terminated line; "\\n" by default)."""
+    for line in lines:
+        if line.endswith("\r\n"):
+            return "\r\n"
+        if line.endswith(("\n", "\r")):
+            return line[-1]
+    return "\n"
+
+
+def _parse_diff(diff: str) -> List[Tuple[int, List[Tuple[str, str, bool]]]]:
+    """Hunks as (old start line, [(op, text, has_newline)]) from a unified diff.
+
+    Hunk bodies are delimited by the line counts in their @@ headers, so file
+    headers and other text between hunks are skipped.
+    """
+    hunks = []
+    current: Optional[List[Tuple[str, str, bool]]] = None
+    old_left = new_left = 0
+    raw_lines = diff.split("\n")
+    if raw_lines and raw_lines[-1] == "":
+        raw_lines.pop()
+    for raw in raw_lines:
+        raw = raw[:-1] if raw.endswith("\r") else raw
+        if raw.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            if current:
+                op, text, _ = current[-1]
+                current[-1] = (op, text, False)
+            continue
+        if old_left <= 0 and new_left <= 0:
+            header = _HUNK_RE.match(raw)
+            if header:
+                current = []
+                hunks.append((int(header.group(1)), current))
+                old_left = int(header.group(2)) if header.group(2) is not None else 1
+                new_left = int(header.group(4)) if header.group(4) is not None else 1
+            continue  # file headers (diff --git, index, ---/+++) and text between hunks
+        # Editors often strip the single space of blank context lines
+        op, text = (raw[:1], raw[1:]) if raw else (" ", "")
+        if op == " ":
+            old_left -= 1
+            new_left -= 1
+        elif op == "-":
+            old_left -= 1
+        elif op == "+":
+            new_left -= 1
+        else:
+            raise PatchError(f"Unexpected line in hunk: {raw[:80]!r}")
+        current.append((op, text, True))
+    if not hunks:
+        raise PatchError("No hunks found in diff (expected unified diff with @@ -a,b +c,d @@ headers)")
+    if old_left > 0 or new_left > 0:
+        raise PatchError("Diff ends in the middle of a hunk (line counts in the @@ header do not match)")
+    return hunks
+
+
+def _find(lines: List[str], block: List[str], expected: int) -> int:
+    """Where `block` (bare lines) occurs: at `expected` if it matches there, else its unique match."""
+    size = len(block)
+
+    def matches(at: int) -> bool:
+        return 0 <= at <= len(lines) - size and all(_bare(lines[at + i]) == block[i] for i in range(size))
+
+    if matches(expected):
+        return expected
+    if not block:
+        raise PatchError(f"Pure insertion at line {expected + 1} is beyond the end of the file")
+    found = [at for at in range(len(lines) - size + 1) if matches(at)]
+    if len(found) == 1:
+        return found[0]
+    context = block[0][:60]
+    if not found:
+        raise PatchError(f"Hunk expected at line {expected + 1} does not match the file (starting {context!r})")
+    raise PatchError(f"Hunk expected at line {expected + 1} matches {len(found)} places; add more context")
+
+
+def _terminated(line: str) -> bool:
+    return line.endswith(("\n", "\r"))
+
+
+def _terminate(lines: List[str], newline: str, last_too: bool):
+    """Ensure every line but the last (and the last too if `last_too`) ends with a terminator."""
+    for i, line in enumerate(lines):
+        if (i < len(lines) - 1 or last_too) and not _terminated(line):
+            lines[i] = line + newline
+
+
+def apply_unified_diff(lines: List[str], diff: str) -> Tuple[List[str], int, int]:
+    """Apply a unified diff; returns (new lines, lines added, lines removed).
+
+    Context and removed lines must match (line endings ignored). A hunk that
+    no longer sits at its stated line is applied where its context matches
+    uniquely; otherwise the whole patch is rejected. Context lines keep their
+    original bytes; added lines use the file's line terminator.
+    """
+    newline = newline_of(lines)
+    result = list(lines)
+    offset = cursor = added = removed = 0
+    for start, ops in _parse_diff(diff):
+        old = [text for op, text, _ in ops if op != "+"]
+        expected = (max(start - 1, 0) if old else start) + offset
+        at = _find(result, old, expected)
+        if at < cursor:
+            raise PatchError(f"Hunk at line {start} overlaps a previous hunk")
+        segment = result[at:at + len(old)]
+        rebuilt, i = [], 0
+        for op, text, has_newline in ops:
+            if op == " ":
+                rebuilt.append(segment[i])
+                i += 1
+            elif op == "-":
+                removed += 1
+                i += 1
+            else:
+                added += 1
+                rebuilt.append(text + (newline if has_newline else ""))
+        _terminate(rebuilt, newline, last_too=at + len(old) < len(result))
+        if at > 0 and rebuilt and not _terminated(result[at - 1]):
+            result[at - 1] += newline
+        result[at:at + len(old)] = rebuilt
+        offset += len(rebuilt) - len(old)
+        cursor = at + len(rebuilt)
+    return result, added, removed
+
+
+def apply_line_edits(lines: List[str], edits: List[Tuple[int, int, str]]) -> Tuple[List[str], int, int]:
+    """Replace 1-based inclusive line ranges; returns (new lines, lines added, lines removed).
+
+    Each edit is (start_line, end_line, content). end_line = start_line - 1
+    inserts before start_line without removing anything; empty content
+    deletes the range. Ranges refer to the original file and must not overlap.
+    Inserted lines use the file's line terminator.
+    """
+    newline = newline_of(lines)
+    ordered = sorted(edits, key=lambda e: (e[0], e[1]))
+    previous_end = 0
+    for start, end, _ in ordered:
+        if start < 1 or end < start - 1 or end > len(lines):
+            raise PatchError(f"Line range {start}-{end} is outside the file (1-{len(lines)})")
+        if start <= previous_end:
+            raise PatchError(f"Line range {start}-{end} overlaps another edit")
+        previous_end = max(previous_end, end)
+
+    result = list(lines)
+    added = removed = 0
+    for start, end, content in reversed(ordered):
+        replacement = [_bare(line) + newline if _terminated(line) else line for line in split_lines(content)]
+        keeps_newline = end < len(lines) or _terminated(content) or (end >= 1 and _terminated(lines[end - 1]))
+        _terminate(replacement, newline, last_too=keeps_newline)
+        if start > 1 and replacement and not _terminated(result[start - 2]):
+            result[start - 2] += newline
+        result[start - 1:end] = replacement
+        added += len(replacement)
+        removed += end - start + 1
+    return result, added, removed
@@ -0,0 +1,396 @@
+import asyncio
+import fnmatch
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.file_index import FileIndex, file_index, join_relpath
+
+logger = logging.getLogger(__name__)
+
+# Error details kept per scan (the count is always exact)
+MAX_REPORTED_ERRORS = 100
+# NDJSON streaming: lines per hand-off from the walking thread, and max delay before a partial batch is sent
+STREAM_BATCH = 200
+STREAM_FLUSH_SECONDS = 0.1
+# Grep: files in flight on the grep pool, bytes sniffed for NUL to detect binaries, max chars per returned line
+GREP_WINDOW = 32
+BINARY_SNIFF_BYTES = 8192
+MAX_LINE_CHARS = 500
+
+
+def glob_match(patterns: List[str], relpath: str, name: str) -> bool:
+    """fnmatch `patterns` against the name, or the /config-relative path if the pattern has a '/'."""
+    return any(fnmatch.fnmatchcase(relpath if "/" in p else name, p) for p in patterns)
+
+
+@dataclass
+class WalkSpec:
+    """What to walk and which files to report."""
+    root: Path
+    accept: Callable[[str], bool]  # file name filter (regex, extension set...)
+    include: Optional[List[str]] = None  # file globs; all files when empty
+    exclude: Optional[List[str]] = None  # file and directory globs; excluded directories are not entered
+    max_depth: Optional[int] = None  # 0 = root only, None = unlimited
+    max_results: Optional[int] = 1000  # None = unlimited
+
+
+@dataclass
+class GrepSpec:
+    """What to look for inside each file."""
+    regex: "re.Pattern[bytes]"
+    context: int = 0  # lines of context before/after each matching line
+    max_file_bytes: int = 4 * 1024 * 1024  # larger files are skipped
+
+
+def _line_text(raw: bytes) -> str:
+    text = raw.decode("utf-8", errors="replace").rstrip("\r")
+    return text if len(text) <= MAX_LINE_CHARS else text[:MAX_LINE_CHARS] + "…"
+
+
+def _grep_buffer(buf, relpath: str, grep: GrepSpec, limit: int) -> List[Dict[str, Any]]:
+    """Matching lines (one entry per line) in a bytes-like buffer, with optional context."""
+    size = len(buf)
+    matches = []
+    line_no, counted = 1, 0
+    pos = 0
+    while len(matches) < limit and pos < size:
+        m = grep.regex.search(buf, pos)
+        if not m:
+            break
+        start = buf.rfind(b"\n", 0, m.start()) + 1
+        end = buf.find(b"\n", m.start())
+        end = size if end == -1 else end
+        line_no += buf[counted:start].count(b"\n")
+        counted = start
+        match = {"path": relpath, "line": line_no, "text": _line_text(buf[start:end])}
+        if grep.context:
+            before, cur = [], start
+            while len(before) < grep.context and cur > 0:
+                s = buf.rfind(b"\n", 0, cur - 1) + 1
+                before.insert(0, _line_text(buf[s:cur - 1]))
+                cur = s
+            after, cur = [], end
+            while len(after) < grep.context and cur + 1 < size:
+                e = buf.find(b"\n", cur + 1)
+                e = size if e == -1 else e
+                after.append(_line_text(buf[cur + 1:e]))
+                cur = e
+            match["before"], match["after"] = before, after
+        matches.append(match)
+        pos = end + 1
+    return matches
+
+
+def _grep_file(base_path: str, relpath: str, grep: GrepSpec, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+    """(matches, skip reason, error) for one file, read through mmap.
+
+    The path is resolved first: a symlink leading out of `base_path` is
+    skipped ("outside_config") rather than read.
+    """
+    try:
+        path = os.path.realpath(os.path.join(base_path, relpath))
+        if os.path.commonpath([path, base_path]) != base_path:
+            return [], "outside_config", None
+        size = os.stat(path).st_size
+        if size > grep.max_file_bytes:
+            return [], "too_large", None
+        if size == 0:
+            return [], None, None
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+                return [], "binary", None
+            return _grep_buffer(mm, relpath, grep, limit), None, None
+    except (OSError, ValueError) as e:
+        return [], None, getattr(e, "strerror", None) or str(e)
+
+
+class FileWalker:
+    """os.scandir-based walker over the config directory.
+
+    Walks run on a small dedicated thread pool (FILE_SCAN_WORKERS) so a large
+    recursive scan neither blocks the event loop nor occupies the default
+    executor other tools use; content searches fan the selected files out to
+    a second pool (FILE_GREP_WORKERS). Directory listings come from the
+    FileIndex when it covers the directory, otherwise from os.scandir. Symlinked directories are not followed,
+    unreadable directories are reported instead of skipped silently, and a
+    walk stops at `max_results` and says so.
+    """
+
+    def __init__(self, base_path: Path, workers: int, grep_workers: int, index: Optional[FileIndex] = None):
+        self.base_path = base_path
+        self.index = index
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-walk")
+        self._grep_executor = ThreadPoolExecutor(max_workers=grep_workers, thread_name_prefix="file-grep")
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.base_path).replace("\\", "/")
+
+    def _list(self, path: str) -> Tuple[List[Tuple[str, str]], List[Dict[str, str]]]:
+        """(name, "dir"|"file") children of a directory, from the file index when it has it.
+
+        Returns the listing and per-entry errors; raises OSError if the
+        directory itself cannot be read.
+        """
+        relpath = self._relative(path)
+        indexed = self.index.listdir(relpath) if self.index else None
+        if indexed is not None:
+            return [(name, entry[0]) for name, entry in indexed if entry[0] in ("dir", "file")], []
+        listing, errors = [], []
+        with os.scandir(path) as it:
+            for dirent in sorted(it, key=lambda e: e.name):
+                try:
+                    if dirent.is_dir(follow_symlinks=False):
+                        listing.append((dirent.name, "dir"))
+                    elif dirent.is_file():
+                        listing.append((dirent.name, "file"))
+                except OSError as e:
+                    errors.append({"path": join_relpath(relpath, dirent.name), "error": e.strerror or str(e)})
+        return listing, errors
+
+    def _walk(self, spec: WalkSpec, cancel: threading.Event) -> Iterator[Tuple[str, Any]]:
+        """Yield ("dir", relpath), ("match", relpath) and ("error", {...}) in depth-first name order."""
+        stack = [(str(spec.root), 0)]
+        while stack and not cancel.is_set():
+            path, depth = stack.pop()
+            try:
+                listing, errors = self._list(path)
+            except OSError as e:
+                yield "error", {"path": self._relative(path), "error": e.strerror or str(e)}
+                continue
+            yield "dir", self._relative(path)
+            for error in errors:
+                yield "error", error
+
+            relbase = self._relative(path)
+            subdirs = []
+            for name, kind in listing:
+                relpath = join_relpath(relbase, name)
+                if spec.exclude and glob_match(spec.exclude, relpath, name):
+                    continue
+                if kind == "dir":
+                    if spec.max_depth is None or depth < spec.max_depth:
+                        subdirs.append(os.path.join(path, name))
+                    continue
+                if spec.include and not glob_match(spec.include, relpath, name):
+                    continue
+                if spec.accept(name):
+                    yield "match", relpath
+            stack.extend((p, depth + 1) for p in reversed(subdirs))
+
+    def entries(self, spec: WalkSpec, cancel: threading.Event) -> Iterator[Tuple[str, Any]]:
+        """("match", relpath) and ("error", {...}) for everything `spec` selects, ignoring max_results.
+
+        Blocking; for callers already on a worker thread (archive export).
+        """
+        return ((kind, value) for kind, value in self._walk(spec, cancel) if kind != "dir")
+
+    def _collect(self, spec: WalkSpec, cancel: threading.Event,
+                 emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        matches: List[str] = []
+        errors: List[Dict[str, str]] = []
+        error_count = 0
+        dirs = 0
+        truncated = False
+        for kind, value in self._walk(spec, cancel):
+            if kind == "dir":
+                dirs += 1
+            elif kind == "error":
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(value)
+                if emit:
+                    emit({"type": "error", **value})
+            elif spec.max_results is not None and len(matches) >= spec.max_results:
+                truncated = True
+                break
+            else:
+                matches.append(value)
+                if emit:
+                    emit({"type": "match", "path": value})
+        return {
+            "matches": matches,
+            "count": len(matches),
+            "truncated": truncated,
+            "errors": errors,
+            "error_count": error_count,
+            "scanned_dirs": dirs,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def scan(self, spec: WalkSpec) -> Dict[str, Any]:
+        """Walk on the file-walk pool and return matches plus truncation/error report."""
+        return await self._run(lambda cancel, emit: self._collect(spec, cancel, emit))
+
+    def stream(self, spec: WalkSpec) -> AsyncIterator[bytes]:
+        """scan() as NDJSON: one {"type": "match"|"error", ...} line per result, then {"type": "summary"}."""
+        return self._stream(lambda cancel, emit: self._collect(spec, cancel, emit), spec.root)
+
+    async def grep(self, spec: WalkSpec, grep: GrepSpec) -> Dict[str, Any]:
+        """Search the contents of the files `spec` selects; matches in walk order."""
+        return await self._run(lambda cancel, emit: self._grep(spec, grep, cancel, emit))
+
+    def stream_grep(self, spec: WalkSpec, grep: GrepSpec) -> AsyncIterator[bytes]:
+        """grep() as NDJSON: one line per match/error, then {"type": "summary"}."""
+        return self._stream(lambda cancel, emit: self._grep(spec, grep, cancel, emit), spec.root)
+
+    async def _run(self, job: Callable[[threading.Event, Optional[Callable]], Dict[str, Any]]) -> Dict[str, Any]:
+        cancel = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, job, cancel, None)
+        finally:
+            cancel.set()  # stop the thread if the request was cancelled
+
+    async def _stream(self, job: Callable[[threading.Event, Optional[Callable]], Dict[str, Any]],
+                      root: Path) -> AsyncIterator[bytes]:
+        """Run `job` on the walk pool, yielding what it emits as NDJSON and its result as the summary line.
+
+        The walking thread hands results over in small batches through a
+        bounded queue, so a slow client applies backpressure; a disconnect
+        stops the walk.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.FILE_STREAM_QUEUE)
+        cancel = threading.Event()
+        done = object()
+        batch: List[bytes] = []
+        flushed = time.monotonic()
+
+        def put(item):
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not cancel.is_set():
+                try:
+                    return future.result(timeout=0.5)
+                except FutureTimeout:
+                    continue
+            future.cancel()
+
+        def flush():
+            nonlocal batch, flushed
+            if batch:
+                put(b"".join(batch))
+                batch = []
+            flushed = time.monotonic()
+
+        def emit(item: Dict[str, Any]):
+            batch.append((json.dumps(item) + "\n").encode())
+            if len(batch) >= STREAM_BATCH or time.monotonic() - flushed > STREAM_FLUSH_SECONDS:
+                flush()
+
+        def run():
+            try:
+                summary = job(cancel, emit)
+                summary.pop("matches")
+                emit({"type": "summary", **summary})
+            except Exception as e:
+                logger.error(f"File walk of {root} failed: {e}")
+                emit({"type": "error", "path": self._relative(str(root)), "error": str(e)})
+            finally:
+                flush()
+                put(done)
+
+        task = loop.run_in_executor(self._executor, run)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            cancel.set()
+            await asyncio.shield(task)
+
+    def _grep(self, spec: WalkSpec, grep: GrepSpec, cancel: threading.Event,
+              emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Walk on this thread, grep files on the grep pool, consume results in walk order."""
+        started = time.perf_counter()
+        matches: List[Dict[str, Any]] = []
+        errors: List[Dict[str, str]] = []
+        skipped: List[Dict[str, str]] = []
+        counts = {"errors": 0, "dirs": 0, "searched": 0, "matched": 0, "binary": 0, "too_large": 0, "outside_config": 0}
+        truncated = False
+        pending: Deque[Tuple[str, Future]] = deque()
+        base = os.path.realpath(self.base_path)
+
+        def error(value: Dict[str, str]):
+            counts["errors"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(value)
+            if emit:
+                emit({"type": "error", **value})
+
+        def consume() -> bool:
+            """Take the oldest pending file's result; False once max_results is reached."""
+            nonlocal truncated
+            relpath, future = pending.popleft()
+            found, skip, err = future.result()
+            if err:
+                error({"path": relpath, "error": err})
+            elif skip:
+                counts[skip] += 1
+                if len(skipped) < MAX_REPORTED_ERRORS:
+                    skipped.append({"path": relpath, "reason": skip})
+            else:
+                counts["searched"] += 1
+            if found:
+                counts["matched"] += 1
+                room = spec.max_results - len(matches)
+                if len(found) > room:
+                    found, truncated = found[:room], True
+                matches.extend(found)
+                if emit:
+                    for match in found:
+                        emit({"type": "match", **match})
+            return len(matches) < spec.max_results
+
+        walk = self._walk(spec, cancel)
+        try:
+            for kind, value in walk:
+                if kind == "dir":
+                    counts["dirs"] += 1
+                    continue
+                if kind == "error":
+                    error(value)
+                    continue
+                pending.append((value, self._grep_executor.submit(
+                    _grep_file, base, value, grep, spec.max_results)))
+                if len(pending) >= GREP_WINDOW and not consume():
+                    break
+            while pending and not cancel.is_set() and consume():
+                pass
+            if len(matches) >= spec.max_results and (pending or next(walk, None) is not None):
+                truncated = True
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+        return {
+            "matches": matches,
+            "count": len(matches),
+            "truncated": truncated,
+            "files_searched": counts["searched"],
+            "files_matched": counts["matched"],
+            "skipped": {"binary": counts["binary"], "too_large": counts["too_large"],
+                        "outside_config": counts["outside_config"]},
+            "skipped_files": skipped,
+            "errors": errors,
+            "error_count": counts["errors"],
+            "scanned_dirs": counts["dirs"],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+# Initialize global instances
+file_walker = FileWalker(settings.HA_CONFIG_PATH, settings.FILE_SCAN_WORKERS, settings.FILE_GREP_WORKERS, file_index)
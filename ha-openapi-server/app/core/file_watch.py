@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.file_index import FileChange, FileIndex, file_index
+from app.core.file_walker import glob_match
+
+logger = logging.getLogger(__name__)
+
+CHANGE_TYPES = ("created", "modified", "deleted")
+
+
+class WatchFilter:
+    """Which changes a subscriber wants: a directory, include/exclude globs and change types."""
+
+    def __init__(self, root: str = ".", include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 types: Optional[List[str]] = None):
+        self.root = root
+        self.include = include
+        self.exclude = exclude
+        self.types = set(types or CHANGE_TYPES)
+
+    def matches(self, relpath: str) -> bool:
+        if self.root != "." and relpath != self.root and not relpath.startswith(self.root + "/"):
+            return False
+        if self.exclude:
+            # A glob excludes the path if it matches it or any directory above it (like walks, which don't enter them)
+            parts = relpath.split("/")
+            for i in range(1, len(parts) + 1):
+                if glob_match(self.exclude, "/".join(parts[:i]), parts[i - 1]):
+                    return False
+        return not self.include or glob_match(self.include, relpath, relpath.rpartition("/")[2])
+
+
+class _Subscription:
+    """Pending changes for one subscriber, coalesced per path until it takes them."""
+
+    def __init__(self, watch_filter: WatchFilter, max_pending: int):
+        self.filter = watch_filter
+        self.max_pending = max_pending
+        self.pending: Dict[str, FileChange] = {}
+        self.overflowed = False
+        self.wakeup = asyncio.Event()
+
+    def offer(self, changes: List[FileChange]):
+        for change in changes:
+            path = change["path"]
+            if not self.filter.matches(path):
+                continue
+            previous = self.pending.pop(path, None)
+            if previous:
+                if previous["type"] == "created" and change["type"] == "deleted":
+                    continue  # came and went within the window
+                if previous["type"] == "created":
+                    change = {**change, "type": "created"}
+                elif previous["type"] == "deleted" and change["type"] == "created":
+                    change = {**change, "type": "modified"}  # replaced (e.g. written via rename)
+            self.pending[path] = change
+        if len(self.pending) > self.max_pending:
+            self.pending.clear()
+            self.overflowed = True
+        if self.pending or self.overflowed:
+            self.wakeup.set()
+
+    def take(self) -> List[FileChange]:
+        self.wakeup.clear()
+        changes = [c for c in self.pending.values() if c["type"] in self.filter.types]
+        self.pending = {}
+        return changes
+
+
+class FileWatch:
+    """Fans FileIndex change batches out to /watch_files subscribers.
+
+    The index reports changes from its own thread; they are handed to the
+    event loop once per batch and filtered into each subscriber's pending
+    map, where repeated events for a path collapse into one (created then
+    modified = created, created then deleted = nothing, deleted then created
+    = modified). A subscriber that falls more than FILE_WATCH_MAX_PENDING
+    paths behind gets an overflow marker instead and should re-list.
+    """
+
+    def __init__(self, index: FileIndex, max_pending: int):
+        self.index = index
+        self.max_pending = max_pending
+        self._subscribers: Set[_Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Register with the file index (call from the event loop, before the index starts)."""
+        self._loop = asyncio.get_running_loop()
+        self.index.add_listener(self._on_changes)
+
+    def _on_changes(self, changes: List[FileChange]):
+        loop = self._loop
+        if loop is not None and self._subscribers and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, changes)
+
+    def _dispatch(self, changes: List[FileChange]):
+        for subscription in list(self._subscribers):
+            subscription.offer(changes)
+
+    async def subscribe(self, watch_filter: WatchFilter, coalesce_seconds: float,
+                        heartbeat_seconds: float) -> AsyncIterator[Optional[List[FileChange]]]:
+        """Yield batches of coalesced changes (None when `heartbeat_seconds` pass without any).
+
+        A batch of [{"type": "overflow"}] means changes were dropped.
+        """
+        subscription = _Subscription(watch_filter, self.max_pending)
+        self._subscribers.add(subscription)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.wakeup.wait(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if coalesce_seconds > 0:
+                    await asyncio.sleep(coalesce_seconds)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    subscription.take()
+                    yield [{"type": "overflow"}]
+                    continue
+                changes = subscription.take()
+                if changes:
+                    yield changes
+        finally:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers)}
+
+
+# Initialize global instances
+file_watch = FileWatch(file_index, settings.FILE_WATCH_MAX_PENDING)
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from app.core.clients import ha_api, get_ws_client
+from app.core.config import settings
+from app.core.timeseries import bucket_aggregate, lttb, parse_ha_timestamp, to_numeric_series
+
+logger = logging.getLogger(__name__)
+
+
+def parse_time(value: str) -> datetime:
+    """Parse an ISO 8601 time from a request (naive times are taken as UTC)."""
+    dt = datetime.fromisoformat(value.strip().replace(" ", "T").replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def format_ha_time(dt: datetime) -> str:
+    """Format a datetime the way HA's /history/period endpoint expects it."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+async def fetch_history(
+    entity_ids: Optional[List[str]],
+    start: str,
+    end: Optional[str] = None,
+    minimal_response: bool = False,
+    significant_changes_only: bool = False,
+    no_attributes: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """Fetch state history from HA REST /history/period/<start>.
+
+    Returns HA's native shape: a list of lists (one per entity_id), each
+    containing state dicts ordered by last_changed.
+    """
+    endpoint = f"/history/period/{quote(start)}"
+    params = []
+    if entity_ids:
+        params.append(f"filter_entity_id={quote(','.join(entity_ids))}")
+    if end:
+        params.append(f"end_time={quote(end)}")
+    if minimal_response:
+        params.append("minimal_response")
+    if significant_changes_only:
+        params.append("significant_changes_only")
+    if no_attributes:
+        params.append("no_attributes")
+    if params:
+        endpoint += "?" + "&".join(params)
+
+    result = await ha_api.call_api("GET", endpoint)
+    return result if isinstance(result, list) else []
+
+
+async def fetch_history_range(
+    entity_ids: Optional[List[str]],
+    start: float,
+    end: Optional[float] = None,
+    minimal_response: bool = False,
+    significant_changes_only: bool = False,
+    no_attributes: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """Fetch history for [start, end) (epoch seconds) in parallel chunks.
+
+    Long windows are split into HISTORY_CHUNK_HOURS time chunks and large
+    entity lists into groups of HISTORY_ENTITY_GROUP_SIZE. Chunks are fetched
+    with bounded concurrency (each bounded by `end_time`, so HA's recorder
+    only scans a slice at a time), failed chunks are retried individually,
+    and results are merged in time order as they arrive. Returns HA's native
+    list-of-lists shape.
+    """
+    end = end if end is not None else time.time()
+    chunk = settings.HISTORY_CHUNK_HOURS * 3600
+    windows = []
+    a = start
+    while a < end:
+        windows.append((a, min(a + chunk, end)))
+        a += chunk
+    windows = windows or [(start, end)]
+    group_size = settings.HISTORY_ENTITY_GROUP_SIZE
+    groups = [entity_ids[i:i + group_size] for i in range(0, len(entity_ids), group_size)] if entity_ids else [None]
+
+    semaphore = asyncio.Semaphore(settings.HISTORY_FETCH_CONCURRENCY)
+
+    async def fetch_chunk(g: int, w: int):
+        a, b = windows[w]
+        for attempt in range(settings.HISTORY_FETCH_RETRIES + 1):
+            try:
+                async with semaphore:
+                    rows = await fetch_history(
+                        groups[g], format_ha_time(datetime.fromtimestamp(a, timezone.utc)),
+                        end=format_ha_time(datetime.fromtimestamp(b, timezone.utc)),
+                        minimal_response=minimal_response,
+                        significant_changes_only=significant_changes_only,
+                        no_attributes=no_attributes,
+                    )
+                return g, w, rows
+            except Exception as e:
+                if attempt == settings.HISTORY_FETCH_RETRIES:
+                    raise RuntimeError(f"History chunk {_iso(a)}..{_iso(b)} failed after {attempt + 1} attempts: {e}") from e
+                logger.warning(f"History chunk {_iso(a)}..{_iso(b)} failed ({e}), retrying")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    # Per group: next window index to merge, and chunks that arrived early
+    next_window = [0] * len(groups)
+    pending: Dict[Tuple[int, int], List[List[Dict[str, Any]]]] = {}
+
+    tasks = [asyncio.create_task(fetch_chunk(g, w)) for g in range(len(groups)) for w in range(len(windows))]
+    try:
+        for done in asyncio.as_completed(tasks):
+            g, w, rows = await done
+            pending[(g, w)] = rows
+            # Merge every contiguous chunk for this group; out-of-order ones wait
+            while (g, next_window[g]) in pending:
+                for entity_rows in pending.pop((g, next_window[g])):
+                    _append_chunk(merged, entity_rows, minimal_response)
+                next_window[g] += 1
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if entity_ids:
+        return [merged[e] for e in entity_ids if e in merged]
+    return list(merged.values())
+
+
+def _append_chunk(merged: Dict[str, List[Dict[str, Any]]], rows: List[Dict[str, Any]], minimal_response: bool):
+    """Append one chunk of an entity's history, dropping the repeated boundary row."""
+    if not rows:
+        return
+    entity_id = rows[0].get("entity_id")
+    existing = merged.get(entity_id)
+    if existing is None:
+        merged[entity_id] = list(rows)
+        return
+    first = rows[0]
+    # Each chunk starts with HA's "state at chunk start" row; skip it when nothing changed
+    if first.get("state") == existing[-1].get("state"):
+        rows = rows[1:]
+    elif minimal_response:
+        rows = [{"state": first.get("state"), "last_changed": first.get("last_changed")}] + rows[1:]
+    existing.extend(rows)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def aggregate_history(
+    history: List[List[Dict[str, Any]]],
+    start: float,
+    end: float,
+    bucket: Optional[int] = None,
+    agg: str = "mean",
+    downsample: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Reduce raw HA history to compact per-entity series.
+
+    With `bucket` (seconds) each entity is aggregated into fixed time
+    buckets using `agg`; with `downsample` the (raw or bucketed) series is
+    LTTB-reduced to at most that many points. Output per entity:
+    {"entity_id", "unit_of_measurement", "bucket", "agg", "points": [[iso_time, value], ...]}.
+    """
+    series = []
+    for states in history:
+        if not states:
+            continue
+        first = states[0]
+        ts, vals = to_numeric_series(states)
+        if bucket:
+            ts, vals = bucket_aggregate(ts, vals, start, end, bucket, agg)
+        if downsample:
+            ts, vals = lttb(ts, vals, downsample)
+        series.append({
+            "entity_id": first.get("entity_id"),
+            "unit_of_measurement": first.get("attributes", {}).get("unit_of_measurement"),
+            "bucket": bucket,
+            "agg": agg if bucket else None,
+            "points": [[_iso(t), round(float(v), 6)] for t, v in zip(ts.tolist(), vals.tolist())],
+        })
+    return series
+
+
+STATISTIC_TYPES = ("mean", "min", "max", "sum", "state", "change")
+
+
+def _stat_time(value: Any) -> Optional[float]:
+    """Statistics rows carry epoch milliseconds (HA 2023.3+) or ISO strings (older)."""
+    if isinstance(value, (int, float)):
+        return value / 1000.0
+    return parse_ha_timestamp(value)
+
+
+async def fetch_statistics(
+    statistic_ids: List[str],
+    start: float,
+    end: Optional[float] = None,
+    period: str = "hour",
+    types: Optional[List[str]] = None,
+    units: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Fetch long-term statistics via WebSocket recorder/statistics_during_period.
+
+    Returns {statistic_id: {"name", "unit_of_measurement", "rows": [{"start": epoch, <type>: value, ...}]}}.
+    `units` maps unit classes to target units (e.g. {"energy": "kWh"}) and
+    is applied by HA; the reported unit reflects the conversion.
+    """
+    ws = await get_ws_client()
+    params: Dict[str, Any] = {
+        "start_time": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+        "statistic_ids": statistic_ids,
+        "period": period,
+    }
+    if end is not None:
+        params["end_time"] = datetime.fromtimestamp(end, timezone.utc).isoformat()
+    if types:
+        params["types"] = types
+    if units:
+        params["units"] = units
+    result = await ws.call_command("recorder/statistics_during_period", **params)
+    metadata = await ws.call_command("recorder/get_statistics_metadata", statistic_ids=statistic_ids)
+
+    meta_by_id = {m.get("statistic_id"): m for m in (metadata or [])}
+    stats = {}
+    for statistic_id in statistic_ids:
+        rows = (result or {}).get(statistic_id)
+        if not rows:
+            continue
+        meta = meta_by_id.get(statistic_id, {})
+        unit = (units or {}).get(meta.get("unit_class")) or meta.get("statistics_unit_of_measurement")
+        stats[statistic_id] = {
+            "name": meta.get("name"),
+            "unit_of_measurement": unit,
+            "rows": [dict(row, start=_stat_time(row.get("start"))) for row in rows],
+        }
+    return stats
+
+
+def statistics_series(
+    stats: Dict[str, Dict[str, Any]],
+    period: str,
+    agg: str = "mean",
+    downsample: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Shape fetched statistics like bucketed history (see aggregate_history)."""
+    series = []
+    for statistic_id, stat in stats.items():
+        ts, vals = statistics_arrays(stat["rows"], [agg])
+        if downsample:
+            ts, vals = lttb(ts, vals, downsample)
+        series.append({
+            "entity_id": statistic_id,
+            "unit_of_measurement": stat["unit_of_measurement"],
+            "bucket": period,
+            "agg": agg,
+            "points": [[_iso(t), round(float(v), 6)] for t, v in zip(ts.tolist(), vals.tolist())],
+        })
+    return series
+
+
+def statistics_arrays(rows: List[Dict[str, Any]], fields: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(start timestamps, values) from statistics rows, taking the first non-null of `fields`."""
+    ts, vals = [], []
+    for row in rows:
+        value = next((row[f] for f in fields if row.get(f) is not None), None)
+        if row.get("start") is not None and value is not None:
+            ts.append(row["start"])
+            vals.append(value)
+    return np.array(ts, dtype=np.float64), np.array(vals, dtype=np.float64)
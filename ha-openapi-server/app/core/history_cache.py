@@ -0,0 +1,240 @@
+import logging
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.history import fetch_history_range
+from app.core.timeseries import parse_ha_timestamp, state_to_float
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[float, float]
+
+
+class EntitySeries:
+    """Array-backed state history for one entity plus the intervals it covers.
+
+    `ts` holds epoch seconds, `vals` the numeric value (NaN if non-numeric)
+    and `states` the raw (interned) state strings. Covered intervals are
+    kept sorted and non-overlapping; each fetched interval starts with HA's
+    synthetic "state at start" row, so the state in effect at any covered
+    instant is always known. Rows newer than the recorder's commit lag are
+    kept but not marked covered (`fetched_to` is how far they reach), so
+    the next fetch re-reads them and picks up late commits.
+    """
+
+    __slots__ = ("ts", "vals", "states", "intervals", "attributes", "fetched_to")
+
+    def __init__(self):
+        self.ts = np.empty(0, dtype=np.float64)
+        self.vals = np.empty(0, dtype=np.float64)
+        self.states = np.empty(0, dtype=object)
+        self.intervals: List[Interval] = []
+        self.attributes: Dict[str, Any] = {}
+        self.fetched_to = 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.vals.nbytes + self.states.nbytes + 16 * len(self.intervals)
+
+    def missing(self, start: float, end: float) -> List[Interval]:
+        """Return the sub-intervals of [start, end) not covered yet."""
+        gaps = []
+        cursor = start
+        for a, b in self.intervals:
+            if b <= cursor:
+                continue
+            if a >= end:
+                break
+            if a > cursor:
+                gaps.append((cursor, min(a, end)))
+            cursor = max(cursor, b)
+            if cursor >= end:
+                break
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def merge(self, start: float, end: float, rows: List[Dict[str, Any]], committed: Optional[float] = None):
+        """Merge HA history rows fetched for [start, end) into the arrays.
+
+        Only [start, committed) is marked covered; rows after `committed`
+        may still be joined by rows the recorder has not written yet.
+        """
+        new_ts = np.fromiter(
+            (parse_ha_timestamp(r.get("last_changed") or r.get("last_updated")) or np.nan for r in rows),
+            dtype=np.float64, count=len(rows),
+        )
+        new_states = np.array([sys.intern(str(r.get("state"))) for r in rows], dtype=object)
+        mask = (new_ts >= start) & (new_ts < end)
+        new_ts, new_states = new_ts[mask], new_states[mask]
+
+        left = self.ts < start
+        right = self.ts >= end
+        # Drop HA's synthetic boundary rows when they only repeat the neighbouring state
+        if len(new_ts) and left.any() and new_ts[0] == start and new_states[0] == self.states[left][-1]:
+            new_ts, new_states = new_ts[1:], new_states[1:]
+        if right.any() and (len(new_ts) or left.any()):
+            prev_state = new_states[-1] if len(new_ts) else self.states[left][-1]
+            first_right = np.argmax(right)
+            if self.ts[first_right] == end and self.states[first_right] == prev_state:
+                right[first_right] = False
+
+        new_vals = np.fromiter((state_to_float(s) for s in new_states), dtype=np.float64, count=len(new_states))
+        self.ts = np.concatenate([self.ts[left], new_ts, self.ts[right]])
+        self.vals = np.concatenate([self.vals[left], new_vals, self.vals[right]])
+        self.states = np.concatenate([self.states[left], new_states, self.states[right]])
+        covered_end = end if committed is None else min(end, committed)
+        if covered_end > start:
+            self._add_interval(start, covered_end)
+        if covered_end < end:
+            self.fetched_to = max(self.fetched_to, end)
+
+        if rows and rows[0].get("attributes"):
+            self.attributes = rows[0]["attributes"]
+
+    def _add_interval(self, start: float, end: float):
+        merged = []
+        for a, b in sorted(self.intervals + [(start, end)]):
+            if merged and a <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+            else:
+                merged.append((a, b))
+        self.intervals = merged
+
+    def to_rows(self, entity_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        """Render [start, end] in HA's minimal_response history shape."""
+        i0 = int(np.searchsorted(self.ts, start, side="right")) - 1
+        i1 = int(np.searchsorted(self.ts, end, side="right"))
+        rows = []
+        if i0 >= 0:
+            # State in effect at `start`, stamped with the window start like HA does
+            first_time = datetime.fromtimestamp(start, timezone.utc).isoformat()
+            rows.append({
+                "entity_id": entity_id,
+                "state": self.states[i0],
+                "last_changed": first_time,
+                "last_updated": first_time,
+                "attributes": self.attributes,
+            })
+        for t, state in zip(self.ts[i0 + 1:i1].tolist(), self.states[i0 + 1:i1].tolist()):
+            rows.append({"state": state, "last_changed": datetime.fromtimestamp(t, timezone.utc).isoformat()})
+        if rows and "entity_id" not in rows[0]:
+            rows[0].update(entity_id=entity_id, attributes=self.attributes)
+        return rows
+
+
+def _unfetched_from(series: Optional[EntitySeries], gap: Interval) -> float:
+    """Where a gap's never-fetched part starts (its uncommitted head was already fetched once)."""
+    if series is not None and gap[0] <= series.fetched_to < gap[1]:
+        return series.fetched_to
+    return gap[0]
+
+
+class HistoryCache:
+    """Per-entity local history cache that only fetches what it hasn't seen.
+
+    Rolling-window queries ("last 24h" every few minutes) turn into a small
+    tail fetch from HA; entities missing the same interval are fetched
+    together. Memory is bounded by LRU eviction on total array bytes.
+    """
+
+    def __init__(self, max_bytes: int, min_refresh: float, commit_lag: float):
+        self.max_bytes = max_bytes
+        self.min_refresh = min_refresh
+        self.commit_lag = commit_lag
+        self._series: "OrderedDict[Tuple[str, bool], EntitySeries]" = OrderedDict()
+        self.hits = 0
+        self.fetches = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self._series.values())
+
+    async def get(
+        self,
+        entity_ids: List[str],
+        start: float,
+        end: Optional[float] = None,
+        significant_changes_only: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """Return minimal_response-shaped history for [start, end], fetching only gaps.
+
+        `end=None` means "now"; tails shorter than `min_refresh` seconds are
+        served from cache without contacting HA. The last `commit_lag`
+        seconds are never marked covered, so rows the recorder commits late
+        are picked up by the next fetch.
+        """
+        now = float(int(time.time()))
+        end = min(end, now) if end is not None else now
+        start = float(int(start))
+        committed = now - self.commit_lag
+
+        # Group entities by the exact gaps they need, so shared tails are one request
+        wanted: Dict[Tuple[Interval, ...], List[str]] = {}
+        for entity_id in entity_ids:
+            series = self._series.get((entity_id, significant_changes_only))
+            gaps = series.missing(start, end) if series else [(start, end)]
+            gaps = tuple(g for g in gaps if g[0] == start or g[1] - _unfetched_from(series, g) >= self.min_refresh)
+            if gaps:
+                wanted.setdefault(gaps, []).append(entity_id)
+
+        for gaps, ids in wanted.items():
+            for a, b in gaps:
+                self.fetches += 1
+                history = await fetch_history_range(
+                    ids, a, b,
+                    minimal_response=True,
+                    significant_changes_only=significant_changes_only,
+                )
+                by_entity = {rows[0].get("entity_id"): rows for rows in history if rows}
+                for entity_id in ids:
+                    self._series_for(entity_id, significant_changes_only).merge(a, b, by_entity.get(entity_id, []), committed)
+        if not wanted:
+            self.hits += 1
+
+        result = []
+        for entity_id in entity_ids:
+            series = self._series.get((entity_id, significant_changes_only))
+            if series is not None:
+                self._series.move_to_end((entity_id, significant_changes_only))
+                rows = series.to_rows(entity_id, start, end)
+                if rows:
+                    result.append(rows)
+        self._evict()
+        return result
+
+    def _series_for(self, entity_id: str, significant_changes_only: bool) -> EntitySeries:
+        key = (entity_id, significant_changes_only)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = EntitySeries()
+        return series
+
+    def _evict(self):
+        total = self.nbytes
+        while total > self.max_bytes and len(self._series) > 1:
+            _, series = self._series.popitem(last=False)
+            total -= series.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entities": len(self._series),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "fetches": self.fetches,
+        }
+
+
+# Initialize global instances
+history_cache = HistoryCache(
+    settings.HISTORY_CACHE_MAX_BYTES,
+    settings.HISTORY_CACHE_MIN_REFRESH_SECONDS,
+    settings.HISTORY_CACHE_COMMIT_LAG_SECONDS,
+)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.recorder_db import RecorderDatabase, recorder_db
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RecorderAnalysis:
+    """State of one recorder analysis run (polled by /analyze_recorder)."""
+    status: str = "running"  # running | done | error
+    stage: str = "starting"
+    progress: float = 0.0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class RecorderAnalyzer:
+    """Explains recorder database growth: which entities and events take the space.
+
+    The analysis is a handful of full-table GROUP BY scans, so it runs on the
+    recorder worker pool as a background job that reports its stage and
+    progress, and the finished result is cached for
+    RECORDER_ANALYSIS_CACHE_SECONDS.
+    """
+
+    def __init__(self, db: RecorderDatabase, cache_seconds: int):
+        self.db = db
+        self.cache_seconds = cache_seconds
+        self.job: Optional[RecorderAnalysis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, refresh: bool = False) -> RecorderAnalysis:
+        """Return the running/cached job, starting a new one if needed."""
+        job = self.job
+        if job and job.status == "running":
+            return job
+        fresh = job and job.status == "done" and time.time() - job.finished_at < self.cache_seconds
+        if fresh and not refresh:
+            return job
+
+        self.job = job = RecorderAnalysis()
+        self._task = asyncio.create_task(self._run(job))
+        return job
+
+    async def wait(self, job: RecorderAnalysis, timeout: float):
+        """Wait up to `timeout` seconds for `job` to finish."""
+        if job.status == "running" and self._task and timeout > 0:
+            await asyncio.wait({self._task}, timeout=timeout)
+
+    async def _run(self, job: RecorderAnalysis):
+        try:
+            job.result = await self.db.run(self._analyze, job)
+            job.status = "done"
+            job.stage = "done"
+            job.progress = 1.0
+        except Exception as e:
+            logger.error(f"Recorder analysis failed: {e}", exc_info=True)
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def _analyze(self, conn: sqlite3.Connection, job: RecorderAnalysis) -> Dict[str, Any]:
+        def stage(name: str, progress: float):
+            job.stage, job.progress = name, progress
+
+        stage("database size", 0.05)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        wal = self.db.path.with_name(self.db.path.name + "-wal")
+        db_bytes = page_size * page_count
+
+        stage("table sizes", 0.1)
+        table_bytes = _table_sizes(conn)
+        row_counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("states", "state_attributes", "events", "event_data", "statistics", "statistics_short_term")
+        }
+        # Bytes per states row including its indexes; falls back to an even split of the file
+        states_bytes = sum(v for k, v in table_bytes.items() if k == "states" or k.startswith("ix_states_"))
+        if not states_bytes:
+            states_bytes = db_bytes * row_counts["states"] / max(1, sum(row_counts.values()))
+        bytes_per_state_row = states_bytes / max(1, row_counts["states"])
+
+        stage("states per entity", 0.2)
+        entities = {}
+        for metadata_id, entity_id, rows, changes, first_ts, last_ts in conn.execute(
+            "SELECT s.metadata_id, m.entity_id, COUNT(*), SUM(s.last_changed_ts IS NULL), "
+            "MIN(s.last_updated_ts), MAX(s.last_updated_ts) "
+            "FROM states s LEFT JOIN states_meta m ON m.metadata_id = s.metadata_id GROUP BY s.metadata_id"
+        ):
+            span_hours = max((last_ts or 0) - (first_ts or 0), 3600) / 3600
+            entities[metadata_id] = {
+                "entity_id": entity_id,
+                "rows": rows,
+                "state_changes": changes or 0,
+                "attribute_only_updates": rows - (changes or 0),
+                "rows_per_hour": round(rows / span_hours, 2),
+                "attribute_bytes": 0,
+                "distinct_attribute_sets": 0,
+            }
+
+        stage("attribute payloads", 0.6)
+        for metadata_id, sets, attr_bytes in conn.execute(
+            "SELECT d.metadata_id, COUNT(*), SUM(LENGTH(a.shared_attrs)) "
+            "FROM (SELECT DISTINCT metadata_id, attributes_id FROM states) d "
+            "JOIN state_attributes a ON a.attributes_id = d.attributes_id GROUP BY d.metadata_id"
+        ):
+            if metadata_id in entities:
+                entities[metadata_id]["distinct_attribute_sets"] = sets
+                entities[metadata_id]["attribute_bytes"] = attr_bytes or 0
+
+        stage("events per type", 0.85)
+        events = [
+            {"event_type": event_type or f"<id {type_id}>", "rows": rows}
+            for type_id, event_type, rows in conn.execute(
+                "SELECT e.event_type_id, t.event_type, COUNT(*) FROM events e "
+                "LEFT JOIN event_types t ON t.event_type_id = e.event_type_id "
+                "GROUP BY e.event_type_id ORDER BY COUNT(*) DESC"
+            )
+        ]
+
+        stage("estimating savings", 0.95)
+        ranked = []
+        for info in entities.values():
+            savings = info["rows"] * bytes_per_state_row + info["attribute_bytes"]
+            info["estimated_savings_bytes"] = int(savings)
+            info["estimated_savings_pct"] = round(100 * savings / max(1, db_bytes), 2)
+            ranked.append(info)
+        ranked.sort(key=lambda e: e["estimated_savings_bytes"], reverse=True)
+
+        threshold = settings.RECORDER_EXCLUDE_MIN_PCT
+        exclude = [e["entity_id"] for e in ranked if e["entity_id"] and e["estimated_savings_pct"] >= threshold]
+
+        return {
+            "database": {
+                "path": str(self.db.path),
+                "size_bytes": db_bytes,
+                "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+                "free_bytes": freelist * page_size,
+                "table_bytes": table_bytes,
+                "row_counts": row_counts,
+                "bytes_per_state_row": round(bytes_per_state_row, 1),
+            },
+            "entities": ranked,
+            "event_types": events,
+            "suggested_exclude": exclude,
+            "suggested_exclude_bytes": sum(e["estimated_savings_bytes"] for e in ranked if e["entity_id"] in exclude),
+        }
+
+
+def _table_sizes(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Bytes per table/index from the dbstat virtual table ({} if not compiled in)."""
+    try:
+        return {name: size for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")}
+    except sqlite3.OperationalError:
+        return {}
+
+
+def exclude_yaml(entity_ids: List[str]) -> str:
+    """Recorder exclude snippet for configuration.yaml."""
+    lines = ["recorder:", "  exclude:", "    entities:"]
+    lines += [f"      - {entity_id}" for entity_id in entity_ids]
+    return "\n".join(lines) + "\n"
+
+
+# Initialize global instances
+recorder_analyzer = RecorderAnalyzer(recorder_db, settings.RECORDER_ANALYSIS_CACHE_SECONDS)
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Period lengths for statistics aggregated from hourly rows (week/month handled by calendar)
+_PERIOD_SECONDS = {"5minute": 300, "hour": 3600, "day": 86400}
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+class RecorderDatabase:
+    """Read-only access to the HA recorder SQLite database (home-assistant_v2.db).
+
+    Opens the file with SQLite's `mode=ro` (optionally `immutable=1`) so it
+    can never write to or lock HA's database, and runs every query on a
+    small dedicated thread pool with one connection per worker. Queries use
+    the recorder's own (metadata_id, last_updated_ts) / (metadata_id,
+    start_ts) indexes. Requires the modern schema (HA 2023.4+: states_meta,
+    *_ts columns); MariaDB/PostgreSQL recorders are not supported.
+    """
+
+    def __init__(self, path: Path, immutable: bool = False, workers: int = 2):
+        self.path = path
+        self.immutable = immutable
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recorder-db")
+        self._local = threading.local()
+
+    @property
+    def available(self) -> bool:
+        return self.path.is_file()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open (or reuse) this thread's read-only connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not self.available:
+                raise FileNotFoundError(f"Recorder database not found at {self.path}")
+            uri = f"file:{quote(str(self.path))}?mode=ro"
+            if self.immutable:
+                uri += "&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "states_meta" not in tables:
+                conn.close()
+                raise RuntimeError("Recorder database uses a legacy schema (no states_meta table); HA 2023.4+ required")
+            self._local.conn = conn
+        return conn
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run `fn(conn, *args)` on the recorder worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: fn(self.connect(), *args))
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+
+    async def history(
+        self,
+        entity_ids: Optional[List[str]],
+        start: float,
+        end: float,
+        minimal_response: bool = False,
+        significant_changes_only: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """State history in the same list-of-lists shape as /history/period."""
+        return await self.run(self._history, entity_ids, start, end, minimal_response, significant_changes_only)
+
+    def _history(self, conn, entity_ids, start, end, minimal_response, significant_changes_only):
+        if entity_ids:
+            placeholders = ",".join("?" * len(entity_ids))
+            meta = conn.execute(
+                f"SELECT metadata_id, entity_id FROM states_meta WHERE entity_id IN ({placeholders})", entity_ids
+            ).fetchall()
+            order = {e: i for i, e in enumerate(entity_ids)}
+            meta.sort(key=lambda m: order[m[1]])
+        else:
+            meta = conn.execute("SELECT metadata_id, entity_id FROM states_meta ORDER BY entity_id").fetchall()
+
+        attr_cache: Dict[int, Dict[str, Any]] = {}
+
+        def attributes(attributes_id):
+            if attributes_id is None:
+                return {}
+            if attributes_id not in attr_cache:
+                row = conn.execute(
+                    "SELECT shared_attrs FROM state_attributes WHERE attributes_id = ?", (attributes_id,)
+                ).fetchone()
+                attr_cache[attributes_id] = json.loads(row[0]) if row and row[0] else {}
+            return attr_cache[attributes_id]
+
+        change_filter = " AND (last_changed_ts IS NULL OR last_changed_ts = last_updated_ts)" if significant_changes_only else ""
+        result = []
+        for metadata_id, entity_id in meta:
+            # State in effect at `start` (index: metadata_id, last_updated_ts)
+            initial = conn.execute(
+                "SELECT state, attributes_id FROM states WHERE metadata_id = ? AND last_updated_ts < ? "
+                "AND state IS NOT NULL ORDER BY last_updated_ts DESC LIMIT 1",
+                (metadata_id, start),
+            ).fetchone()
+            rows = conn.execute(
+                "SELECT state, last_updated_ts, last_changed_ts, attributes_id FROM states "
+                "WHERE metadata_id = ? AND last_updated_ts >= ? AND last_updated_ts < ? AND state IS NOT NULL"
+                f"{change_filter} ORDER BY last_updated_ts",
+                (metadata_id, start, end),
+            ).fetchall()
+
+            states = []
+            if initial:
+                start_time = _iso(start)
+                states.append({
+                    "entity_id": entity_id,
+                    "state": initial[0],
+                    "last_changed": start_time,
+                    "last_updated": start_time,
+                    "attributes": attributes(initial[1]),
+                })
+            for state, updated_ts, changed_ts, attributes_id in rows:
+                if (minimal_response or significant_changes_only) and states and state == states[-1]["state"]:
+                    continue  # attribute-only update: HA's /history/period leaves these out
+                changed = _iso(changed_ts if changed_ts is not None else updated_ts)
+                if minimal_response and states:
+                    states.append({"state": state, "last_changed": changed})
+                else:
+                    states.append({
+                        "entity_id": entity_id,
+                        "state": state,
+                        "last_changed": changed,
+                        "last_updated": _iso(updated_ts),
+                        "attributes": attributes(attributes_id),
+                    })
+            if states:
+                result.append(states)
+        return result
+
+    # ------------------------------------------------------------------
+    # Long-term statistics
+    # ------------------------------------------------------------------
+
+    async def statistics(
+        self,
+        statistic_ids: List[str],
+        start: float,
+        end: Optional[float],
+        period: str = "hour",
+    ) -> Dict[str, Dict[str, Any]]:
+        """Statistics in the same shape as history.fetch_statistics (no unit conversion).
+
+        5minute reads statistics_short_term, everything else reads the
+        hourly statistics table and rolls up day/week/month (UTC boundaries).
+        """
+        return await self.run(self._statistics, statistic_ids, start, end, period)
+
+    def _statistics(self, conn, statistic_ids, start, end, period):
+        table = "statistics_short_term" if period == "5minute" else "statistics"
+        placeholders = ",".join("?" * len(statistic_ids))
+        meta = conn.execute(
+            "SELECT id, statistic_id, unit_of_measurement, name FROM statistics_meta "
+            f"WHERE statistic_id IN ({placeholders})",
+            statistic_ids,
+        ).fetchall()
+
+        stats = {}
+        for metadata_id, statistic_id, unit, name in meta:
+            # One row before `start` so the first period's change can be computed
+            prev = conn.execute(
+                f"SELECT sum FROM {table} WHERE metadata_id = ? AND start_ts < ? ORDER BY start_ts DESC LIMIT 1",
+                (metadata_id, start),
+            ).fetchone()
+            rows = conn.execute(
+                f"SELECT start_ts, mean, min, max, state, sum FROM {table} "
+                "WHERE metadata_id = ? AND start_ts >= ? AND start_ts < ? ORDER BY start_ts",
+                (metadata_id, start, end if end is not None else float("inf")),
+            ).fetchall()
+            if not rows:
+                continue
+            prev_sum = prev[0] if prev else None
+            out = []
+            for start_ts, mean, min_, max_, state, sum_ in rows:
+                change = sum_ - prev_sum if sum_ is not None and prev_sum is not None else None
+                if sum_ is not None:
+                    prev_sum = sum_
+                out.append({
+                    "start": start_ts, "mean": mean, "min": min_, "max": max_,
+                    "state": state, "sum": sum_, "change": change,
+                })
+            if period not in ("5minute", "hour"):
+                out = _roll_up(out, period)
+            stats[statistic_id] = {"name": name, "unit_of_measurement": unit, "rows": out}
+        return stats
+
+
+def _period_key(ts: float, period: str):
+    dt = datetime.fromtimestamp(ts, timezone.utc)
+    if period == "month":
+        return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc).timestamp()
+    if period == "week":
+        monday = dt.timestamp() - dt.weekday() * 86400
+        return monday // 86400 * 86400
+    return ts // _PERIOD_SECONDS[period] * _PERIOD_SECONDS[period]
+
+
+def _roll_up(rows: List[Dict[str, Any]], period: str) -> List[Dict[str, Any]]:
+    """Aggregate hourly statistics rows into day/week/month rows."""
+    groups: Dict[float, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(_period_key(row["start"], period), []).append(row)
+
+    def values(group, field):
+        return [r[field] for r in group if r[field] is not None]
+
+    out = []
+    for key, group in groups.items():
+        means, mins, maxs, changes = (values(group, f) for f in ("mean", "min", "max", "change"))
+        out.append({
+            "start": key,
+            "mean": sum(means) / len(means) if means else None,
+            "min": min(mins) if mins else None,
+            "max": max(maxs) if maxs else None,
+            "state": group[-1]["state"],
+            "sum": group[-1]["sum"],
+            "change": sum(changes) if changes else None,
+        })
+    return out
+
+
+# Initialize global instances
+recorder_db = RecorderDatabase(
+    settings.RECORDER_DB_PATH or settings.HA_CONFIG_PATH / "home-assistant_v2.db",
+    immutable=settings.RECORDER_DB_IMMUTABLE,
+    workers=settings.RECORDER_DB_WORKERS,
+)
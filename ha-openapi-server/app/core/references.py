@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.clients import get_ws_client
+from app.core.config import settings
+from app.core.config_files import ConfigFileCache, ConfigIndex, config_cache, config_index
+from app.core.dashboards import dashboard_cache
+from app.core.events import event_stream
+from app.core.validation import ENTITY_ID_RE
+
+logger = logging.getLogger(__name__)
+
+# Entity domains recognised when scanning free-form strings and templates (values under
+# _ENTITY_KEYS are taken as entity ids whatever their domain)
+ENTITY_DOMAINS = {
+    "air_quality", "alarm_control_panel", "alert", "assist_satellite", "automation", "binary_sensor",
+    "button", "calendar", "camera", "climate", "conversation", "counter", "cover", "date", "datetime",
+    "device_tracker", "event", "fan", "group", "humidifier", "image", "image_processing",
+    "input_boolean", "input_button", "input_datetime", "input_number", "input_select", "input_text",
+    "lawn_mower", "light", "lock", "media_player", "notify", "number", "person", "plant", "proximity",
+    "remote", "scene", "schedule", "script", "select", "sensor", "siren", "stt", "sun", "switch",
+    "tag", "text", "time", "timer", "todo", "tts", "update", "vacuum", "valve", "wake_word",
+    "water_heater", "weather", "zone",
+}
+_ENTITY_RE = re.compile(r"\b(" + "|".join(sorted(ENTITY_DOMAINS)) + r")\.([a-z0-9_]+)\b")
+_ENTITY_FULL_RE = re.compile(r"^(" + "|".join(sorted(ENTITY_DOMAINS)) + r")\.[a-z0-9_]+$")
+# Keys whose values name entities
+_ENTITY_KEYS = {"entity_id", "entity", "entities"}
+# Keys whose values name services, not entities
+_SERVICE_KEYS = {"service", "action"}
+
+References = Dict[str, List[str]]  # entity_id -> JSON-ish paths where it appears
+
+
+def extract_references(obj: Any, path: str = "") -> References:
+    """Entity ids referenced anywhere in a parsed config object, with their paths.
+
+    Picks up entity_id/entity/entities values (any domain), scene maps keyed
+    by entity, and entity ids of known domains inside templates and other
+    strings; service names (light.turn_on) are skipped.
+    """
+    refs: References = {}
+
+    def add(entity_id: str, where: str):
+        refs.setdefault(entity_id, []).append(where)
+
+    def walk(value: Any, where: str, key: Optional[str]):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                k_str = str(k)
+                child = f"{where}.{k_str}" if where else k_str
+                if _ENTITY_FULL_RE.match(k_str):
+                    add(k_str, child)
+                walk(v, child, k_str)
+        elif isinstance(value, list):
+            for i, v in enumerate(value):
+                walk(v, f"{where}[{i}]", key)
+        elif isinstance(value, str) and key not in _SERVICE_KEYS:
+            if "{{" in value or "{%" in value:
+                for match in _ENTITY_RE.finditer(value):
+                    add(match.group(0), where)
+            elif key in _ENTITY_KEYS:
+                for entity_id in value.split(","):  # HA accepts "light.a, light.b"
+                    if ENTITY_ID_RE.match(entity_id.strip()):
+                        add(entity_id.strip(), where)
+            elif _ENTITY_FULL_RE.match(value):
+                add(value, where)
+
+    walk(obj, path, None)
+    return refs
+
+
+class ReferenceIndex:
+    """Reverse index: entity_id -> automations, scripts and dashboards that use it.
+
+    Config files come from the ConfigIndex; a file is re-scanned only when
+    its (mtime_ns, size) changes. Dashboards are fetched over WebSocket and
+    re-fetched when HA fires `lovelace_updated` for them (or, without a live
+    event stream, once their copy is older than REFERENCE_DASHBOARD_TTL_SECONDS).
+    The dashboard list itself is re-read on the same TTL to pick up new ones.
+    """
+
+    def __init__(self, cache: ConfigFileCache, index: ConfigIndex, dashboard_ttl: float):
+        self.cache = cache
+        self.index = index
+        self.dashboard_ttl = dashboard_ttl
+        # source -> (signature, [(object meta, references)])
+        self._sources: Dict[Tuple[str, str], Tuple[Any, List[Tuple[Dict[str, Any], References]]]] = {}
+        self._by_entity: Dict[str, Set[Tuple[str, str]]] = {}
+        self._stale_dashboards: Set[str] = set()
+        self._dashboards_listed = 0.0
+        self._dashboard_ids: List[str] = []
+        self._lock = asyncio.Lock()
+
+    def on_lovelace_updated(self, event: Dict[str, Any]):
+        """EventStream listener for `lovelace_updated` (url_path None = default dashboard)."""
+        url_path = (event.get("data") or {}).get("url_path") or "lovelace"
+        self._stale_dashboards.add(url_path)
+
+    async def refresh(self, dashboards: bool = True):
+        async with self._lock:
+            await self._refresh_files()
+            if dashboards:
+                await self._refresh_dashboards()
+
+    async def _refresh_files(self):
+        by_file = await self.index.definitions()
+        seen = set()
+        for path, definitions in by_file.items():
+            source = ("file", str(path))
+            seen.add(source)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            if source in self._sources and self._sources[source][0] == signature:
+                continue
+            doc = await self.cache.load(path)
+            objects = await asyncio.to_thread(self._scan_file, path, doc, definitions)
+            self._replace(source, signature, objects)
+        for source in [s for s in self._sources if s[0] == "file" and s not in seen]:
+            self._replace(source, None, None)
+
+    def _scan_file(self, path: Path, doc: Any, definitions) -> List[Tuple[Dict[str, Any], References]]:
+        file = str(path.relative_to(self.index.base_path))
+        objects = []
+        for definition in definitions:
+            try:
+                config = definition.locate(doc)
+            except (KeyError, IndexError, TypeError):
+                continue
+            refs = extract_references(config)
+            if refs:
+                meta = {
+                    "kind": definition.kind,
+                    "id": definition.id,
+                    "alias": definition.alias,
+                    "file": file,
+                    "position": definition.position,
+                }
+                objects.append((meta, refs))
+        return objects
+
+    async def _refresh_dashboards(self):
+        now = time.monotonic()
+        expired = now - self._dashboards_listed > self.dashboard_ttl
+        try:
+            ws = await get_ws_client()
+            if expired:
+                dashboards = await ws.call_command("lovelace/dashboards/list")
+                ids = ["lovelace"] + [d.get("url_path") for d in dashboards or [] if d.get("url_path")]
+                if not event_stream.connected:
+                    self._stale_dashboards.update(ids)
+                self._stale_dashboards.update(set(ids) - set(self._dashboard_ids))
+                for removed in set(self._dashboard_ids) - set(ids):
+                    self._replace(("dashboard", removed), None, None)
+                self._dashboard_ids = ids
+                self._dashboards_listed = now
+
+            for url_path in list(self._stale_dashboards & set(self._dashboard_ids)):
+                self._stale_dashboards.discard(url_path)
+                try:
+                    config, _ = await dashboard_cache.get(url_path)
+                except Exception as e:
+                    # e.g. default dashboard still auto-generated (no stored config)
+                    logger.debug(f"Reference index: no config for dashboard {url_path}: {e}")
+                    config = None
+                refs = extract_references(config) if config else {}
+                meta = {"kind": "dashboard", "id": url_path, "alias": (config or {}).get("title")}
+                self._replace(("dashboard", url_path), now, [(meta, refs)] if refs else [])
+        except Exception as e:
+            logger.warning(f"Reference index: dashboards unavailable: {e}")
+
+    def _replace(self, source: Tuple[str, str], signature: Any, objects):
+        old = self._sources.pop(source, None)
+        if old:
+            for _, refs in old[1]:
+                for entity_id in refs:
+                    holders = self._by_entity.get(entity_id)
+                    if holders:
+                        holders.discard(source)
+                        if not holders:
+                            del self._by_entity[entity_id]
+        if objects is None:
+            return
+        self._sources[source] = (signature, objects)
+        for _, refs in objects:
+            for entity_id in refs:
+                self._by_entity.setdefault(entity_id, set()).add(source)
+
+    async def find(self, entity_id: str, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Objects referencing `entity_id` (automations, scripts, dashboards)."""
+        await self.refresh(dashboards=not kinds or "dashboard" in kinds)
+        found = []
+        for source in sorted(self._by_entity.get(entity_id, ())):
+            for meta, refs in self._sources[source][1]:
+                if entity_id in refs and (not kinds or meta["kind"] in kinds):
+                    found.append({**meta, "paths": refs[entity_id]})
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sources": len(self._sources),
+            "entities": len(self._by_entity),
+            "stale_dashboards": sorted(self._stale_dashboards),
+        }
+
+
+# Initialize global instances
+reference_index = ReferenceIndex(config_cache, config_index, settings.REFERENCE_DASHBOARD_TTL_SECONDS)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+
+from app.core.clients import ha_api
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingReload:
+    __slots__ = ("future", "first_requested", "requests", "timer")
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Nobody may await a fire-and-forget reload; failures are logged instead
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.first_requested = time.monotonic()
+        self.requests = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class ReloadScheduler:
+    """Debounced, coalesced `<domain>.reload` service calls.
+
+    Every config write requests a reload; requests for the same domain
+    within RELOAD_DEBOUNCE_SECONDS of each other collapse into one call,
+    which is never postponed more than RELOAD_MAX_DELAY_SECONDS past the
+    first request. Reloads of a domain never overlap: requests arriving
+    while one runs are batched into the next. Callers that need confirmation
+    await the shared result.
+    """
+
+    def __init__(self, debounce: float, max_delay: float):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending: Dict[str, _PendingReload] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()  # running reloads (the loop only keeps weak references)
+        self.requested = 0
+        self.performed = 0
+
+    def request(self, domain: str) -> asyncio.Future:
+        """Schedule a reload of `domain`; the future resolves when it has run."""
+        self.requested += 1
+        pending = self._pending.get(domain)
+        if pending is None:
+            pending = self._pending[domain] = _PendingReload()
+        elif pending.timer:
+            pending.timer.cancel()
+        pending.requests += 1
+
+        deadline = pending.first_requested + self.max_delay
+        delay = max(0.0, min(self.debounce, deadline - time.monotonic()))
+        pending.timer = asyncio.get_running_loop().call_later(delay, self._start, domain)
+        return pending.future
+
+    async def reload(self, domain: str, wait: bool = False):
+        """Request a reload; with `wait`, return only after it ran (raises if it failed)."""
+        future = self.request(domain)
+        if wait:
+            await asyncio.shield(future)
+
+    async def reload_now(self, domain: str):
+        """Reload immediately, absorbing any pending debounced request."""
+        future = self.request(domain)
+        self._start(domain)
+        await asyncio.shield(future)
+
+    def _start(self, domain: str):
+        pending = self._pending.pop(domain, None)
+        if pending is None:
+            return
+        if pending.timer:
+            pending.timer.cancel()
+        task = asyncio.create_task(self._run(domain, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Reload task failed: {task.exception()!r}")
+
+    async def _run(self, domain: str, pending: _PendingReload):
+        lock = self._locks.setdefault(domain, asyncio.Lock())
+        async with lock:
+            try:
+                await ha_api.call_service(domain, "reload")
+                self.performed += 1
+                if pending.requests > 1:
+                    logger.info(f"Coalesced {pending.requests} {domain} reload requests into one")
+                pending.future.set_result(True)
+            except Exception as e:
+                logger.error(f"{domain}.reload failed: {e}")
+                pending.future.set_exception(e)
+
+    def stats(self) -> Dict[str, int]:
+        return {"requested": self.requested, "performed": self.performed, "pending": len(self._pending)}
+
+
+# Initialize global instances
+reload_scheduler = ReloadScheduler(settings.RELOAD_DEBOUNCE_SECONDS, settings.RELOAD_MAX_DELAY_SECONDS)
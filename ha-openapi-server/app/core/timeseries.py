@@ -0,0 +1,167 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Non-numeric states that still make sense on a chart (binary sensors, covers, presence)
+BINARY_STATE_VALUES = {
+    "on": 1.0, "off": 0.0,
+    "open": 1.0, "closed": 0.0,
+    "home": 1.0, "not_home": 0.0,
+    "true": 1.0, "false": 0.0,
+    "detected": 1.0, "clear": 0.0,
+}
+
+
+def parse_ha_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse an HA ISO timestamp into epoch seconds (None if unparseable)."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+
+def state_to_float(state: Any) -> float:
+    """Convert an HA state string to a float (NaN if non-numeric)."""
+    try:
+        return float(state)
+    except (ValueError, TypeError):
+        return BINARY_STATE_VALUES.get(str(state).lower(), np.nan)
+
+
+def to_numeric_series(states: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert one entity's HA history list into (timestamps, values) arrays.
+
+    Timestamps are epoch seconds; rows with unparseable times or
+    non-numeric states are dropped.
+    """
+    ts = np.fromiter(
+        (parse_ha_timestamp(s.get("last_changed") or s.get("last_updated")) or np.nan for s in states),
+        dtype=np.float64, count=len(states),
+    )
+    vals = np.fromiter((state_to_float(s.get("state")) for s in states), dtype=np.float64, count=len(states))
+    mask = ~(np.isnan(ts) | np.isnan(vals))
+    return ts[mask], vals[mask]
+
+
+def lttb(ts: np.ndarray, vals: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets downsampling to at most `threshold` points.
+
+    Keeps the first and last points and, for every bucket in between, the
+    point forming the largest triangle with its neighbours. Preserves the
+    visual shape of a series far better than plain decimation.
+    """
+    n = len(ts)
+    if threshold >= n or threshold < 3:
+        return ts, vals
+
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    # Bucket boundaries over the interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        nhi = max(nhi, nlo + 1)
+        avg_t, avg_v = ts[nlo:nhi].mean(), vals[nlo:nhi].mean()
+        area = np.abs(
+            (ts[a] - avg_t) * (vals[lo:hi] - vals[a])
+            - (ts[a] - ts[lo:hi]) * (avg_v - vals[a])
+        )
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return ts[out], vals[out]
+
+
+AGGREGATIONS = ("mean", "min", "max", "last", "count", "time_weighted_mean")
+_BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_bucket(bucket: str) -> int:
+    """Parse a bucket size like '30s', '5m', '1h', '1d' or '300' into seconds."""
+    text = str(bucket).strip().lower()
+    try:
+        if text[-1] in _BUCKET_UNITS:
+            seconds = int(float(text[:-1]) * _BUCKET_UNITS[text[-1]])
+        else:
+            seconds = int(float(text))
+    except (ValueError, IndexError):
+        raise ValueError(f"Invalid bucket '{bucket}' (use e.g. '30s', '5m', '1h', '1d')")
+    if seconds <= 0:
+        raise ValueError(f"Bucket must be positive, got '{bucket}'")
+    return seconds
+
+
+def bucket_aggregate(
+    ts: np.ndarray,
+    vals: np.ndarray,
+    start: float,
+    end: float,
+    bucket: int,
+    agg: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Aggregate a series into fixed time buckets over [start, end).
+
+    Bucket boundaries are aligned to multiples of `bucket` since the epoch
+    (so 5m buckets start on :00, :05, ...). Returns (bucket_start_timestamps,
+    values). Buckets without samples are omitted, except for 'count' where
+    they report 0. 'time_weighted_mean' treats the series as a step function
+    (each state holds until the next change), which is what HA sensors
+    actually mean.
+    """
+    origin = np.floor(start / bucket) * bucket
+    n_buckets = max(1, int(np.ceil((end - origin) / bucket)))
+    starts = origin + np.arange(n_buckets, dtype=np.float64) * bucket
+
+    if agg == "time_weighted_mean":
+        return _time_weighted_mean(ts, vals, start, end, bucket, starts)
+
+    in_range = (ts >= start) & (ts < end)
+    ts, vals = ts[in_range], vals[in_range]
+    idx = ((ts - origin) // bucket).astype(np.int64)
+    counts = np.bincount(idx, minlength=n_buckets)
+
+    if agg == "count":
+        return starts, counts.astype(np.float64)
+    if agg == "mean":
+        out = np.bincount(idx, weights=vals, minlength=n_buckets) / np.maximum(counts, 1)
+    elif agg == "min":
+        out = np.full(n_buckets, np.inf)
+        np.minimum.at(out, idx, vals)
+    elif agg == "max":
+        out = np.full(n_buckets, -np.inf)
+        np.maximum.at(out, idx, vals)
+    elif agg == "last":
+        # Samples are time-ordered, so the highest position per bucket is the last
+        last_pos = np.full(n_buckets, -1, dtype=np.int64)
+        np.maximum.at(last_pos, idx, np.arange(len(idx)))
+        out = np.where(last_pos >= 0, vals[np.maximum(last_pos, 0)] if len(vals) else 0.0, np.nan)
+    else:
+        raise ValueError(f"Unknown aggregation '{agg}' (use one of {', '.join(AGGREGATIONS)})")
+
+    mask = counts > 0
+    return starts[mask], out[mask]
+
+
+def _time_weighted_mean(ts, vals, start, end, bucket, starts):
+    """Time-weighted mean per bucket of a step function defined by (ts, vals)."""
+    if not len(ts):
+        return starts[:0], starts[:0]
+    # Breakpoints: every state change inside the window plus every bucket edge
+    edges = np.clip(np.append(starts, end), start, end)
+    points = np.union1d(ts[(ts > start) & (ts < end)], edges)
+    # Value in effect on each [points[i], points[i+1]) segment
+    pos = np.searchsorted(ts, points[:-1], side="right") - 1
+    seg_vals = np.where(pos >= 0, vals[np.maximum(pos, 0)], np.nan)
+    seg_len = np.diff(points)
+    seg_bucket = np.minimum(((points[:-1] - starts[0]) // bucket).astype(np.int64), len(starts) - 1)
+
+    known = ~np.isnan(seg_vals)
+    weight = np.bincount(seg_bucket[known], weights=seg_len[known], minlength=len(starts))
+    total = np.bincount(seg_bucket[known], weights=seg_vals[known] * seg_len[known], minlength=len(starts))
+    mask = weight > 0
+    return starts[mask], total[mask] / weight[mask]
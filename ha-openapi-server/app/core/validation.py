@@ -0,0 +1,406 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.clients import ha_api
+from app.core.config import settings
+from app.core.config_files import ConfigFileCache, ConfigIndex, Definition, config_cache, config_index
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = {"single", "restart", "queued", "parallel"}
+ENTITY_ID_RE = re.compile(r"^[a-z0-9_]+\.[a-z0-9_]+$")
+
+# Keys each trigger platform / condition type needs (any one of a tuple)
+TRIGGER_REQUIRED = {
+    "state": ["entity_id"],
+    "numeric_state": ["entity_id", ("above", "below")],
+    "time": ["at"],
+    "time_pattern": [("hours", "minutes", "seconds")],
+    "event": ["event_type"],
+    "template": ["value_template"],
+    "sun": ["event"],
+    "zone": ["entity_id", "zone", "event"],
+    "geo_location": ["source", "zone", "event"],
+    "homeassistant": ["event"],
+    "mqtt": ["topic"],
+    "webhook": ["webhook_id"],
+    "device": ["device_id", "domain"],
+    "tag": ["tag_id"],
+    "calendar": ["entity_id", "event"],
+    "conversation": ["command"],
+    "persistent_notification": [],
+}
+CONDITION_REQUIRED = {
+    "and": ["conditions"],
+    "or": ["conditions"],
+    "not": ["conditions"],
+    "state": ["entity_id", "state"],
+    "numeric_state": ["entity_id", ("above", "below")],
+    "template": ["value_template"],
+    "time": [("after", "before", "weekday")],
+    "sun": [("after", "before")],
+    "zone": ["entity_id", "zone"],
+    "trigger": ["id"],
+    "device": ["device_id", "domain"],
+}
+# Action type is decided by the first of these keys present
+ACTION_KEYS = (
+    "service", "action", "delay", "wait_template", "wait_for_trigger", "event", "scene",
+    "condition", "choose", "if", "repeat", "parallel", "sequence", "stop", "variables",
+    "device_id", "set_conversation_response",
+)
+# Shorthand logical conditions: `- or: [...]` instead of `condition: or` + `conditions:`
+SHORTHAND_CONDITIONS = ("and", "or", "not")
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _is_template(value: Any) -> bool:
+    return isinstance(value, str) and ("{{" in value or "{%" in value)
+
+
+class _Checker:
+    """Structural checks for one automation/script; collects referenced entities and services."""
+
+    def __init__(self):
+        self.issues: List[Dict[str, str]] = []
+        self.entities: Set[str] = set()
+        self.services: Set[str] = set()
+
+    def error(self, path: str, message: str):
+        self.issues.append({"severity": "error", "path": path, "message": message})
+
+    def warning(self, path: str, message: str):
+        self.issues.append({"severity": "warning", "path": path, "message": message})
+
+    def automation(self, config: Any):
+        if not isinstance(config, dict):
+            self.error("", "automation must be a mapping")
+            return
+        if "use_blueprint" in config:
+            self._blueprint(config)
+            return
+        trigger_key = "triggers" if "triggers" in config else "trigger"
+        action_key = "actions" if "actions" in config else "action"
+        if not config.get(trigger_key):
+            self.error(trigger_key, "at least one trigger is required")
+        if not config.get(action_key):
+            self.error(action_key, "at least one action is required")
+        self._mode(config)
+        self.triggers(config.get(trigger_key), trigger_key)
+        condition_key = "conditions" if "conditions" in config else "condition"
+        self.conditions(config.get(condition_key), condition_key)
+        self.actions(config.get(action_key), action_key)
+
+    def script(self, config: Any):
+        if not isinstance(config, dict):
+            self.error("", "script must be a mapping")
+            return
+        if "use_blueprint" in config:
+            self._blueprint(config)
+            return
+        if not config.get("sequence"):
+            self.error("sequence", "a non-empty sequence is required")
+        self._mode(config)
+        self.actions(config.get("sequence"), "sequence")
+
+    def _blueprint(self, config: Dict[str, Any]):
+        """A blueprint instance: triggers/actions come from the blueprint, only the reference is checked here."""
+        blueprint = config["use_blueprint"]
+        if not isinstance(blueprint, dict):
+            self.error("use_blueprint", "use_blueprint must be a mapping")
+            return
+        if not isinstance(blueprint.get("path"), str) or not blueprint["path"]:
+            self.error("use_blueprint.path", "use_blueprint requires a path")
+        if blueprint.get("input") is not None and not isinstance(blueprint["input"], dict):
+            self.error("use_blueprint.input", "input must be a mapping")
+
+    def _mode(self, config: Dict[str, Any]):
+        mode = config.get("mode")
+        if mode is not None and mode not in EXECUTION_MODES:
+            self.error("mode", f"unknown mode '{mode}' (use {', '.join(sorted(EXECUTION_MODES))})")
+
+    def _required(self, config: Dict[str, Any], required: List[Any], path: str, what: str):
+        for keys in required:
+            keys = keys if isinstance(keys, tuple) else (keys,)
+            if not any(k in config for k in keys):
+                self.error(path, f"{what} requires {' or '.join(keys)}")
+
+    def _entity_ids(self, value: Any, path: str):
+        if isinstance(value, str) and not _is_template(value):
+            value = [e.strip() for e in value.split(",")]  # HA accepts "light.a, light.b"
+        for entity_id in _as_list(value):
+            if not isinstance(entity_id, str):
+                self.error(path, f"entity_id must be a string, got {type(entity_id).__name__}")
+            elif _is_template(entity_id) or entity_id in ("all", "none"):
+                continue
+            elif not ENTITY_ID_RE.match(entity_id):
+                self.error(path, f"malformed entity_id '{entity_id}'")
+            else:
+                self.entities.add(entity_id)
+
+    def triggers(self, value: Any, path: str):
+        for i, trigger in enumerate(_as_list(value)):
+            p = f"{path}[{i}]"
+            if not isinstance(trigger, dict):
+                self.error(p, "trigger must be a mapping")
+                continue
+            platform = trigger.get("platform", trigger.get("trigger"))
+            if not isinstance(platform, str):
+                self.error(p, "trigger needs a platform")
+                continue
+            if platform not in TRIGGER_REQUIRED:
+                # Integrations can add trigger platforms; only flag it
+                self.warning(p, f"unknown trigger platform '{platform}'")
+            else:
+                self._required(trigger, TRIGGER_REQUIRED[platform], p, f"{platform} trigger")
+            self._entity_ids(trigger.get("entity_id"), f"{p}.entity_id")
+
+    def conditions(self, value: Any, path: str):
+        for i, condition in enumerate(_as_list(value)):
+            self.condition(condition, f"{path}[{i}]")
+
+    def condition(self, condition: Any, path: str):
+        if isinstance(condition, str):
+            if not _is_template(condition):
+                self.error(path, "string conditions must be templates")
+            return
+        if not isinstance(condition, dict):
+            self.error(path, "condition must be a mapping or template")
+            return
+        if "condition" not in condition:
+            shorthand = [k for k in SHORTHAND_CONDITIONS if k in condition]
+            if len(shorthand) != 1:
+                self.error(path, "condition needs a condition type (or a single and/or/not shorthand key)")
+                return
+            self.conditions(condition[shorthand[0]], f"{path}.{shorthand[0]}")
+            return
+        kind = condition["condition"]
+        if _is_template(kind):
+            return  # `condition: "{{ ... }}"` shorthand for a template condition
+        if kind not in CONDITION_REQUIRED:
+            self.error(path, f"unknown condition type '{kind}'")
+            return
+        self._required(condition, CONDITION_REQUIRED[kind], path, f"{kind} condition")
+        self._entity_ids(condition.get("entity_id"), f"{path}.entity_id")
+        if kind in ("and", "or", "not"):
+            self.conditions(condition.get("conditions"), f"{path}.conditions")
+
+    def actions(self, value: Any, path: str):
+        for i, action in enumerate(_as_list(value)):
+            self.action(action, f"{path}[{i}]")
+
+    def action(self, action: Any, path: str):
+        if not isinstance(action, dict):
+            self.error(path, "action must be a mapping")
+            return
+        kind = next((k for k in ACTION_KEYS if k in action), None)
+        if kind is None and any(k in action for k in SHORTHAND_CONDITIONS):
+            kind = "condition"
+        if kind is None:
+            self.error(path, f"unrecognized action (keys: {', '.join(map(str, action))})")
+            return
+
+        if kind in ("service", "action"):
+            service = action[kind]
+            if not isinstance(service, str):
+                self.error(f"{path}.{kind}", "service must be a string")
+            elif not _is_template(service):
+                if "." not in service:
+                    self.error(f"{path}.{kind}", f"service '{service}' must be domain.service")
+                else:
+                    self.services.add(service)
+            for container in ("target", "data"):
+                if isinstance(action.get(container), dict):
+                    self._entity_ids(action[container].get("entity_id"), f"{path}.{container}.entity_id")
+            self._entity_ids(action.get("entity_id"), f"{path}.entity_id")
+        elif kind == "condition":
+            self.condition(action, path)
+        elif kind == "wait_for_trigger":
+            self.triggers(action["wait_for_trigger"], f"{path}.wait_for_trigger")
+        elif kind == "scene":
+            self._entity_ids(action["scene"], f"{path}.scene")
+        elif kind == "choose":
+            for j, option in enumerate(_as_list(action["choose"])):
+                p = f"{path}.choose[{j}]"
+                if not isinstance(option, dict) or "sequence" not in option:
+                    self.error(p, "choose option needs conditions and sequence")
+                    continue
+                self.conditions(option.get("conditions"), f"{p}.conditions")
+                self.actions(option["sequence"], f"{p}.sequence")
+            self.actions(action.get("default"), f"{path}.default")
+        elif kind == "if":
+            if "then" not in action:
+                self.error(path, "if action requires then")
+            self.conditions(action["if"], f"{path}.if")
+            self.actions(action.get("then"), f"{path}.then")
+            self.actions(action.get("else"), f"{path}.else")
+        elif kind == "repeat":
+            repeat = action["repeat"]
+            if not isinstance(repeat, dict) or "sequence" not in repeat:
+                self.error(f"{path}.repeat", "repeat requires sequence")
+                return
+            self._required(repeat, [("count", "while", "until", "for_each")], f"{path}.repeat", "repeat")
+            self.conditions(repeat.get("while"), f"{path}.repeat.while")
+            self.conditions(repeat.get("until"), f"{path}.repeat.until")
+            self.actions(repeat["sequence"], f"{path}.repeat.sequence")
+        elif kind in ("parallel", "sequence"):
+            self.actions(action[kind], f"{path}.{kind}")
+
+
+class ConfigValidator:
+    """Offline validation of automations and scripts before a reload.
+
+    Structural checks (trigger/condition/action schemas, modes, entity_id
+    format) are cached per config object by content hash, so re-validating
+    after editing one automation only re-checks that one. Referenced
+    entity_ids are checked against HA's current states (warning if unknown)
+    and services against the services catalog (error if unknown); both are
+    fetched once per VALIDATION_CATALOG_TTL_SECONDS. Files are validated
+    concurrently on worker threads.
+    """
+
+    def __init__(self, cache: ConfigFileCache, index: ConfigIndex, max_entries: int, catalog_ttl: float):
+        self.cache = cache
+        self.index = index
+        self.max_entries = max_entries
+        self.catalog_ttl = catalog_ttl
+        self._results: "OrderedDict[str, Tuple[List[Dict[str, str]], Set[str], Set[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._catalog: Optional[Tuple[float, Set[str], Set[str]]] = None
+
+    async def catalog(self) -> Tuple[Optional[Set[str]], Optional[Set[str]]]:
+        """(entity_ids, services) known to HA; (None, None) if HA can't be reached."""
+        if self._catalog and time.monotonic() - self._catalog[0] < self.catalog_ttl:
+            return self._catalog[1], self._catalog[2]
+        try:
+            states, services = await asyncio.gather(ha_api.get_states(), ha_api.get_services())
+        except Exception as e:
+            logger.warning(f"Validation catalog unavailable, skipping entity/service checks: {e}")
+            return None, None
+        entity_ids = {s.get("entity_id") for s in states or []}
+        service_ids = {
+            f"{domain.get('domain')}.{name}"
+            for domain in services or [] for name in (domain.get("services") or {})
+        }
+        self._catalog = (time.monotonic(), entity_ids, service_ids)
+        return entity_ids, service_ids
+
+    def invalidate_catalog(self):
+        self._catalog = None
+
+    async def validate(
+        self,
+        kinds: Optional[List[str]] = None,
+        files: Optional[List[str]] = None,
+        check_entities: bool = True,
+        check_services: bool = True,
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        kinds = kinds or ["automation", "script"]
+        by_file = await self.index.definitions()
+        if files:
+            wanted = {(self.index.base_path / f).resolve() for f in files}
+            by_file = {path: defs for path, defs in by_file.items() if path.resolve() in wanted}
+
+        entity_ids = service_ids = None
+        if check_entities or check_services:
+            entity_ids, service_ids = await self.catalog()
+        docs = {path: await self.cache.load(path) for path in by_file}
+
+        reports = await asyncio.gather(*(
+            asyncio.to_thread(
+                self._validate_file, path, docs[path], [d for d in defs if d.kind in kinds],
+                entity_ids if check_entities else None, service_ids if check_services else None,
+            )
+            for path, defs in by_file.items()
+        ))
+
+        issues = [issue for report in reports for issue in report[0]]
+        errors = sum(1 for issue in issues if issue["severity"] == "error")
+        return {
+            "valid": errors == 0,
+            "errors": errors,
+            "warnings": len(issues) - errors,
+            "objects": sum(report[1] for report in reports),
+            "cached": sum(report[2] for report in reports),
+            "files": len(by_file),
+            "entity_check": entity_ids is not None and check_entities,
+            "service_check": service_ids is not None and check_services,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "issues": issues,
+        }
+
+    def _validate_file(self, path: Path, doc: Any, definitions: List[Definition], entity_ids, service_ids):
+        issues, cached = [], 0
+        file = str(path.relative_to(self.index.base_path))
+        for definition in definitions:
+            try:
+                config = definition.locate(doc)
+            except (KeyError, IndexError, TypeError):
+                continue
+            (structural, entities, services), hit = self._check(definition.kind, config)
+            cached += hit
+            found = list(structural)
+            if entity_ids is not None:
+                found += [
+                    {"severity": "warning", "path": "entity_id", "message": f"unknown entity '{e}'"}
+                    for e in sorted(entities - entity_ids)
+                ]
+            if service_ids is not None:
+                found += [
+                    {"severity": "error", "path": "service", "message": f"unknown service '{s}'"}
+                    for s in sorted(services - service_ids)
+                ]
+            for issue in found:
+                issues.append({
+                    "kind": definition.kind,
+                    "id": definition.id,
+                    "alias": definition.alias,
+                    "file": file,
+                    "position": definition.position,
+                    **issue,
+                })
+        return issues, len(definitions), cached
+
+    def _check(self, kind: str, config: Any):
+        """Structural result for one object, from the hash cache when possible."""
+        key = kind + ":" + hashlib.blake2b(
+            json.dumps(config, sort_keys=True, default=str).encode(), digest_size=16
+        ).hexdigest()
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result, 1
+
+        checker = _Checker()
+        if kind == "automation":
+            checker.automation(config)
+        else:
+            checker.script(config)
+        result = (checker.issues, checker.entities, checker.services)
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result, 0
+
+
+# Initialize global instances
+config_validator = ConfigValidator(
+    config_cache, config_index,
+    settings.VALIDATION_CACHE_MAX_ENTRIES, settings.VALIDATION_CATALOG_TTL_SECONDS,
+)
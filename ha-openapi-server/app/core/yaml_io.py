@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any
+
+import yaml
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# libyaml-backed loader/dumper when PyYAML was built with it (benchmarks/yaml_bench.py: ~4x faster load, ~3-4x dump)
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+    LIBYAML = False
+    logger.info("libyaml not available, using the pure-Python YAML loader/dumper")
+
+
+def load_yaml(text: str) -> Any:
+    """Parse YAML with the safe (C when available) loader."""
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def dump_yaml(data: Any, **kwargs) -> str:
+    """Serialize to block-style YAML with the safe (C when available) dumper."""
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump(data, Dumper=SafeDumper, **kwargs)
+
+
+async def load_yaml_async(text: str) -> Any:
+    """load_yaml, run in a worker thread for documents over YAML_OFFLOAD_BYTES."""
+    if len(text) >= settings.YAML_OFFLOAD_BYTES:
+        return await asyncio.to_thread(load_yaml, text)
+    return load_yaml(text)
+
+
+async def dump_yaml_async(data: Any, size_hint: int = 0, **kwargs) -> str:
+    """dump_yaml, run in a worker thread when `size_hint` (e.g. the file's
+    previous size) is over YAML_OFFLOAD_BYTES."""
+    if size_hint >= settings.YAML_OFFLOAD_BYTES:
+        return await asyncio.to_thread(dump_yaml, data, **kwargs)
+    return dump_yaml(data, **kwargs)
@@ -1,9 +1,18 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.chatty import chatty_tracker
 from app.core.config import settings
+from app.core.config_files import config_cache, config_index
+from app.core.dashboards import dashboard_cache
+from app.core.events import event_stream
+from app.core.file_index import file_index
+from app.core.file_watch import file_watch
 from app.core.logging import get_logger
+from app.core.references import reference_index
 from app.routers import (
     device_control, discovery, automations, 
     file_management, system, dashboards, diagnostics,
@@ -14,10 +23,30 @@ from app.routers import (
 # Configure logger
 logger = get_logger("app")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background services (HA event stream, config and file indexes) for the lifetime of the app."""
+    if settings.CHATTY_TRACKER_ENABLED:
+        event_stream.add_listener("state_changed", chatty_tracker.on_state_changed)
+    event_stream.add_listener("lovelace_updated", dashboard_cache.on_lovelace_updated)
+    event_stream.add_listener("lovelace_updated", reference_index.on_lovelace_updated)
+    event_stream.start()
+    if settings.FILE_INDEX_ENABLED:
+        # The file index is the single source of change notifications for the caches and /watch_files
+        file_index.add_listener(config_cache.on_file_changes)
+        config_index.watch(file_index)
+        file_watch.start()
+        file_index.start()
+    config_index.start()
+    yield
+    await event_stream.stop()
+    file_index.stop()
+
 app = FastAPI(
     title=settings.APP_TITLE,
     version=settings.APP_VERSION,
     description=settings.APP_DESCRIPTION,
+    lifespan=lifespan,
 )
 
 # Enable CORS
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 # ============================================================================
@@ -19,6 +19,7 @@ class CreateAutomationRequest(BaseModel):
     trigger: list = Field(..., min_length=1, description="List of triggers")
     condition: list = Field([], description="List of conditions")
     action: list = Field(..., min_length=1, description="List of actions")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
 
 class UpdateAutomationRequest(BaseModel):
     automation_id: str = Field(..., description="Automation entity ID to update")
@@ -28,10 +29,26 @@ class UpdateAutomationRequest(BaseModel):
     condition: Optional[list] = Field(None)
     action: Optional[list] = Field(None, min_length=1)
     mode: Optional[str] = Field(None, description="Execution mode")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
+
+class AutomationEditOperation(BaseModel):
+    op: Literal["create", "update", "delete"] = Field(..., description="Operation: create, update or delete")
+    automation_id: Optional[str] = Field(None, description="Automation entity ID, id or alias (update/delete)")
+    alias: Optional[str] = Field(None, description="Friendly name (required for create)")
+    description: Optional[str] = Field(None, description="Description")
+    trigger: Optional[list] = Field(None, min_length=1, description="List of triggers (required for create)")
+    condition: Optional[list] = Field(None, description="List of conditions")
+    action: Optional[list] = Field(None, min_length=1, description="List of actions (required for create)")
+    mode: Optional[str] = Field(None, description="Execution mode (create defaults to single)")
+
+class BatchEditAutomationsRequest(BaseModel):
+    operations: List[AutomationEditOperation] = Field(..., min_length=1, description="Operations, applied in order")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
 
 class DeleteAutomationRequest(BaseModel):
     automation_id: str = Field(..., description="Automation entity ID to delete")
     confirm: bool = Field(False, description="Must be set to true to confirm deletion")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
 
 class ToggleAutomationRequest(BaseModel):
     automation_id: str = Field(..., description="Automation entity ID to toggle")
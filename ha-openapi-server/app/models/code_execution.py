@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 class ExecutePythonRequest(BaseModel):
@@ -12,7 +12,14 @@ class AnalyzeStatesRequest(BaseModel):
     query: Optional[str] = Field(None, description="Pandas query filter (e.g., \"state == 'on'\")")
 
 class PlotSensorHistoryRequest(BaseModel):
-    entity_ids: List[str] = Field(..., description="Sensor entity IDs to plot")
-    hours: int = Field(25, description="Hours of history to plot")
-    chart_type: str = Field("line", description="Chart type: line, bar, scatter")
+    entity_ids: List[str] = Field(..., description="Sensor entity IDs to plot (at least one)")
+    hours: int = Field(25, ge=1, le=24 * 366, description="Hours of history to plot (up to a year; raw history only covers the recorder's retention, 10 days by default)")
+    chart_type: Literal["line", "bar", "scatter"] = Field("line", description="Chart type: line, bar, scatter")
     title: Optional[str] = Field(None, description="Chart title")
+    width: int = Field(1000, ge=200, le=4000, description="Image width in pixels (history is downsampled to this)")
+    height: int = Field(500, ge=150, le=3000, description="Image height in pixels")
+    format: Literal["png", "svg"] = Field("png", description="Image format: png or svg")
+    raw: bool = Field(False, description="Return the image bytes directly instead of base64 JSON")
+    source: Literal["auto", "history", "statistics"] = Field(
+        "auto", description="Data source: raw history, recorder long-term statistics, or auto (statistics for long windows)"
+    )
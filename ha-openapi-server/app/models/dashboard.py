@@ -1,16 +1,22 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
+from app.models.common import SuccessResponse
+
 # ============================================================================
 # Dashboards (Lovelace)
 # ============================================================================
 
+class DashboardVersionResponse(SuccessResponse):
+    version: str = Field(..., description="Dashboard version after this call; pass it as if_version when saving")
+
 class GetDashboardConfigRequest(BaseModel):
     dashboard_id: str = Field(..., description="Dashboard ID (e.g., 'lovelace' for default)")
 
 class UpdateDashboardConfigRequest(BaseModel):
     dashboard_id: str = Field(..., description="Dashboard ID")
     config: Dict[str, Any] = Field(..., description="Full Dashboard configuration object")
+    if_version: Optional[str] = Field(None, description="Only save if the dashboard is still at this version (from get_dashboard_config); 412 otherwise")
 
 class ListDashboardsRequest(BaseModel):
     pass
@@ -34,12 +40,33 @@ class ManualCreateCustomCardRequest(BaseModel):
     card_yaml: str = Field(..., description="Card configuration as YAML string")
     position: Optional[int] = Field(None, description="Card position in view (0-based, default: append)")
     dry_run: Optional[bool] = Field(False, description="If true, preview without saving")
+    if_version: Optional[str] = Field(None, description="Only save if the dashboard is still at this version (from get_dashboard_config); 412 otherwise")
 
 class ManualEditCustomCardRequest(BaseModel):
     dashboard_id: str = Field(..., description="Dashboard ID")
     view_index: int = Field(..., description="View/tab index (0-based)")
     card_index: int = Field(..., description="Card index within view (0-based)")
     card_yaml: str = Field(..., description="Updated card configuration as YAML string")
+    if_version: Optional[str] = Field(None, description="Only save if the dashboard is still at this version (from get_dashboard_config); 412 otherwise")
+
+class DashboardOperation(BaseModel):
+    op: Literal["insert", "replace", "move", "delete", "add", "remove", "copy", "test"] = Field(
+        ..., description="Card/view op (insert, replace, move, delete) or, with 'path', a JSON Patch op (add, remove, replace, move, copy, test)")
+    path: Optional[str] = Field(None, description="JSON Pointer target (e.g. '/views/0/cards/2'); switches to JSON Patch semantics")
+    from_path: Optional[str] = Field(None, description="JSON Pointer source for JSON Patch move/copy ('from' in RFC 6902)")
+    view: Optional[Any] = Field(None, description="View index, path or title (card/view ops); omit with insert to add a view")
+    card_index: Optional[int] = Field(None, description="Card index within the view (0-based); omit to act on the view itself (insert appends a card)")
+    to_view: Optional[Any] = Field(None, description="Move: destination view index, path or title (default: same view)")
+    to_index: Optional[int] = Field(None, description="Move: final position in the destination (default: append); insert of a view: position")
+    value: Optional[Any] = Field(None, description="Card, view or value to insert/replace/add/test")
+    value_yaml: Optional[str] = Field(None, description="Same as value, as a YAML string")
+
+class PatchDashboardRequest(BaseModel):
+    dashboard_id: str = Field(..., description="Dashboard ID (e.g., 'lovelace' for default)")
+    operations: List[DashboardOperation] = Field(..., min_length=1, max_length=500, description="Operations, applied in order to the result of the previous one")
+    dry_run: bool = Field(False, description="If true, return the structural diff without saving")
+    return_config: bool = Field(False, description="Include the resulting full config in the response")
+    if_version: Optional[str] = Field(None, description="Only apply if the dashboard is still at this version (from get_dashboard_config); 412 otherwise")
 
 class CreateWeatherCardRequest(BaseModel):
     dashboard_id: str = Field(..., description="Dashboard ID")
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, Field
 
 class GetEntityRequest(BaseModel):
@@ -19,3 +19,8 @@ class RemoveEntityRequest(BaseModel):
 
 class GetEntityExposureRequest(BaseModel):
     entity_id: Optional[str] = Field(None, description="Specific entity ID (omit for all)")
+
+
+class FindReferencesRequest(BaseModel):
+    entity_id: str = Field(..., description="Entity ID to look up")
+    kinds: Optional[List[Literal["automation", "script", "dashboard"]]] = Field(None, description="Limit to these object kinds (omit for all)")
@@ -1,16 +1,54 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 class ReadFileRequest(BaseModel):
     model_config = {"populate_by_name": True}
     
     filepath: str = Field(..., description="Path relative to /config", alias="file_path")
+    offset: Optional[int] = Field(None, ge=0, description="Byte offset to start reading at (with optional length)")
+    length: Optional[int] = Field(None, ge=1, description="Number of bytes to read from offset")
+    head_lines: Optional[int] = Field(None, ge=1, description="Return only the first N lines")
+    tail_lines: Optional[int] = Field(None, ge=1, description="Return only the last N lines (e.g., recent log entries)")
+
+class ReadFilesRequest(BaseModel):
+    model_config = {"populate_by_name": True}
+    
+    filepaths: List[str] = Field(..., min_length=1, max_length=100, description="Paths relative to /config", alias="file_paths")
+    max_bytes_per_file: Optional[int] = Field(None, ge=1, le=16 * 1024 * 1024, description="Truncate each file's content to this many bytes (default FILE_BULK_MAX_FILE_BYTES, at most 16 MiB)")
+
+class WriteFileItem(BaseModel):
+    model_config = {"populate_by_name": True}
+    
+    filepath: str = Field(..., description="Path relative to /config", alias="file_path")
+    content: str = Field(..., description="File content to write")
+
+class WriteFilesRequest(BaseModel):
+    files: List[WriteFileItem] = Field(..., min_length=1, max_length=100, description="Files to write (each replaced atomically)")
+
+class DownloadFileRequest(BaseModel):
+    model_config = {"populate_by_name": True}
+    
+    filepath: str = Field(..., description="Path relative to /config", alias="file_path")
 
 class WriteFileRequest(BaseModel):
     model_config = {"populate_by_name": True}
     
     filepath: str = Field(..., description="Path relative to /config", alias="file_path")
     content: str = Field(..., description="File content to write")
+    if_match: Optional[str] = Field(None, description="Only write if the file's current ETag (from read_file) matches")
+
+class LineEdit(BaseModel):
+    start_line: int = Field(..., ge=1, description="First line to replace (1-based)")
+    end_line: int = Field(..., ge=0, description="Last line to replace (inclusive); start_line - 1 inserts before start_line")
+    content: str = Field("", description="Replacement text (empty deletes the lines)")
+
+class PatchFileRequest(BaseModel):
+    model_config = {"populate_by_name": True}
+    
+    filepath: str = Field(..., description="Path relative to /config", alias="file_path")
+    diff: Optional[str] = Field(None, description="Unified diff (as produced by diff -u / git diff) to apply")
+    edits: Optional[List[LineEdit]] = Field(None, description="Line-range replacements, numbered against the current file")
+    if_match: Optional[str] = Field(None, description="Only apply if the file's current ETag (from read_file) matches")
 
 class ListDirectoryRequest(BaseModel):
     model_config = {"populate_by_name": True}
@@ -43,14 +81,59 @@ class SearchFilesRequest(BaseModel):
     pattern: str = Field(..., description="Regex pattern to search for (e.g., '*.yaml')")
     path: str = Field(".", description="Starting directory path")
     recursive: bool = Field(True, description="Search recursively")
+    include: Optional[List[str]] = Field(None, description="Only files matching these globs (name, or path relative to /config if the glob contains '/')")
+    exclude: Optional[List[str]] = Field(None, description="Skip files and directories matching these globs (e.g., ['.storage', 'deps', '*.db'])")
+    max_depth: Optional[int] = Field(None, ge=0, description="Maximum directory depth below path (0 = path only)")
+    max_results: Optional[int] = Field(None, ge=1, le=100000, description="Stop after this many matches (default: no limit; the message says if truncated)")
+    stream: bool = Field(False, description="Stream results as NDJSON lines instead of one JSON response")
+    report: bool = Field(False, description="Return {matches, count, truncated, errors, error_count, scanned_dirs} in data instead of the plain list of paths")
 
 class ListFilesRequest(BaseModel):
     path: str = Field(".", description="Directory path")
     extensions: Optional[list] = Field(None, description="Filter by extensions (e.g., ['.yaml', '.json'])")
     recursive: bool = Field(False, description="List recursively")
+    include: Optional[List[str]] = Field(None, description="Only files matching these globs (name, or path relative to /config if the glob contains '/')")
+    exclude: Optional[List[str]] = Field(None, description="Skip files and directories matching these globs (e.g., ['.storage', 'deps', '*.db'])")
+    max_depth: Optional[int] = Field(None, ge=0, description="Maximum directory depth below path when recursive (0 = path only)")
+    max_results: Optional[int] = Field(None, ge=1, le=100000, description="Stop after this many files (default: no limit; the message says if truncated)")
+    stream: bool = Field(False, description="Stream results as NDJSON lines instead of one JSON response")
+    report: bool = Field(False, description="Return {matches, count, truncated, errors, error_count, scanned_dirs} in data instead of the plain list of paths")
+
+class GrepFilesRequest(BaseModel):
+    pattern: str = Field(..., description="Regex (or literal text with literal=true) to search for in file contents")
+    literal: bool = Field(False, description="Treat pattern as plain text")
+    ignore_case: bool = Field(False, description="Case-insensitive match")
+    path: str = Field(".", description="Starting directory path")
+    include: Optional[List[str]] = Field(None, description="Only files matching these globs (e.g., ['*.yaml'])")
+    exclude: Optional[List[str]] = Field(None, description="Skip files and directories matching these globs (e.g., ['.storage', 'deps'])")
+    max_depth: Optional[int] = Field(None, ge=0, description="Maximum directory depth below path (0 = path only)")
+    context: int = Field(0, ge=0, le=20, description="Lines of context before and after each matching line")
+    max_results: int = Field(500, ge=1, le=20000, description="Stop after this many matching lines (the response says if truncated)")
+    max_file_bytes: Optional[int] = Field(None, ge=1, description="Skip files larger than this (default FILE_GREP_MAX_FILE_BYTES)")
+    stream: bool = Field(False, description="Stream matches as NDJSON lines instead of one JSON response")
+
+class ExportArchiveRequest(BaseModel):
+    paths: List[str] = Field(["."], min_length=1, description="Files or directories to include (e.g., ['packages', 'custom_components'])")
+    format: Literal["tar", "zip"] = Field("tar", description="Archive format")
+    compression: Literal["gzip", "zstd", "none"] = Field("gzip", description="gzip (zip: deflate), zstd (tar only, needs the zstandard package) or none")
+    include: Optional[List[str]] = Field(None, description="Only files matching these globs (name, or path relative to /config if the glob contains '/')")
+    exclude: Optional[List[str]] = Field(None, description="Skip files and directories matching these globs (e.g., ['__pycache__', '*.db'])")
+
+class WatchFilesRequest(BaseModel):
+    path: str = Field(".", description="Directory to watch (recursively)")
+    include: Optional[List[str]] = Field(None, description="Only paths matching these globs (name, or path relative to /config if the glob contains '/', e.g. ['*.yaml', '.storage/lovelace*'])")
+    exclude: Optional[List[str]] = Field(None, description="Skip paths matching these globs, or under directories matching them (e.g., ['.storage', '*.db*'])")
+    events: List[Literal["created", "modified", "deleted"]] = Field(["created", "modified", "deleted"], min_length=1, description="Change types to report")
+    coalesce_ms: int = Field(250, ge=0, le=60000, description="Collect changes for this long after the first one and report each path once")
+    timeout_seconds: Optional[float] = Field(None, gt=0, description="End the stream after this many seconds (default: until the client disconnects)")
+    max_events: Optional[int] = Field(None, ge=1, description="End the stream after this many change events")
 
 class GetDirectoryTreeRequest(BaseModel):
     model_config = {"populate_by_name": True}
     
     dirpath: str = Field("", description="Root directory path", alias="dir_path")
     depth: int = Field(2, description="Maximum recursion depth")
+
+class FindDefinitionRequest(BaseModel):
+    name: str = Field(..., description="automation.<id>, script.<name>, or a bare automation id/alias or script name")
+    kind: Optional[Literal["automation", "script"]] = Field(None, description="Restrict to automations or scripts")
@@ -1,12 +1,37 @@
-from typing import Optional, List
+from typing import Dict, Optional, List, Literal
 from pydantic import BaseModel, Field
 
 class GetHistoryRequest(BaseModel):
     entity_ids: Optional[List[str]] = Field(None, description="Specific entity IDs")
     hours: Optional[int] = Field(None, description="Hours of history to retrieve")
     start_time: Optional[str] = Field(None, description="Start time ISO format (overrides hours)")
+    end_time: Optional[str] = Field(None, description="End time ISO format (default: now)")
     minimal_response: Optional[bool] = Field(False, description="Return minimal response")
     significant_changes_only: Optional[bool] = Field(False, description="Only significant state changes")
+    bucket: Optional[str] = Field(None, description="Aggregate into time buckets, e.g. '5m', '1h', '1d' (returns compact series)")
+    agg: Literal["mean", "min", "max", "last", "count", "time_weighted_mean"] = Field(
+        "mean", description="Bucket aggregation: mean, min, max, last, count, time_weighted_mean"
+    )
+    downsample: Optional[int] = Field(None, ge=3, description="LTTB-downsample each series to at most N points (for charting)")
+    backend: Optional[Literal["api", "recorder"]] = Field(
+        None, description="History source: 'api' (HA REST) or 'recorder' (read-only SQLite query on home-assistant_v2.db); default from HISTORY_BACKEND"
+    )
+    use_cache: bool = Field(True, description="Serve from the local history cache, fetching only missing intervals (requires entity_ids; minimal_response/bucket/downsample only)")
+
+class GetStatisticsRequest(BaseModel):
+    statistic_ids: List[str] = Field(..., min_length=1, description="Statistic IDs (usually sensor entity IDs, e.g. sensor.energy_total)")
+    hours: Optional[int] = Field(None, description="Hours of statistics to retrieve (default: 168 = 7 days)")
+    start_time: Optional[str] = Field(None, description="Start time ISO format (overrides hours)")
+    end_time: Optional[str] = Field(None, description="End time ISO format (default: now)")
+    period: Literal["5minute", "hour", "day", "week", "month"] = Field("hour", description="Aggregation period: 5minute, hour, day, week, month")
+    agg: Literal["mean", "min", "max", "sum", "state", "change"] = Field(
+        "mean", description="Statistic to return: mean/min/max (measurements) or sum/state/change (meters)"
+    )
+    units: Optional[Dict[str, str]] = Field(None, description="Unit conversion by unit class, e.g. {\"energy\": \"kWh\", \"temperature\": \"°C\"}")
+    downsample: Optional[int] = Field(None, ge=3, description="LTTB-downsample each series to at most N points")
+    backend: Optional[Literal["api", "recorder"]] = Field(
+        None, description="Statistics source: 'api' (WebSocket) or 'recorder' (read-only SQLite); default from HISTORY_BACKEND"
+    )
 
 class GetLogsRequest(BaseModel):
     source: Optional[str] = Field("core", description="Log source: 'core' or 'supervisor'")
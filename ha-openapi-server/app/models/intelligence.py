@@ -12,5 +12,5 @@ class ComfortOptimizationRequest(BaseModel):
     preferences: Optional[Dict[str, Any]] = Field(None, description="User preferences (temp, brightness, etc.)")
 
 class EnergyIntelligenceRequest(BaseModel):
-    period: Optional[str] = Field("day", description="Analysis period: day, week, month (currently not implemented)")
+    period: Optional[str] = Field("day", description="Analysis period for consumption totals: day, week, month")
     suggest_savings: bool = Field(True, description="Provide energy-saving suggestions")
@@ -12,7 +12,9 @@ class SetScriptRequest(BaseModel):
     mode: Optional[str] = Field("single", description="Execution mode: single, restart, queued, parallel")
     icon: Optional[str] = Field(None, description="Icon")
     fields: Optional[Dict[str, Any]] = Field(None, description="Input fields schema")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
 
 class RemoveScriptRequest(BaseModel):
     script_id: str = Field(..., description="Script ID to delete")
     confirm: bool = Field(False, description="Must be true to confirm deletion")
+    await_reload: bool = Field(False, description="Wait for the (debounced) reload to finish before responding")
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 # ============================================================================
@@ -11,6 +11,12 @@ class RestartHomeAssistantRequest(BaseModel):
 class CheckConfigRequest(BaseModel):
     pass
 
+class ValidateConfigRequest(BaseModel):
+    kinds: Optional[List[Literal["automation", "script"]]] = Field(None, description="What to validate (default: automations and scripts)")
+    files: Optional[List[str]] = Field(None, description="Only these files (relative to /config), e.g. ['automations.yaml']")
+    check_entities: bool = Field(True, description="Warn about entity_ids HA doesn't know")
+    check_services: bool = Field(True, description="Flag services HA doesn't provide")
+
 class GetSystemHealthRequest(BaseModel):
     pass
 
@@ -52,3 +58,13 @@ class GetDeviceDiagnosticsRequest(BaseModel):
 
 class ListAvailableDiagnosticsRequest(BaseModel):
     integration_filter: Optional[str] = Field(None, description="Filter by integration name")
+
+class AnalyzeRecorderRequest(BaseModel):
+    top_n: int = Field(25, ge=1, le=1000, description="Number of heaviest entities to return")
+    refresh: bool = Field(False, description="Ignore the cached result and re-run the analysis")
+    wait_seconds: float = Field(20.0, ge=0, le=300, description="Wait up to N seconds for the analysis before returning progress")
+
+class TopChattyEntitiesRequest(BaseModel):
+    window: Literal["1m", "15m", "1h"] = Field("15m", description="Rolling window: '1m', '15m' or '1h'")
+    limit: int = Field(20, ge=1, le=500, description="Number of entities to return")
+    domain: Optional[str] = Field(None, description="Only entities of this domain (e.g. 'sensor')")
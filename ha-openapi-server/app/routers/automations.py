@@ -1,16 +1,18 @@
 import logging
-import aiofiles
-import yaml
 from fastapi import APIRouter, Body, HTTPException
 from app.core.clients import ha_api
 from app.core.config import settings
+from app.core.config_files import config_cache, config_index, normalize_alias
+from app.core.reload import reload_scheduler
+from app.core.validation import config_validator
 from app.models.common import SuccessResponse
 from app.models.automation import (
     ListAutomationsRequest, TriggerAutomationRequest,
     CreateAutomationRequest, UpdateAutomationRequest,
     DeleteAutomationRequest, ToggleAutomationRequest,
     ReloadAutomationsRequest, GetAutomationDetailsRequest,
-    CreateSceneRequest, ActivateSceneRequest, ListScenesRequest
+    CreateSceneRequest, ActivateSceneRequest, ListScenesRequest,
+    BatchEditAutomationsRequest
 )
 
 logger = logging.getLogger(__name__)
@@ -74,12 +76,14 @@ async def get_automation_details(request: GetAutomationDetailsRequest = Body(...
 async def reload_automations(request: ReloadAutomationsRequest = Body(...)):
     """Reload automations from YAML configuration."""
     if request.validate_only:
-        # Note: In a real implementation this might check config first
-        # For refactoring parity, assuming basic pass if valid YAML structure, 
-        # basically a no-op until validation logic is moved here or call_service used
-        pass
+        report = await config_validator.validate(kinds=["automation"])
+        status = "valid" if report["valid"] else "invalid"
+        return SuccessResponse(
+            message=f"Automations {status}: {report['errors']} errors, {report['warnings']} warnings (not reloaded)",
+            data=report
+        )
 
-    await ha_api.call_service("automation", "reload")
+    await reload_scheduler.reload_now("automation")
     return SuccessResponse(message="Automations reloaded successfully")
 
 @router.post("/create_automation", operation_id="create_automation", summary="Create a new automation")
@@ -102,23 +106,18 @@ async def create_automation(request: CreateAutomationRequest = Body(...)):
         # Write to automations.yaml
         automations_file = settings.HA_CONFIG_PATH / "automations.yaml"
         
-        # Read existing automations
-        if automations_file.exists():
-            async with aiofiles.open(automations_file, 'r') as f:
-                content = await f.read()
-                existing = yaml.safe_load(content) or []
-        else:
-            existing = []
-        
-        # Add new automation
-        existing.append(automation_config)
-        
-        # Write back
-        async with aiofiles.open(automations_file, 'w') as f:
-            await f.write(yaml.dump(existing, default_flow_style=False))
+        async with config_cache.edit_lock:
+            # Read existing automations
+            existing = await config_cache.load(automations_file, default=[], mutable=True)
+
+            # Add new automation
+            existing.append(automation_config)
+
+            # Write back
+            await config_cache.dump(automations_file, existing)
         
         # Reload automations
-        await ha_api.call_service("automation", "reload")
+        await reload_scheduler.reload("automation", wait=request.await_reload)
         
         return SuccessResponse(
             message=f"Automation '{request.alias}' created successfully",
@@ -133,101 +132,47 @@ async def create_automation(request: CreateAutomationRequest = Body(...)):
 async def update_automation(request: UpdateAutomationRequest = Body(...)):
     """Update existing automation."""
     try:
-        automations_file = settings.HA_CONFIG_PATH / "automations.yaml"
-        
-        if not automations_file.exists():
-            raise HTTPException(status_code=404, detail="No automations.yaml found")
-        
-        # Read existing automations
-        async with aiofiles.open(automations_file, 'r') as f:
-            content = await f.read()
-            automations = yaml.safe_load(content) or []
-        
-        # Find and update the automation
         automation_name = request.automation_id.replace("automation.", "")
         
-        import re as _re
-        def normalize(s):
-            result = ''.join(c if c.isalnum() else '_' for c in s.lower())
-            return _re.sub(r'_+', '_', result)  # collapse consecutive underscores
-        
-        found = False
-        for auto in automations:
-            alias_normalized = normalize(auto.get('alias', ''))
-            # Try matching by id first, then by normalized alias
-            if (auto.get('id') == automation_name or 
-                alias_normalized == normalize(automation_name)):
-                found = True
-                found = True
-                if request.alias:
-                    auto['alias'] = request.alias
-                if request.trigger:
-                    auto['trigger'] = request.trigger
-                if request.condition is not None:
-                    auto['condition'] = request.condition
-                if request.action:
-                    auto['action'] = request.action
-                if request.mode:
-                    auto['mode'] = request.mode
-                break
-        
-        if not found:
-            # Also search packages directory for YAML-managed automations
-            import yaml as _yaml
-            from pathlib import Path as _Path
-            pkgs_dir = _Path(settings.HA_CONFIG_PATH) / "packages"
-            found_in_pkg = False
-            if pkgs_dir.exists():
-                for pkg_dir in pkgs_dir.iterdir():
-                    if pkg_dir.is_dir() and not found_in_pkg:
-                        for yf in pkg_dir.glob("*.yaml"):
-                            async with aiofiles.open(yf, 'r') as f:
-                                pkg_content = await f.read()
-                            pkg = _yaml.safe_load(pkg_content) or {}
-                            if isinstance(pkg, dict) and "automation" in pkg:
-                                for pa in pkg["automation"]:
-                                    if (pa.get('id') == automation_name or 
-                                        normalize(pa.get('alias', '')) == normalize(automation_name)):
-                                        found_in_pkg = True
-                                        auto = pa
-                                        current_file = yf
-                                        break
-                            if found_in_pkg:
-                                break
-                    if found_in_pkg:
-                        break
-            
-            if found_in_pkg:
-                # Update in place
-                if request.alias:
-                    auto['alias'] = request.alias
-                if request.trigger:
-                    auto['trigger'] = request.trigger
-                if request.condition is not None:
-                    auto['condition'] = request.condition
-                if request.action:
-                    auto['action'] = request.action
-                if request.mode:
-                    auto['mode'] = request.mode
-                
-                # Save back to package file
-                async with aiofiles.open(current_file, 'w') as f:
-                    await f.write(yaml.dump(pkg, default_flow_style=False))
-                await ha_api.call_service("automation", "reload")
-                return SuccessResponse(message=f"Automation {request.automation_id} updated (package)")
-            
-            raise HTTPException(status_code=404, detail=f"Automation {request.automation_id} not found")
-        
-        # Write back
-        async with aiofiles.open(automations_file, 'w') as f:
-            await f.write(yaml.dump(automations, default_flow_style=False))
-        
+        async with config_cache.edit_lock:
+            # Locate the definition (automations.yaml first, then packages) via the index
+            definitions = await config_index.find_automation(automation_name)
+            if not definitions:
+                raise HTTPException(status_code=404, detail=f"Automation {request.automation_id} not found")
+            definition = definitions[0]
+
+            doc = await config_cache.load(definition.path, mutable=True)
+            try:
+                auto = definition.locate(doc)
+            except (KeyError, IndexError, TypeError):
+                auto = None
+            if not definition.matches(auto, automation_name):
+                raise HTTPException(status_code=409, detail=f"{definition.path.name} changed while updating, retry")
+
+            if request.alias:
+                auto['alias'] = request.alias
+            if request.trigger:
+                auto['trigger'] = request.trigger
+            if request.condition is not None:
+                auto['condition'] = request.condition
+            if request.action:
+                auto['action'] = request.action
+            if request.mode:
+                auto['mode'] = request.mode
+
+            # Write back
+            await config_cache.dump(definition.path, doc)
+
         # Reload automations
-        await ha_api.call_service("automation", "reload")
+        await reload_scheduler.reload("automation", wait=request.await_reload)
         
+        if definition.section:
+            return SuccessResponse(message=f"Automation {request.automation_id} updated (package)")
         return SuccessResponse(
             message=f"Automation {request.automation_id} updated successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating automation: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -244,35 +189,28 @@ async def delete_automation(request: DeleteAutomationRequest = Body(...)):
         if not automations_file.exists():
             raise HTTPException(status_code=404, detail="No automations.yaml found")
         
-        # Read existing automations
-        async with aiofiles.open(automations_file, 'r') as f:
-            content = await f.read()
-            automations = yaml.safe_load(content) or []
-        
-        # Find and remove the automation
-        automation_name = request.automation_id.replace("automation.", "")
-        
-        import re as _re
-        def normalize(s):
-            result = ''.join(c if c.isalnum() else '_' for c in s.lower())
-            return _re.sub(r'_+', '_', result)  # collapse consecutive underscores
-        
-        original_count = len(automations)
-        automations = [
-            auto for auto in automations
-            if (auto.get('id') != automation_name and 
-                normalize(auto.get('alias', '')) != normalize(automation_name))
-        ]
-        
-        if len(automations) == original_count:
-            raise HTTPException(status_code=404, detail=f"Automation {request.automation_id} not found")
-        
-        # Write back
-        async with aiofiles.open(automations_file, 'w') as f:
-            await f.write(yaml.dump(automations, default_flow_style=False))
-        
+        async with config_cache.edit_lock:
+            # Read existing automations
+            automations = await config_cache.load(automations_file, default=[], mutable=True)
+
+            # Find and remove the automation
+            automation_name = request.automation_id.replace("automation.", "")
+
+            original_count = len(automations)
+            automations = [
+                auto for auto in automations
+                if (auto.get('id') != automation_name and 
+                    normalize_alias(auto.get('alias', '')) != normalize_alias(automation_name))
+            ]
+
+            if len(automations) == original_count:
+                raise HTTPException(status_code=404, detail=f"Automation {request.automation_id} not found")
+
+            # Write back
+            await config_cache.dump(automations_file, automations)
+
         # Reload automations
-        await ha_api.call_service("automation", "reload")
+        await reload_scheduler.reload("automation", wait=request.await_reload)
         
         return SuccessResponse(message=f"Automation {request.automation_id} deleted successfully")
         
@@ -280,6 +218,126 @@ async def delete_automation(request: DeleteAutomationRequest = Body(...)):
         logger.error(f"Error deleting automation: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch_edit_automations", operation_id="batch_edit_automations", summary="Create, update and delete automations in one transaction")
+async def batch_edit_automations(request: BatchEditAutomationsRequest = Body(...)):
+    """
+    Apply many automation edits with one parse/write per file and a single reload.
+
+    Operations are validated and applied in memory first; if any fails nothing
+    is written. Each operation sees the result of the earlier ones, so an
+    automation created or renamed in the batch can be updated or deleted by
+    its new id/alias further down. Each touched file (automations.yaml and/or
+    package files) is written atomically, and if a later write fails the
+    earlier files are restored. Config edits are serialized, so concurrent
+    batches cannot overwrite each other.
+    """
+    automations_file = settings.HA_CONFIG_PATH / "automations.yaml"
+    docs = {}
+    removed = set()  # ids of automation dicts deleted by this batch (still held by docs until written)
+    touched = []
+    results, errors = [], []
+
+    async def doc_for(path):
+        if path not in docs:
+            docs[path] = await config_cache.load(path, default=[] if path == automations_file else {}, mutable=True)
+        return docs[path]
+
+    async def find(name):
+        """(definition, automation) pairs matching `name` in the documents as edited so far."""
+        for definition in await config_index.find_automation(name):
+            await doc_for(definition.path)  # candidates from disk; matching happens on the edited copies
+        found = []
+        for path, doc in docs.items():
+            for definition in config_index.definitions_in(path, doc):
+                if definition.kind != "automation":
+                    continue
+                auto = definition.locate(doc)
+                if id(auto) not in removed and definition.matches(auto, name):
+                    found.append((definition, auto))
+        return found
+
+    async with config_cache.edit_lock:
+        for index, op in enumerate(request.operations):
+            label = op.automation_id or op.alias
+            if op.op == "create":
+                if not (op.alias and op.trigger and op.action):
+                    errors.append({"index": index, "op": op.op, "error": "create requires alias, trigger and action"})
+                    continue
+                automation_config = {"alias": op.alias, "trigger": op.trigger, "action": op.action, "mode": op.mode or "single"}
+                if op.description:
+                    automation_config["description"] = op.description
+                if op.condition:
+                    automation_config["condition"] = op.condition
+                (await doc_for(automations_file)).append(automation_config)
+                if automations_file not in touched:
+                    touched.append(automations_file)
+                results.append({"index": index, "op": op.op, "automation": label, "file": "automations.yaml"})
+                continue
+
+            if not op.automation_id:
+                errors.append({"index": index, "op": op.op, "error": f"{op.op} requires automation_id"})
+                continue
+            targets = await find(op.automation_id.replace("automation.", ""))
+            if op.op == "update":
+                targets = targets[:1]
+            if not targets:
+                errors.append({"index": index, "op": op.op, "automation": label, "error": "not found"})
+                continue
+
+            for definition, auto in targets:
+                if definition.path not in touched:
+                    touched.append(definition.path)
+                if op.op == "delete":
+                    removed.add(id(auto))
+                else:
+                    for field in ("alias", "description", "trigger", "action", "mode"):
+                        if getattr(op, field):
+                            auto[field] = getattr(op, field)
+                    if op.condition is not None:
+                        auto["condition"] = op.condition
+                results.append({
+                    "index": index, "op": op.op, "automation": label,
+                    "file": str(definition.path.relative_to(settings.HA_CONFIG_PATH)),
+                })
+
+        if errors:
+            raise HTTPException(status_code=400, detail={"message": "No changes written", "errors": errors})
+
+        if removed:
+            for path in touched:
+                doc = docs[path]
+                container = doc if path == automations_file else doc.get("automation")
+                if isinstance(container, list):
+                    container[:] = [auto for auto in container if id(auto) not in removed]
+
+        # Write every touched file; on failure put back the ones already written
+        written = []
+        try:
+            for path in touched:
+                snapshot = await config_cache.snapshot(path)
+                await config_cache.dump(path, docs[path])
+                written.append((path, snapshot))
+        except Exception as e:
+            logger.error(f"Batch automation edit failed writing {path}, rolling back: {e}", exc_info=True)
+            for written_path, snapshot in reversed(written):
+                await config_cache.restore(written_path, snapshot)
+            raise HTTPException(status_code=500, detail=f"Write to {path.name} failed, {len(written)} file(s) rolled back: {e}")
+
+    await reload_scheduler.reload("automation", wait=request.await_reload)
+
+    counts = {kind: sum(1 for r in results if r["op"] == kind) for kind in ("create", "update", "delete")}
+    return SuccessResponse(
+        message=(
+            f"Applied {len(request.operations)} operations "
+            f"({counts['create']} created, {counts['update']} updated, {counts['delete']} deleted) "
+            f"across {len(touched)} file(s) with one reload"
+        ),
+        data={
+            "results": results,
+            "files": [str(path.relative_to(settings.HA_CONFIG_PATH)) for path in touched],
+        }
+    )
+
 @router.post("/create_scene", operation_id="create_scene", summary="Create a scene")
 async def create_scene(request: CreateSceneRequest = Body(...)):
     """Create a temporary scene."""
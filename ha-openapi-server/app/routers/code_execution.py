@@ -1,12 +1,18 @@
 import logging
 import base64
-import io
 import json
 import re
-from datetime import datetime
-from typing import List, Dict, Any
-from fastapi import APIRouter, Body, HTTPException
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from fastapi import APIRouter, Body, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from app.core.charts import chart_cache, render_chart_async
 from app.core.clients import ha_api
+from app.core.config import settings
+from app.core.history import fetch_statistics, statistics_arrays
+from app.core.history_cache import history_cache
+from app.core.timeseries import bucket_aggregate, lttb, to_numeric_series
 from app.models.common import SuccessResponse
 from app.models.code_execution import (
     ExecutePythonRequest,
@@ -172,10 +178,10 @@ async def analyze_states_dataframe(request: AnalyzeStatesRequest = Body(...)):
 
 
 @router.post("/plot_sensor_history", operation_id="plot_sensor_history", summary="Plot sensor history chart")
-async def plot_sensor_history(request: PlotSensorHistoryRequest = Body(...)):
+async def plot_sensor_history(http_request: Request, request: PlotSensorHistoryRequest = Body(...)):
     """
     Plot sensor history as a time-series chart.
-    Returns base64-encoded PNG image.
+    Returns base64-encoded PNG/SVG image (or the raw bytes with raw=true).
     
     **USE CASES:**
     - Temperature trends
@@ -184,69 +190,110 @@ async def plot_sensor_history(request: PlotSensorHistoryRequest = Body(...)):
     
     **CHART TYPES:**
     - line: Time-series line chart
-    - bar: Bar chart comparison
+    - bar: Bar chart comparison (time-weighted mean over the window per entity)
     - scatter: Scatter plot
     
-    **NOTE:** Uses current state data. For full history, use get_entity_history endpoint.
+    **SOURCE:** `history` plots raw state history; `statistics` plots the recorder's
+    hourly/daily long-term statistics (much cheaper for long windows); `auto`
+    switches to statistics above CHART_STATISTICS_MIN_HOURS.
+    
+    **CACHING:** History is fetched for the last `hours`, downsampled (LTTB) to the
+    image width and rendered off the event loop. The window end is aligned to a
+    time bucket, so repeated refreshes within a bucket are served from cache.
+    Responses carry an ETag; send If-None-Match to get a 304 when unchanged.
     """
+    entity_ids = sorted(set(request.entity_ids))
+    if not entity_ids:
+        raise HTTPException(status_code=400, detail="Provide at least one entity_id to plot")
     try:
-        import pandas as pd
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-        
-        # Get current state for each entity (simplified - real implementation would use history API)
-        all_data = []
-        
-        # Note: In a real implementation, we would fetch history from HA API
-        # For now, we'll just plot current states if they are numeric, or mock some data
-        # But since this is a port, I'll stick to what was likely there or a safe placeholder
-        # The original code was cut off in the read, so I'll implement a basic version
-        
-        states = await ha_api.get_states()
-        
-        # Filter for requested entities
-        target_states = [s for s in states if s["entity_id"] in request.entity_ids]
-        
-        # Create a simple plot of current values (since we don't have history API client yet)
-        # Or better, just return a message saying history plotting requires history API
-        # But to match the "Code Execution" theme, let's try to plot something.
-        
-        values = []
-        labels = []
-        
-        for state in target_states:
-            try:
-                val = float(state.get("state"))
-                values.append(val)
-                labels.append(state.get("attributes", {}).get("friendly_name", state["entity_id"]))
-            except (ValueError, TypeError):
-                pass
-        
-        if not values:
-             raise HTTPException(status_code=404, detail="No numeric data found for requested entities")
+        window = request.hours * 3600
+        bucket = max(settings.CHART_CACHE_BUCKET_SECONDS, window // request.width)
+        end_ts = int(time.time()) // bucket * bucket
+        title = request.title or "Sensor History"
+        source = request.source
+        if source == "auto":
+            source = "statistics" if request.hours > settings.CHART_STATISTICS_MIN_HOURS else "history"
 
-        plt.figure(figsize=(10, 6))
-        if request.chart_type == "bar":
-            plt.bar(labels, values)
-        else:
-            plt.plot(labels, values, marker='o')
-            
-        plt.title(request.title or "Sensor Values")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        
-        return SuccessResponse(
-            message="Chart generated",
-            data={"image_base64": img_base64}
+        cache_key = (
+            tuple(entity_ids), window, end_ts, request.chart_type,
+            request.format, request.width, request.height, title, source,
+        )
+        chart = chart_cache.get(cache_key)
+        cached = chart is not None
+
+        def points(ts, vals):
+            # Bars show a mean, so they get the raw values averaged per bucket; LTTB keeps the visual shape
+            if request.chart_type == "bar":
+                return bucket_aggregate(ts, vals, end_ts - window, end_ts, bucket, "time_weighted_mean")
+            return lttb(ts, vals, request.width)
+
+        if not cached:
+            plotted = []  # (entity_id, display name, (ts, values), unit)
+            remaining = entity_ids
+            if source == "statistics":
+                # Recorder hourly/daily aggregates; entities without statistics fall back to history
+                period = "hour" if request.hours <= 24 * 31 else "day"
+                stats = await fetch_statistics(entity_ids, end_ts - window, end_ts, period=period, types=["mean", "state"])
+                for statistic_id, stat in stats.items():
+                    ts, vals = statistics_arrays(stat["rows"], ["mean", "state"])
+                    if len(ts):
+                        plotted.append((statistic_id, stat.get("name") or statistic_id,
+                                        points(ts, vals), stat["unit_of_measurement"]))
+                remaining = [e for e in entity_ids if e not in stats]
+
+            history = await history_cache.get(remaining, end_ts - window, end_ts) if remaining else []
+            for states in history:
+                if not states:
+                    continue
+                first = states[0]
+                attributes = first.get("attributes", {})
+                entity_id = first.get("entity_id", f"series_{len(plotted)}")
+                ts, vals = to_numeric_series(states)
+                if len(ts):
+                    plotted.append((entity_id, attributes.get("friendly_name") or entity_id,
+                                    points(ts, vals), attributes.get("unit_of_measurement")))
+
+            # Legend labels are friendly names, qualified by entity_id where two entities share one
+            names = Counter(name for _, name, _, _ in plotted)
+            series = {}
+            units = {}
+            for entity_id, name, points, unit in plotted:
+                label = name if names[name] == 1 or name == entity_id else f"{name} ({entity_id})"
+                series[label] = points
+                units[label] = unit
+
+            if not series:
+                raise HTTPException(status_code=404, detail="No numeric history found for requested entities")
+
+            chart = await render_chart_async(
+                series, request.chart_type, title,
+                request.width, request.height, request.format, units,
+            )
+            chart_cache.put(cache_key, chart)
+
+        headers = {"ETag": chart.etag, "Cache-Control": f"max-age={bucket}"}
+        if http_request.headers.get("if-none-match") == chart.etag:
+            return Response(status_code=304, headers=headers)
+        if request.raw:
+            return Response(content=chart.content, media_type=chart.media_type, headers=headers)
+
+        return JSONResponse(
+            content=SuccessResponse(
+                message="Chart served from cache" if cached else "Chart generated",
+                data={
+                    "image_base64": base64.b64encode(chart.content).decode("utf-8"),
+                    "format": request.format,
+                    "etag": chart.etag,
+                    "cached": cached,
+                    "points": chart.points,
+                    "window_end": datetime.fromtimestamp(end_ts, timezone.utc).isoformat(),
+                }
+            ).model_dump(),
+            headers=headers,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Plotting error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,16 @@
 """Lovelace dashboard management: list, config, card creation with dry-run."""
+import asyncio
 import logging
 import yaml
 from typing import Any, Dict, Optional
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Response
 from app.core.clients import get_ws_client
+from app.core.dashboard_patch import DashboardPatchError, apply_operations
+from app.core.dashboards import DashboardVersionMismatch, dashboard_cache
+from app.core.yaml_io import load_yaml
 from app.models.common import SuccessResponse
 from app.models.dashboard import (
+    DashboardVersionResponse,
     GetDashboardConfigRequest,
     UpdateDashboardConfigRequest,
     ListDashboardsRequest,
@@ -13,6 +18,7 @@ from app.models.dashboard import (
     DeleteDashboardRequest,
     ManualCreateCustomCardRequest,
     ManualEditCustomCardRequest,
+    PatchDashboardRequest,
 )
 
 logger = logging.getLogger(__name__)
@@ -47,32 +53,56 @@ async def list_dashboards(request: ListDashboardsRequest = Body(default_factory=
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _version_conflict(e: DashboardVersionMismatch) -> HTTPException:
+    return HTTPException(
+        status_code=412,
+        detail={"message": "Precondition failed: dashboard changed since it was read", "version": e.current}
+    )
+
+
+def _versioned(response: Response, message: str, data: Any, version: str) -> DashboardVersionResponse:
+    """Response carrying the dashboard version as a field and as ETag / X-Dashboard-Version headers."""
+    response.headers["ETag"] = f'"{version}"'
+    response.headers["X-Dashboard-Version"] = version
+    return DashboardVersionResponse(message=message, data=data, version=version)
+
+
+def _with_view_cards(config: Dict[str, Any], view_index: int, cards: list) -> Dict[str, Any]:
+    """Copy of `config` with one view's cards replaced; only the path to that list is copied.
+
+    Cached configs are shared, so edits never mutate them in place.
+    """
+    views = list(config["views"])
+    views[view_index] = {**views[view_index], "cards": cards}
+    return {**config, "views": views}
+
+
 @router.post("/get_dashboard_config", operation_id="get_dashboard_config", summary="Get dashboard config")
-async def get_dashboard_config(request: GetDashboardConfigRequest = Body(...)):
-    """Get Lovelace dashboard configuration via WebSocket."""
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
-    
-    if url_path:
-        config = await ws.call_command("lovelace/config", url_path=url_path)
-    else:
-        config = await ws.call_command("lovelace/config")
-        
-    return SuccessResponse(message="Dashboard config retrieved", data=config)
+async def get_dashboard_config(response: Response, request: GetDashboardConfigRequest = Body(...)):
+    """Get Lovelace dashboard configuration.
+
+    Served from the dashboard cache (refreshed when HA reports the dashboard
+    changed). The config's `version` (also in the ETag and
+    X-Dashboard-Version headers) can be passed as `if_version` when saving
+    to avoid overwriting someone else's edits.
+    """
+    config, version = await dashboard_cache.get(request.dashboard_id)
+    return _versioned(response, f"Dashboard config retrieved (version {version})", config, version)
 
 
 @router.post("/save_dashboard_config", operation_id="save_dashboard_config", summary="Save dashboard config")
-async def save_dashboard_config(request: UpdateDashboardConfigRequest = Body(...)):
-    """Save full Lovelace dashboard configuration via WebSocket."""
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
+async def save_dashboard_config(response: Response, request: UpdateDashboardConfigRequest = Body(...)):
+    """Save full Lovelace dashboard configuration via WebSocket.
 
+    With `if_version`, the save is refused (412, with the current version)
+    if the dashboard changed since that version was read. `data` is HA's
+    result; the new `version` is returned next to it and in the headers.
+    """
     try:
-        if url_path:
-            result = await ws.call_command("lovelace/config/save", url_path=url_path, config=request.config)
-        else:
-            result = await ws.call_command("lovelace/config/save", config=request.config)
-        return SuccessResponse(message="Dashboard config saved", data=result)
+        result, version = await dashboard_cache.save(request.dashboard_id, request.config, request.if_version)
+        return _versioned(response, "Dashboard config saved", result, version)
+    except DashboardVersionMismatch as e:
+        raise _version_conflict(e)
     except Exception as e:
         logger.error(f"Error saving dashboard: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -91,7 +121,7 @@ async def manual_create_custom_card(request: ManualCreateCustomCardRequest = Bod
     """
     # Parse YAML first — catch syntax errors before doing anything
     try:
-        card_config = yaml.safe_load(request.card_yaml)
+        card_config = load_yaml(request.card_yaml)
     except yaml.YAMLError as e:
         raise HTTPException(status_code=400, detail=f"YAML parse error: {e}")
 
@@ -100,33 +130,21 @@ async def manual_create_custom_card(request: ManualCreateCustomCardRequest = Bod
     if "type" not in card_config:
         raise HTTPException(status_code=400, detail="Card YAML must include a 'type' key")
 
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
-
-    # Get current dashboard config
-    if url_path:
-        config = await ws.call_command("lovelace/config", url_path=url_path)
-    else:
-        config = await ws.call_command("lovelace/config")
+    # Get current dashboard config (cached, shared: edited by copying the path to the view's cards)
+    config, version = await dashboard_cache.get(request.dashboard_id)
 
     # Validate view_index exists
     views = config.get("views", [])
     if request.view_index < 0 or request.view_index >= len(views):
         raise HTTPException(status_code=400, detail=f"View index {request.view_index} out of range (0-{len(views)-1})")
 
-    # Deep copy config for preview/apply
-    import copy
-    new_config = copy.deepcopy(config)
-    view = new_config["views"][request.view_index]
-
-    # Ensure cards list exists
-    if "cards" not in view:
-        view["cards"] = []
-
     # Insert card at position or append
-    pos = request.position if request.position is not None else len(view["cards"])
-    pos = max(0, min(pos, len(view["cards"])))
-    view["cards"].insert(pos, card_config)
+    cards = list(views[request.view_index].get("cards", []))
+    pos = request.position if request.position is not None else len(cards)
+    pos = max(0, min(pos, len(cards)))
+    cards.insert(pos, card_config)
+    new_config = _with_view_cards(config, request.view_index, cards)
+    view = new_config["views"][request.view_index]
 
     # Check if this is a dry run (check for dry_run field in request)
     # ManualCreateCustomCardRequest doesn't have dry_run, so we check if position is -1
@@ -149,10 +167,7 @@ async def manual_create_custom_card(request: ManualCreateCustomCardRequest = Bod
 
     # Apply: save the modified config
     try:
-        if url_path:
-            result = await ws.call_command("lovelace/config/save", url_path=url_path, config=new_config)
-        else:
-            result = await ws.call_command("lovelace/config/save", config=new_config)
+        result, new_version = await dashboard_cache.save(request.dashboard_id, new_config, request.if_version or version)
         return SuccessResponse(
             message="Card created and saved",
             data={
@@ -163,8 +178,11 @@ async def manual_create_custom_card(request: ManualCreateCustomCardRequest = Bod
                 "view_title": view.get("title", view.get("path", f"view_{request.view_index}")),
                 "total_cards_in_view": len(view["cards"]),
                 "save_result": result,
+                "version": new_version,
             }
         )
+    except DashboardVersionMismatch as e:
+        raise _version_conflict(e)
     except Exception as e:
         logger.error(f"Error saving card: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Save failed: {e}")
@@ -174,51 +192,101 @@ async def manual_create_custom_card(request: ManualCreateCustomCardRequest = Bod
 async def manual_edit_custom_card(request: ManualEditCustomCardRequest = Body(...)):
     """Edit an existing card on a Lovelace dashboard."""
     try:
-        card_config = yaml.safe_load(request.card_yaml)
+        card_config = load_yaml(request.card_yaml)
     except yaml.YAMLError as e:
         raise HTTPException(status_code=400, detail=f"YAML parse error: {e}")
 
     if not isinstance(card_config, dict):
         raise HTTPException(status_code=400, detail="Card YAML must be a dict/object")
 
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
+    config, version = await dashboard_cache.get(request.dashboard_id)
 
-    if url_path:
-        config = await ws.call_command("lovelace/config", url_path=url_path)
-    else:
-        config = await ws.call_command("lovelace/config")
-
-    import copy
-    new_config = copy.deepcopy(config)
-    view = new_config["views"][request.view_index]
-    cards = view.get("cards", [])
+    views = config.get("views", [])
+    if request.view_index < 0 or request.view_index >= len(views):
+        raise HTTPException(status_code=400, detail=f"View index {request.view_index} out of range (0-{len(views)-1})")
+    cards = list(views[request.view_index].get("cards", []))
 
     if request.card_index < 0 or request.card_index >= len(cards):
         raise HTTPException(status_code=400, detail=f"Card index {request.card_index} out of range (0-{len(cards)-1})")
 
     cards[request.card_index] = card_config
+    new_config = _with_view_cards(config, request.view_index, cards)
 
     try:
-        if url_path:
-            result = await ws.call_command("lovelace/config/save", url_path=url_path, config=new_config)
-        else:
-            result = await ws.call_command("lovelace/config/save", config=new_config)
-        return SuccessResponse(message="Card updated and saved", data={"applied": True, "card": card_config})
+        result, new_version = await dashboard_cache.save(request.dashboard_id, new_config, request.if_version or version)
+        return SuccessResponse(message="Card updated and saved", data={"applied": True, "card": card_config, "version": new_version})
+    except DashboardVersionMismatch as e:
+        raise _version_conflict(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Save failed: {e}")
 
 
-@router.post("/list_dashboard_views", operation_id="list_dashboard_views", summary="List views in a dashboard")
-async def list_dashboard_views(request: GetDashboardConfigRequest = Body(...)):
-    """List all views/tabs in a dashboard with their titles and card counts."""
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
+@router.post("/patch_dashboard", operation_id="patch_dashboard", summary="Apply card/view operations to a dashboard in one save")
+async def patch_dashboard(request: PatchDashboardRequest = Body(...)):
+    """Apply an ordered list of card/view operations and save the dashboard once.
 
-    if url_path:
-        config = await ws.call_command("lovelace/config", url_path=url_path)
-    else:
-        config = await ws.call_command("lovelace/config")
+    Without `path`, operations address cards by `view` (index, path or
+    title) and `card_index`: insert, replace, move (to `to_view`/`to_index`)
+    and delete; leaving out card_index makes them act on the view itself.
+    With a JSON Pointer `path`, `op` follows JSON Patch (add, remove,
+    replace, move/copy from `from_path`, test), which also reaches sections
+    and any other nested key. Each operation sees the result of the previous
+    one; if any does not apply (409) nothing is saved.
+
+    The response lists what changed as a structural diff (add/remove/replace/
+    move with JSON Pointers). Set dry_run=true to get only the diff. The save
+    is refused (412) if the dashboard changed since it was read, or since
+    `if_version` when given.
+    """
+    operations = []
+    for index, op in enumerate(request.operations):
+        operation = {"op": op.op, "path": op.path, "from": op.from_path, "view": op.view,
+                     "card_index": op.card_index, "to_view": op.to_view, "to_index": op.to_index}
+        if op.value_yaml is not None:
+            try:
+                operation["value"] = load_yaml(op.value_yaml)
+            except yaml.YAMLError as e:
+                raise HTTPException(status_code=400, detail=f"Operation {index} ({op.op}): YAML parse error: {e}")
+        elif "value" in op.model_fields_set:
+            operation["value"] = op.value
+        operations.append(operation)
+
+    config, version = await dashboard_cache.get(request.dashboard_id)
+
+    # Cached configs are shared: the patch copies only the containers it edits
+    try:
+        new_config, changes = await asyncio.to_thread(apply_operations, config, operations)
+    except DashboardPatchError as e:
+        raise HTTPException(status_code=409, detail=f"Patch does not apply: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    data = {"applied": False, "changes": changes, "base_version": version}
+    if request.return_config:
+        data["config"] = new_config
+    summary = f"{len(request.operations)} operations, {len(changes)} changes"
+    if request.dry_run:
+        return SuccessResponse(message=f"Dry run — {summary}, not saved", data=data)
+    if not changes:
+        return SuccessResponse(message=f"{summary}, nothing to save", data={**data, "version": version})
+
+    try:
+        result, new_version = await dashboard_cache.save(request.dashboard_id, new_config, request.if_version or version)
+    except DashboardVersionMismatch as e:
+        raise _version_conflict(e)
+    except Exception as e:
+        logger.error(f"Error saving dashboard patch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Save failed: {e}")
+    return SuccessResponse(
+        message=f"{summary}, saved",
+        data={**data, "applied": True, "save_result": result, "version": new_version}
+    )
+
+
+@router.post("/list_dashboard_views", operation_id="list_dashboard_views", summary="List views in a dashboard")
+async def list_dashboard_views(response: Response, request: GetDashboardConfigRequest = Body(...)):
+    """List all views/tabs in a dashboard with their titles and card counts (plus the dashboard `version`)."""
+    config, version = await dashboard_cache.get(request.dashboard_id)
 
     views = config.get("views", [])
     result = []
@@ -230,7 +298,7 @@ async def list_dashboard_views(request: GetDashboardConfigRequest = Body(...)):
             "icon": v.get("icon"),
             "card_count": len(v.get("cards", [])),
         })
-    return SuccessResponse(message=f"Found {len(result)} views", data=result)
+    return _versioned(response, f"Found {len(result)} views (version {version})", result, version)
 
 
 @router.post("/preview_card", operation_id="preview_card", summary="Preview card without saving (dry run)")
@@ -241,7 +309,7 @@ async def preview_card(request: ManualCreateCustomCardRequest = Body(...)):
     This is the same as manual_create_custom_card but always dry_run=true.
     """
     try:
-        card_config = yaml.safe_load(request.card_yaml)
+        card_config = load_yaml(request.card_yaml)
     except yaml.YAMLError as e:
         raise HTTPException(status_code=400, detail=f"YAML parse error: {e}")
 
@@ -250,28 +318,17 @@ async def preview_card(request: ManualCreateCustomCardRequest = Body(...)):
     if "type" not in card_config:
         raise HTTPException(status_code=400, detail="Card YAML must include a 'type' key")
 
-    ws = await get_ws_client()
-    url_path = request.dashboard_id if request.dashboard_id != "lovelace" else None
-
-    if url_path:
-        config = await ws.call_command("lovelace/config", url_path=url_path)
-    else:
-        config = await ws.call_command("lovelace/config")
+    config, _ = await dashboard_cache.get(request.dashboard_id)
 
     views = config.get("views", [])
     if request.view_index < 0 or request.view_index >= len(views):
         raise HTTPException(status_code=400, detail=f"View index {request.view_index} out of range (0-{len(views)-1})")
 
-    import copy
-    new_config = copy.deepcopy(config)
-    view = new_config["views"][request.view_index]
-
-    if "cards" not in view:
-        view["cards"] = []
-
-    pos = request.position if request.position is not None else len(view["cards"])
-    pos = max(0, min(pos, len(view["cards"])))
-    view["cards"].insert(pos, card_config)
+    view = views[request.view_index]
+    cards = list(view.get("cards", []))
+    pos = request.position if request.position is not None else len(cards)
+    pos = max(0, min(pos, len(cards)))
+    cards.insert(pos, card_config)
 
     return SuccessResponse(
         message="Preview generated — card NOT saved",
@@ -281,7 +338,7 @@ async def preview_card(request: ManualCreateCustomCardRequest = Body(...)):
             "view_index": request.view_index,
             "card_position": pos,
             "view_title": view.get("title", view.get("path", f"view_{request.view_index}")),
-            "total_cards_in_view": len(view["cards"]),
-            "card_types_in_view": [c.get("type", "?") for c in view["cards"]],
+            "total_cards_in_view": len(cards),
+            "card_types_in_view": [c.get("type", "?") for c in cards],
         }
     )
\ No newline at end of file
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Body, HTTPException
+from app.core.chatty import chatty_tracker
 from app.core.clients import http_client, ha_api, get_ws_client
 from app.core.config import settings
+from app.core.events import event_stream
+from app.core.recorder_analyzer import exclude_yaml, recorder_analyzer
 from app.models.common import SuccessResponse
 from app.models.system import (
     GetConfigEntryDiagnosticsRequest, GetDeviceDiagnosticsRequest,
-    ListAvailableDiagnosticsRequest
+    ListAvailableDiagnosticsRequest, AnalyzeRecorderRequest, TopChattyEntitiesRequest
 )
 
 router = APIRouter(tags=["diagnostics"])
@@ -107,4 +110,63 @@ async def list_available_diagnostics(request: ListAvailableDiagnosticsRequest =
             "entries": diag_entries,
             "devices": diag_devices,
         }
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/analyze_recorder", operation_id="analyze_recorder", summary="Analyze recorder database bloat")
+async def analyze_recorder(request: AnalyzeRecorderRequest = Body(default_factory=AnalyzeRecorderRequest)):
+    """Report which entities and event types make home-assistant_v2.db grow.
+
+    Reads the recorder database read-only and reports, per entity: rows,
+    state changes vs attribute-only updates, rows per hour, distinct attribute
+    payload bytes and the estimated bytes saved by excluding it. Also returns
+    rows per event type and a ready-to-paste `recorder: exclude:` snippet.
+
+    The scan runs in a worker thread; if it takes longer than `wait_seconds`
+    the response carries `status: running` with stage/progress - call again
+    to poll. Results are cached (use refresh=true to re-run).
+    """
+    if not recorder_analyzer.db.available:
+        raise HTTPException(status_code=404, detail=f"Recorder database not found at {recorder_analyzer.db.path}")
+
+    job = recorder_analyzer.start(refresh=request.refresh)
+    await recorder_analyzer.wait(job, request.wait_seconds)
+
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=f"Recorder analysis failed: {job.error}")
+    if job.status == "running":
+        return SuccessResponse(
+            message=f"Analysis running: {job.stage} ({int(job.progress * 100)}%)",
+            data=job.summary()
+        )
+
+    result = job.result
+    return SuccessResponse(
+        message=f"Analyzed {len(result['entities'])} entities in {result['database']['size_bytes'] // (1024 * 1024)} MB recorder database",
+        data={
+            **job.summary(),
+            "database": result["database"],
+            "entities": result["entities"][:request.top_n],
+            "event_types": result["event_types"],
+            "suggested_exclude": result["suggested_exclude"],
+            "suggested_exclude_bytes": result["suggested_exclude_bytes"],
+            "suggested_exclude_yaml": exclude_yaml(result["suggested_exclude"]) if result["suggested_exclude"] else None,
+        }
+    )
+
+
+@router.post("/top_chatty_entities", operation_id="top_chatty_entities", summary="Top chatty entities")
+async def top_chatty_entities(request: TopChattyEntitiesRequest = Body(...)):
+    """Entities with the most state_changed events over a rolling window (live event stream)."""
+    if not settings.CHATTY_TRACKER_ENABLED:
+        raise HTTPException(status_code=503, detail="Chatty entity tracking is disabled (CHATTY_TRACKER_ENABLED)")
+
+    result = chatty_tracker.top(request.window, request.limit, request.domain)
+    result["event_stream"] = event_stream.stats()
+    top = result["entities"][0] if result["entities"] else None
+    message = (
+        f"Top {len(result['entities'])} chatty entities over {request.window}; "
+        f"busiest: {top['entity_id']} ({top['changes_per_minute']}/min)"
+        if top else f"No state changes recorded over {request.window}"
+    )
+    return SuccessResponse(message=message, data=result)
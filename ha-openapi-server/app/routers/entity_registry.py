@@ -1,9 +1,11 @@
 import logging
 from fastapi import APIRouter, Body, HTTPException
 from app.core.clients import ha_api, get_ws_client
+from app.core.references import reference_index
 from app.models.common import SuccessResponse
 from app.models.entity_registry import (
-    GetEntityRequest, SetEntityRequest, RemoveEntityRequest, GetEntityExposureRequest
+    GetEntityRequest, SetEntityRequest, RemoveEntityRequest, GetEntityExposureRequest,
+    FindReferencesRequest
 )
 
 logger = logging.getLogger(__name__)
@@ -57,11 +59,45 @@ async def set_entity(request: SetEntityRequest = Body(...)):
         **update_data
     )
     
+    if request.new_entity_id is not None and request.new_entity_id != request.entity_id:
+        # HA does not rewrite YAML or dashboards; report what still uses the old ID
+        try:
+            impacted = await reference_index.find(request.entity_id)
+        except Exception as e:
+            logger.warning(f"Could not look up references to {request.entity_id}: {e}")
+            impacted = None
+        if impacted is not None:
+            result = {**(result or {}), "impacted_references": impacted}
+            return SuccessResponse(
+                message=f"Renamed {request.entity_id} to {request.new_entity_id}; "
+                        f"{len(impacted)} automation(s)/script(s)/dashboard(s) still reference the old ID",
+                data=result
+            )
+    
     return SuccessResponse(
         message=f"Updated entity {request.entity_id}",
         data=result
     )
 
+@router.post("/find_references", operation_id="find_references", summary="Find automations, scripts and dashboards using an entity")
+async def find_references(request: FindReferencesRequest = Body(...)):
+    """List every automation, script and dashboard that references an entity, with the paths where it appears.
+
+    Answered from an incrementally maintained reverse index: only config files that
+    changed on disk and dashboards HA reported as updated are re-scanned.
+    """
+    try:
+        references = await reference_index.find(request.entity_id, request.kinds)
+        return SuccessResponse(
+            message=f"Found {len(references)} object(s) referencing {request.entity_id}",
+            data={"entity_id": request.entity_id, "references": references}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding references to {request.entity_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/remove_entity", operation_id="remove_entity", summary="Remove entity from registry")
 async def remove_entity(request: RemoveEntityRequest = Body(...)):
     """Remove an entity from the Home Assistant entity registry."""
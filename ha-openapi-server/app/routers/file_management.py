@@ -1,55 +1,384 @@
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+import asyncio
+import json
+import os
 import re
+from pathlib import Path
+from typing import Dict, Literal, Optional
+from app.core.archives import ArchiveError, ArchiveTooLarge, archive_filename, archive_service
 from app.core.clients import file_mgr
+from app.core.config_files import atomic_write, config_index
+from app.core.config import settings
+from app.core.file_index import file_index, join_relpath
+from app.core.file_patch import (
+    PatchError, apply_line_edits, apply_unified_diff, content_etag, normalize_etag, split_lines
+)
+from app.core.file_walker import GrepSpec, WalkSpec, file_walker
+from app.core.file_watch import WatchFilter, file_watch
 from app.models.common import SuccessResponse
 from app.models.files import (
-    ReadFileRequest, WriteFileRequest, 
+    ReadFileRequest, WriteFileRequest, DownloadFileRequest, ReadFilesRequest, WriteFilesRequest,
+    PatchFileRequest, ExportArchiveRequest,
     ListDirectoryRequest, DeleteFileRequest,
     MakeDirectoryRequest, MoveFileRequest, CopyFileRequest,
-    SearchFilesRequest, ListFilesRequest, GetDirectoryTreeRequest
+    SearchFilesRequest, ListFilesRequest, GetDirectoryTreeRequest,
+    FindDefinitionRequest, GrepFilesRequest, WatchFilesRequest
 )
 
 router = APIRouter(tags=["file_management"])
 
 @router.post("/read_file", operation_id="read_file", summary="Read file content")
 async def read_file(request: ReadFileRequest = Body(...)):
-    """Read content of a text file from the HA config directory."""
-    content = await file_mgr.read_file(request.filepath)
+    """Read content of a text file from the HA config directory.
+
+    Full reads include an `etag` (hash of the file's bytes) to pass as
+    `if_match` to write_file/patch_file. For large files (logs, .storage) use
+    `tail_lines`/`head_lines` or `offset`/`length` to read only that part; the
+    response then includes the file `size`, the byte `offset`/`length`
+    returned and `eof`.
+    """
+    ranged = request.offset is not None or request.length is not None
+    modes = sum([ranged, request.head_lines is not None, request.tail_lines is not None])
+    if modes > 1:
+        raise HTTPException(status_code=400, detail="Use only one of offset/length, head_lines or tail_lines")
+    if modes == 0:
+        content, etag = await file_mgr.read_file_with_etag(request.filepath)
+        return SuccessResponse(
+            message=f"Read {len(content)} bytes from {request.filepath}",
+            data={"content": content, "filepath": request.filepath, "etag": etag}
+        )
+    
+    if request.tail_lines is not None:
+        result = await file_mgr.read_tail(request.filepath, request.tail_lines)
+        what = f"last {result['lines']} lines"
+    elif request.head_lines is not None:
+        result = await file_mgr.read_head(request.filepath, request.head_lines)
+        what = f"first {result['lines']} lines"
+    else:
+        result = await file_mgr.read_range(request.filepath, request.offset or 0, request.length)
+        what = f"bytes {result['offset']}-{result['offset'] + result['length']}"
     return SuccessResponse(
-        message=f"Read {len(content)} bytes from {request.filepath}",
-        data={"content": content, "filepath": request.filepath}
+        message=f"Read {what} ({result['length']} of {result['size']} bytes) from {request.filepath}",
+        data={**result, "filepath": request.filepath}
     )
 
+@router.post("/download_file", operation_id="download_file", summary="Download a file as-is")
+async def download_file(request: DownloadFileRequest = Body(...)):
+    """Return the raw file (any type, including binaries) as the response body.
+
+    Served as a file response streamed from disk (sendfile-style `pathsend`
+    where the server supports it), with support for HTTP Range requests.
+    """
+    try:
+        path = file_mgr.ha_resolve_path(request.filepath)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"File not found: {request.filepath}")
+    return FileResponse(path, filename=path.name)
+
+# Serializes read-check-write cycles per file (write_file/patch_file with if_match)
+_file_locks: Dict[Path, asyncio.Lock] = {}
+
+def _file_lock(path: Path) -> asyncio.Lock:
+    return _file_locks.setdefault(path, asyncio.Lock())
+
+async def _check_etag(path: Path, if_match: str) -> Optional[bytes]:
+    """Current file bytes, or 412 if its ETag is not `if_match` (or it does not exist)."""
+    try:
+        data = await asyncio.to_thread(path.read_bytes)
+    except FileNotFoundError:
+        raise HTTPException(status_code=412, detail="Precondition failed: file does not exist")
+    etag = content_etag(data)
+    if normalize_etag(if_match) != etag:
+        raise HTTPException(
+            status_code=412,
+            detail={"message": "Precondition failed: file changed since it was read", "etag": etag}
+        )
+    return data
+
 @router.post("/write_file", operation_id="write_file", summary="Write file content")
 async def write_file(request: WriteFileRequest = Body(...)):
-    """Write content to a file in the HA config directory."""
-    result = await file_mgr.write_file(request.filepath, request.content)
-    return SuccessResponse(message=result)
+    """Write content to a file in the HA config directory.
+
+    With `if_match`, the write only happens if the file still has that ETag
+    (412 otherwise). Returns the new `etag`.
+    """
+    path = file_mgr.ha_resolve_path(request.filepath)
+    async with _file_lock(path):
+        if request.if_match is not None:
+            await _check_etag(path, request.if_match)
+        result = await file_mgr.write_file(request.filepath, request.content)
+    file_index.note(path.parent)
+    file_index.note(path)
+    return SuccessResponse(message=result, data={"etag": content_etag(request.content.encode("utf-8"))})
+
+@router.post("/patch_file", operation_id="patch_file", summary="Apply a diff or line edits to a file")
+async def patch_file(request: PatchFileRequest = Body(...)):
+    """Change part of a file without re-sending all of it.
+
+    Send either a unified `diff` or line-range `edits`. With `if_match` (the
+    ETag from read_file) the patch is rejected with 412 if the file changed
+    since; hunks/edits that do not match the current content give 409 and
+    nothing is written. The result is written atomically; returns the new `etag`.
+    """
+    if (request.diff is None) == (request.edits is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of diff or edits")
+    try:
+        path = file_mgr.ha_resolve_path(request.filepath)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async with _file_lock(path):
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail=f"File not found: {request.filepath}")
+        if request.if_match is not None:
+            data = await _check_etag(path, request.if_match)
+        else:
+            data = await asyncio.to_thread(path.read_bytes)
+        try:
+            lines = split_lines(data.decode("utf-8"))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail=f"{request.filepath} is not UTF-8 text")
+        
+        try:
+            if request.diff is not None:
+                new_lines, added, removed = apply_unified_diff(lines, request.diff)
+            else:
+                edits = [(e.start_line, e.end_line, e.content) for e in request.edits]
+                new_lines, added, removed = apply_line_edits(lines, edits)
+        except PatchError as e:
+            raise HTTPException(status_code=409, detail=f"Patch does not apply: {e}")
+        
+        new_data = "".join(new_lines).encode("utf-8")
+        if new_data != data:
+            await atomic_write(path, new_data)
+            file_index.note(path)
+    
+    return SuccessResponse(
+        message=f"Patched {request.filepath}: +{added} -{removed} lines",
+        data={
+            "filepath": request.filepath,
+            "etag": content_etag(new_data),
+            "previous_etag": content_etag(data),
+            "lines_added": added,
+            "lines_removed": removed,
+            "size": len(new_data),
+        }
+    )
+
+async def _bounded(items, fn):
+    """Run `fn` over `items` with at most FILE_BULK_CONCURRENCY in flight, preserving order."""
+    semaphore = asyncio.Semaphore(settings.FILE_BULK_CONCURRENCY)
+    
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+    
+    return await asyncio.gather(*(run(item) for item in items))
+
+def _file_error(e: Exception) -> str:
+    if isinstance(e, FileNotFoundError):
+        return "File not found"
+    if isinstance(e, IsADirectoryError):
+        return "Is a directory"
+    if isinstance(e, OSError):
+        return e.strerror or str(e)
+    return str(e)
+
+@router.post("/read_files", operation_id="read_files", summary="Read several files at once")
+async def read_files(request: ReadFilesRequest = Body(...)):
+    """Read many text files in one call (e.g. all YAML files of a package).
+
+    Files are read concurrently; each gets its own result with `ok`, `content`,
+    `size` and `truncated` (content beyond max_bytes_per_file is cut) or `error`.
+    Each read is charged against FILE_BULK_MAX_TOTAL_BYTES before it starts,
+    so the limit holds while reading: a file is cut short at the remaining
+    budget and, once that is used up, remaining files are reported as skipped.
+    """
+    max_bytes = request.max_bytes_per_file or settings.FILE_BULK_MAX_FILE_BYTES
+    budget = settings.FILE_BULK_MAX_TOTAL_BYTES
+    
+    async def read_one(filepath: str):
+        nonlocal budget
+        try:
+            size = (await asyncio.to_thread(os.stat, file_mgr.ha_resolve_path(filepath))).st_size
+        except Exception as e:
+            return {"filepath": filepath, "ok": False, "error": _file_error(e)}
+        length = min(max_bytes, size, budget)
+        if length < min(max_bytes, size) and budget <= 0:
+            return {"filepath": filepath, "ok": False, "content": None, "error": "Skipped: response size limit reached"}
+        budget -= length
+        try:
+            result = await file_mgr.read_range(filepath, 0, length)
+        except Exception as e:
+            budget += length
+            return {"filepath": filepath, "ok": False, "error": _file_error(e)}
+        budget += length - result["length"]
+        return {
+            "filepath": filepath,
+            "ok": True,
+            "content": result["content"],
+            "size": result["size"],
+            "truncated": not result["eof"],
+        }
+    
+    results = await _bounded(request.filepaths, read_one)
+    read = sum(1 for r in results if r["ok"])
+    return SuccessResponse(message=f"Read {read} of {len(results)} files", data=results)
+
+@router.post("/write_files", operation_id="write_files", summary="Write several files at once")
+async def write_files(request: WriteFilesRequest = Body(...)):
+    """Write many files in one call.
+
+    Each file is replaced atomically (temp file + rename, mode preserved) and
+    written concurrently; the batch as a whole is not transactional, so check
+    each result's `ok`/`error`.
+    """
+    paths = []
+    for item in request.files:
+        try:
+            paths.append(file_mgr.ha_resolve_path(item.filepath))
+        except ValueError:
+            paths.append(item.filepath)  # reported by write_one
+    if len(set(paths)) != len(paths):
+        raise HTTPException(status_code=400, detail="Each file may appear only once")
+    
+    async def write_one(item):
+        try:
+            path = file_mgr.ha_resolve_path(item.filepath)
+            if path.is_dir():
+                raise IsADirectoryError(item.filepath)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            await atomic_write(path, item.content)
+        except Exception as e:
+            return {"filepath": item.filepath, "ok": False, "error": _file_error(e)}
+        file_index.note(path.parent)
+        file_index.note(path)
+        return {"filepath": item.filepath, "ok": True, "bytes": len(item.content.encode("utf-8"))}
+    
+    results = await _bounded(request.files, write_one)
+    written = sum(1 for r in results if r["ok"])
+    return SuccessResponse(message=f"Wrote {written} of {len(results)} files", data=results)
+
+_ARCHIVE_MEDIA_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd", "none": "application/x-tar"}
+
+@router.post("/export_archive", operation_id="export_archive", summary="Download files or directories as an archive")
+async def export_archive(request: ExportArchiveRequest = Body(...)):
+    """Stream a tar (gzip/zstd/uncompressed) or zip archive of the given paths.
+
+    Member names are relative to /config, so /import_archive with the default
+    `dest` restores them in place. The archive is produced while it is being
+    downloaded (constant memory for any tree size); files that cannot be read,
+    and symlinks that lead outside /config, are listed in a trailing
+    `.archive_errors.json` member.
+    """
+    roots = []
+    for filepath in request.paths:
+        try:
+            root = file_mgr.ha_resolve_path(filepath)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not root.exists():
+            raise HTTPException(status_code=404, detail=f"Path not found: {filepath}")
+        roots.append(root)
+    try:
+        body = archive_service.export(roots, request.format, request.compression, request.include, request.exclude)
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = archive_filename(request.format, request.compression)
+    media_type = "application/zip" if request.format == "zip" else _ARCHIVE_MEDIA_TYPES[request.compression]
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post(
+    "/import_archive", operation_id="import_archive", summary="Extract an uploaded archive into the config directory",
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+    }},
+)
+async def import_archive(
+    request: Request,
+    dest: str = Query(".", description="Directory to extract into (created if missing)"),
+    format: Literal["auto", "tar", "zip"] = Query("auto", description="Archive format (auto = detect)"),
+    compression: Literal["auto", "gzip", "zstd", "none"] = Query("auto", description="tar compression (auto = detect)"),
+    overwrite: bool = Query(False, description="Replace existing files (otherwise they are skipped)"),
+):
+    """Extract a tar/tar.gz/tar.zst or zip archive sent as the raw request body.
+
+    Tar uploads are extracted while they arrive; zip uploads are spooled to a
+    temp file first. Member paths are checked like every other file path:
+    members outside the config directory, links and devices are skipped and
+    listed in `skipped`. Files are written atomically. Uploads and extracted
+    content are limited to ARCHIVE_IMPORT_MAX_BYTES (413).
+    """
+    try:
+        target = file_mgr.ha_resolve_path(dest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if target.exists() and not target.is_dir():
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {dest}")
+    target.mkdir(parents=True, exist_ok=True)
+    file_index.note(target)
+    
+    try:
+        result = await archive_service.import_stream(request.stream(), target, format, compression, overwrite)
+    except ArchiveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {_file_error(e)}")
+    message = f"Extracted {result['files']} files ({result['bytes']} bytes) into {result['dest']}"
+    if result["skipped_count"]:
+        message += f"; skipped {result['skipped_count']}"
+    return SuccessResponse(message=message, data=result)
 
 @router.post("/list_directory", operation_id="list_directory", summary="List directory contents")
 async def list_directory(request: ListDirectoryRequest = Body(...)):
-    """List files and directories in a path."""
-    items = await file_mgr.list_directory(request.dirpath)
+    """List files and directories in a path (from the /config metadata index when it is ready)."""
+    try:
+        path = file_mgr.ha_resolve_path(request.dirpath)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    relpath = file_index.relative(path)
+    indexed = file_index.listdir(relpath)
+    if indexed is not None:
+        items = sorted((
+            {
+                "name": name,
+                "type": "directory" if entry[0] in ("dir", "link_dir") else "file",
+                "path": join_relpath(relpath, name),
+            }
+            for name, entry in indexed
+        ), key=lambda x: (x["type"], x["name"]))
+    else:
+        items = await file_mgr.list_directory(request.dirpath)
     return SuccessResponse(message=f"Found {len(items)} items in {request.dirpath or 'root'}", data=items)
 
 @router.post("/delete_file", operation_id="delete_file", summary="Delete a file")
 async def delete_file(request: DeleteFileRequest = Body(...)):
     """Delete a file from the config directory."""
     result = await file_mgr.delete_file(request.filepath)
+    file_index.note(file_mgr.ha_resolve_path(request.filepath))
     return SuccessResponse(message=result)
 
 @router.post("/make_directory", operation_id="make_directory", summary="Create a directory")
 async def make_directory(request: MakeDirectoryRequest = Body(...)):
     """Create a new directory."""
-    path = file_mgr.resolve_path(request.dirpath)
+    path = file_mgr.ha_resolve_path(request.dirpath)
     path.mkdir(parents=True, exist_ok=True)
+    file_index.note(path)
     return SuccessResponse(message=f"Directory created: {request.dirpath}")
 
 @router.post("/move_file", operation_id="move_file", summary="Move or rename a file")
 async def move_file(request: MoveFileRequest = Body(...)):
     """Move or rename a file."""
-    src = file_mgr.resolve_path(request.source_path)
-    dst = file_mgr.resolve_path(request.dest_path)
+    src = file_mgr.ha_resolve_path(request.source_path)
+    dst = file_mgr.ha_resolve_path(request.dest_path)
     
     if not src.exists():
         raise HTTPException(status_code=404, detail=f"Source not found: {request.source_path}")
@@ -57,30 +386,63 @@ async def move_file(request: MoveFileRequest = Body(...)):
         raise HTTPException(status_code=400, detail=f"Destination already exists: {request.dest_path}")
         
     src.rename(dst)
+    file_index.note(src)
+    file_index.note(dst)
     return SuccessResponse(message=f"Moved {request.source_path} to {request.dest_path}")
 
 @router.post("/copy_file", operation_id="copy_file", summary="Copy a file")
 async def copy_file(request: CopyFileRequest = Body(...)):
     """Copy a file."""
     import shutil
-    src = file_mgr.resolve_path(request.source_path)
-    dst = file_mgr.resolve_path(request.dest_path)
+    src = file_mgr.ha_resolve_path(request.source_path)
+    dst = file_mgr.ha_resolve_path(request.dest_path)
     
     if not src.is_file():
         raise HTTPException(status_code=400, detail=f"Source is not a file: {request.source_path}")
         
     shutil.copy2(src, dst)
+    file_index.note(dst)
     return SuccessResponse(message=f"Copied {request.source_path} to {request.dest_path}")
 
-@router.post("/search_files", operation_id="search_files", summary="Search for files")
-async def search_files(request: SearchFilesRequest = Body(...)):
-    """Search for files using regex or glob patterns."""
-    root = file_mgr.resolve_path(request.path)
-    
+def _resolve_dir(dirpath: str):
+    """Resolve a directory under /config, mapping bad paths to 4xx."""
+    try:
+        root = file_mgr.ha_resolve_path(dirpath)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not root.exists():
-        raise HTTPException(status_code=404, detail=f"Path not found: {request.path}")
+        raise HTTPException(status_code=404, detail=f"Path not found: {dirpath}")
     if not root.is_dir():
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.path}")
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {dirpath}")
+    return root
+
+async def _walk_response(spec: WalkSpec, stream: bool, report: bool, noun: str):
+    """Run a walk and return it as NDJSON (stream) or one response.
+
+    `data` stays the list of matching paths unless `report` asks for the
+    full truncation/error report; the message mentions either way.
+    """
+    if stream:
+        return StreamingResponse(file_walker.stream(spec), media_type="application/x-ndjson")
+    result = await file_walker.scan(spec)
+    message = f"Found {result['count']} {noun}"
+    if result["truncated"]:
+        message += f" (truncated at max_results={spec.max_results})"
+    if result["error_count"]:
+        message += f"; {result['error_count']} path(s) could not be read"
+        if not report:
+            message += " (report=true lists them)"
+    return SuccessResponse(message=message, data=result if report else result["matches"])
+
+@router.post("/search_files", operation_id="search_files", summary="Search for files")
+async def search_files(request: SearchFilesRequest = Body(...)):
+    """Search for files using regex or glob patterns.
+
+    Walks with os.scandir on a worker pool; supports include/exclude globs,
+    max_depth and max_results, and NDJSON streaming (`stream=true`). `data`
+    is the list of matching paths (`report=true` for the full report).
+    """
+    root = _resolve_dir(request.path)
     
     # Try compiling regex
     try:
@@ -101,36 +463,21 @@ async def search_files(request: SearchFilesRequest = Body(...)):
         except Exception:
             raise HTTPException(status_code=400, detail=f"Invalid pattern: {request.pattern} - {str(e)}")
 
-    matches = []
-    
-    def scan(p):
-        try:
-            for item in p.iterdir():
-                if item.is_file():
-                    if regex.search(item.name):
-                        matches.append(str(item.relative_to(file_mgr.base_path)).replace("\\", "/"))
-                elif item.is_dir() and request.recursive:
-                    scan(item)
-        except PermissionError:
-            pass  # Ignore permission errors
-        except Exception as e:
-            # Log other errors but continue
-            pass
-            
-    scan(root)
-    return SuccessResponse(message=f"Found {len(matches)} matches", data=matches)
+    spec = WalkSpec(
+        root=root,
+        accept=lambda name: regex.search(name) is not None,
+        include=request.include,
+        exclude=request.exclude,
+        max_depth=request.max_depth if request.recursive else 0,
+        max_results=request.max_results,
+    )
+    return await _walk_response(spec, request.stream, request.report, "matches")
 
 @router.post("/list_files", operation_id="list_files", summary="List files with filtering")
 async def list_files(request: ListFilesRequest = Body(...)):
-    """List files, optionally filtering by extension."""
-    root = file_mgr.resolve_path(request.path)
-    
-    if not root.exists():
-        raise HTTPException(status_code=404, detail=f"Path not found: {request.path}")
-    if not root.is_dir():
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.path}")
+    """List files, optionally filtering by extension (same walker and limits as search_files)."""
+    root = _resolve_dir(request.path)
     
-    matches = []
     # Normalize extensions to lowercase and ensure they start with dot
     extensions = set()
     if request.extensions:
@@ -140,35 +487,131 @@ async def list_files(request: ListFilesRequest = Body(...)):
                 ext = f".{ext}"
             extensions.add(ext)
     
-    def scan(p):
+    spec = WalkSpec(
+        root=root,
+        accept=lambda name: not extensions or os.path.splitext(name)[1].lower() in extensions,
+        include=request.include,
+        exclude=request.exclude,
+        max_depth=request.max_depth if request.recursive else 0,
+        max_results=request.max_results,
+    )
+    return await _walk_response(spec, request.stream, request.report, "files")
+
+@router.post("/grep_files", operation_id="grep_files", summary="Search file contents")
+async def grep_files(request: GrepFilesRequest = Body(...)):
+    """Search file contents under a directory and return matching lines (with optional context).
+
+    Files are read through mmap and searched in parallel worker threads; binary
+    files and files over max_file_bytes are skipped and counted. Use instead of
+    reading files one by one to find where something is defined or used.
+    """
+    root = _resolve_dir(request.path)
+    
+    pattern = re.escape(request.pattern) if request.literal else request.pattern
+    try:
+        flags = re.MULTILINE | (re.IGNORECASE if request.ignore_case else 0)
+        regex = re.compile(pattern.encode("utf-8"), flags)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pattern: {request.pattern} - {str(e)}")
+    
+    spec = WalkSpec(
+        root=root,
+        accept=lambda name: True,
+        include=request.include,
+        exclude=request.exclude,
+        max_depth=request.max_depth,
+        max_results=request.max_results,
+    )
+    grep = GrepSpec(
+        regex=regex,
+        context=request.context,
+        max_file_bytes=request.max_file_bytes or settings.FILE_GREP_MAX_FILE_BYTES,
+    )
+    if request.stream:
+        return StreamingResponse(file_walker.stream_grep(spec, grep), media_type="application/x-ndjson")
+    
+    result = await file_walker.grep(spec, grep)
+    message = f"Found {result['count']} matching lines in {result['files_matched']} of {result['files_searched']} files"
+    if result["truncated"]:
+        message += f" (truncated at max_results={request.max_results})"
+    if result["error_count"]:
+        message += f"; {result['error_count']} path(s) could not be read"
+    return SuccessResponse(message=message, data=result)
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+@router.post("/watch_files", operation_id="watch_files", summary="Stream file change events (SSE)")
+async def watch_files(request: WatchFilesRequest = Body(...)):
+    """Server-Sent Events stream of created/modified/deleted files under a directory.
+
+    Fed by the /config metadata index: inotify where available, otherwise its
+    periodic re-scan (FILE_INDEX_RESCAN_SECONDS), in which case changes
+    arrive late and in batches. Each change is `event: <type>` with JSON data
+    {type, path, kind, size, mtime}; changes to a path within `coalesce_ms`
+    are reported once. The stream opens with a `ready` event (index mode),
+    sends `: keepalive` comments while idle, an `overflow` event if changes
+    had to be dropped (re-list the directory), and an `end` event when
+    `timeout_seconds` or `max_events` is reached.
+    """
+    if not settings.FILE_INDEX_ENABLED or file_index.disabled:
+        raise HTTPException(
+            status_code=503,
+            detail="File watching needs the file index (FILE_INDEX_ENABLED, tree under FILE_INDEX_MAX_ENTRIES)"
+        )
+    root = _resolve_dir(request.path)
+    watch_filter = WatchFilter(file_index.relative(root), request.include, request.exclude, request.events)
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + request.timeout_seconds if request.timeout_seconds else None
+        stream = file_watch.subscribe(watch_filter, request.coalesce_ms / 1000, settings.FILE_WATCH_HEARTBEAT_SECONDS)
+        sent = 0
+        reason = "timeout"
+        yield _sse("ready", {"path": watch_filter.root, "mode": file_index.mode})
         try:
-            for item in p.iterdir():
-                if item.is_file():
-                    if not extensions or item.suffix.lower() in extensions:
-                        matches.append(str(item.relative_to(file_mgr.base_path)).replace("\\", "/"))
-                elif item.is_dir() and request.recursive:
-                    scan(item)
-        except PermissionError:
-            pass  # Ignore permission errors
-        except Exception:
-            pass
-            
-    scan(root)
-    return SuccessResponse(message=f"Found {len(matches)} files", data=matches)
+            while True:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                try:
+                    batch = await asyncio.wait_for(stream.__anext__(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if batch is None:
+                    yield b": keepalive\n\n"
+                    continue
+                for change in batch:
+                    sent += 1
+                    yield _sse(change["type"], change, sent)
+                    if request.max_events and sent >= request.max_events:
+                        reason = "max_events"
+                        break
+                if reason == "max_events":
+                    break
+            yield _sse("end", {"reason": reason, "events": sent})
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/get_directory_tree", operation_id="get_directory_tree", summary="Get directory tree")
 async def get_directory_tree(request: GetDirectoryTreeRequest = Body(...)):
-    """Get recursive directory structure."""
-    root = file_mgr.resolve_path(request.dirpath)
-    
-    if not root.exists():
-        raise HTTPException(status_code=404, detail=f"Path not found: {request.dirpath}")
-    if not root.is_dir():
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.dirpath}")
+    """Get recursive directory structure (from the /config metadata index where it covers the tree)."""
+    root = _resolve_dir(request.dirpath)
     
     def build_tree(p, depth):
         if depth < 0:
             return "..."
+        indexed = file_index.listdir(file_index.relative(p))
+        if indexed is not None:
+            return {
+                name: build_tree(p / name, depth - 1) if entry[0] in ("dir", "link_dir") else None
+                for name, entry in indexed
+            }
         try:
             res = {}
             for item in p.iterdir():
@@ -182,5 +625,14 @@ async def get_directory_tree(request: GetDirectoryTreeRequest = Body(...)):
         except Exception as e:
             return f"<Error: {e}>"
             
-    tree = build_tree(root, request.depth)
+    tree = await asyncio.to_thread(build_tree, root, request.depth)
     return SuccessResponse(message="Directory tree", data=tree)
+
+@router.post("/find_definition", operation_id="find_definition", summary="Find which file defines an automation or script")
+async def find_definition(request: FindDefinitionRequest = Body(...)):
+    """Locate automations/scripts in automations.yaml, scripts.yaml and packages."""
+    definitions = await config_index.find(request.name, request.kind)
+    if not definitions:
+        raise HTTPException(status_code=404, detail=f"No definition found for {request.name}")
+    data = [d.to_dict(file_mgr.base_path) for d in definitions]
+    return SuccessResponse(message=f"{request.name} is defined in {', '.join(d['file'] for d in data)}", data=data)
@@ -1,12 +1,17 @@
 import logging
 from datetime import datetime, timedelta, timezone
-from urllib.parse import quote
 from fastapi import APIRouter, Body, HTTPException
-from app.core.clients import ha_api, get_ws_client
+from app.core.clients import get_ws_client
 from app.core.config import settings
+from app.core.history import (
+    aggregate_history, fetch_history_range, fetch_statistics, parse_time, statistics_series
+)
+from app.core.history_cache import history_cache
+from app.core.recorder_db import recorder_db
+from app.core.timeseries import parse_bucket
 from app.models.common import SuccessResponse
 from app.models.history_logs import (
-    GetHistoryRequest, GetLogsRequest, GetAutomationTracesRequest
+    GetHistoryRequest, GetStatisticsRequest, GetLogsRequest, GetAutomationTracesRequest
 )
 
 logger = logging.getLogger(__name__)
@@ -19,35 +24,79 @@ async def get_history(request: GetHistoryRequest = Body(...)):
     Uses the HA REST API (not the supervisor proxy) to fetch state history.
     Returns a list of lists (one per entity_id), each containing state dicts
     with 'state', 'last_changed', 'last_updated', and 'attributes'.
+
+    With `bucket` and/or `downsample`, values are reduced server-side with
+    NumPy and each entity is returned as a compact series instead:
+    {"entity_id", "unit_of_measurement", "bucket", "agg", "points": [[time, value], ...]}.
+    Example: {"entity_ids": ["sensor.power"], "hours": 24, "bucket": "5m", "agg": "time_weighted_mean"}
+    gives 288 points instead of every raw state change.
+
+    Minimal/bucketed queries for explicit entity_ids are served from a local
+    history cache that only fetches the missing tail (or gaps) from HA, so
+    rolling-window queries repeated every few minutes are nearly free.
+    Long windows are fetched from HA in parallel time/entity chunks with
+    per-chunk retries instead of one large /history/period call.
+
+    backend="recorder" skips HA entirely and runs indexed read-only queries
+    against home-assistant_v2.db (same output shapes) - best for bulk exports
+    and months-long aggregations.
     """
     # Determine time range
-    if request.start_time:
-        # Accept ISO 8601 with or without 'Z'/'timezone'
-        ts = request.start_time
-        # Ensure it's a valid timestamp string; pass through to HA
-        start_str = ts.replace(" ", "T")
-    else:
-        hours = request.hours or 24
-        start_dt = datetime.now(timezone.utc) - timedelta(hours=hours)
-        start_str = start_dt.strftime("%Y-%m-%dT%H:%M:%S")
+    try:
+        if request.start_time:
+            start_dt = parse_time(request.start_time)
+        else:
+            hours = request.hours or 24
+            start_dt = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=hours)
+        end_dt = parse_time(request.end_time) if request.end_time else None
+        bucket = parse_bucket(request.bucket) if request.bucket else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Build the /history/period/<timestamp> URL with query params
-    endpoint = f"/history/period/{quote(start_str)}"
-    params = []
-    if request.entity_ids:
-        # Filter to specific entities
-        for eid in request.entity_ids:
-            params.append(f"filter_entity_id={quote(eid)}")
-    if request.minimal_response:
-        params.append("minimal_response")
-    if request.significant_changes_only:
-        params.append("significant_changes_only")
-    # End time defaults to now (HA default); could be extended later
-    if params:
-        endpoint += "?" + "&".join(params)
+    reduce = bool(bucket or request.downsample)
+    backend = request.backend or settings.HISTORY_BACKEND
+    # The cache stores states only, so it can answer minimal/reduced queries for known entities
+    cached = (
+        backend == "api" and request.use_cache and bool(request.entity_ids)
+        and (request.minimal_response or reduce)
+    )
 
     try:
-        result = await ha_api.call_api("GET", endpoint)
+        if backend == "recorder":
+            result = await recorder_db.history(
+                request.entity_ids,
+                start_dt.timestamp(),
+                (end_dt or datetime.now(timezone.utc)).timestamp(),
+                minimal_response=request.minimal_response or reduce,
+                significant_changes_only=request.significant_changes_only,
+            )
+        elif cached:
+            result = await history_cache.get(
+                request.entity_ids,
+                start_dt.timestamp(),
+                end_dt.timestamp() if end_dt else None,
+                significant_changes_only=request.significant_changes_only,
+            )
+        else:
+            result = await fetch_history_range(
+                request.entity_ids,
+                start_dt.timestamp(),
+                end_dt.timestamp() if end_dt else None,
+                # Aggregation only needs states; skip per-row attributes from HA
+                minimal_response=request.minimal_response or reduce,
+                significant_changes_only=request.significant_changes_only,
+            )
+        if reduce:
+            end_ts = (end_dt or datetime.now(timezone.utc)).timestamp()
+            series = aggregate_history(
+                result, start_dt.timestamp(), end_ts,
+                bucket=bucket, agg=request.agg, downsample=request.downsample,
+            )
+            points = sum(len(s["points"]) for s in series)
+            return SuccessResponse(
+                message=f"Retrieved {points} points for {len(series)} entities",
+                data=series
+            )
         # result is a list of lists (one per entity)
         return SuccessResponse(
             message=f"Retrieved history for {len(result)} entities",
@@ -57,6 +106,57 @@ async def get_history(request: GetHistoryRequest = Body(...)):
         logger.error(f"Error fetching history: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"History fetch failed: {e}")
 
+@router.post("/get_statistics", operation_id="get_statistics", summary="Get long-term statistics")
+async def get_statistics(request: GetStatisticsRequest = Body(...)):
+    """Retrieve recorder long-term statistics via WebSocket recorder/statistics_during_period.
+
+    HA's recorder already keeps 5-minute/hourly aggregates for every sensor
+    with a state_class, so month-long queries return a few hundred rows
+    instead of megabytes of raw states. Output matches bucketed get_history:
+    {"entity_id", "unit_of_measurement", "bucket": <period>, "agg", "points": [[time, value], ...]}.
+
+    Example: {"statistic_ids": ["sensor.house_energy"], "hours": 720, "period": "day", "agg": "change", "units": {"energy": "kWh"}}
+    """
+    try:
+        if request.start_time:
+            start_dt = parse_time(request.start_time)
+        else:
+            start_dt = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=request.hours or 168)
+        end_dt = parse_time(request.end_time) if request.end_time else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    backend = request.backend or settings.HISTORY_BACKEND
+    if backend == "recorder" and request.units:
+        raise HTTPException(status_code=400, detail="Unit conversion is only available with backend='api'")
+
+    try:
+        if backend == "recorder":
+            stats = await recorder_db.statistics(
+                request.statistic_ids,
+                start_dt.timestamp(),
+                end_dt.timestamp() if end_dt else None,
+                period=request.period,
+            )
+        else:
+            stats = await fetch_statistics(
+                request.statistic_ids,
+                start_dt.timestamp(),
+                end_dt.timestamp() if end_dt else None,
+                period=request.period,
+                types=[request.agg],
+                units=request.units,
+            )
+        series = statistics_series(stats, request.period, request.agg, request.downsample)
+        points = sum(len(s["points"]) for s in series)
+        return SuccessResponse(
+            message=f"Retrieved {points} {request.period} statistics for {len(series)} entities",
+            data=series
+        )
+    except Exception as e:
+        logger.error(f"Error fetching statistics: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Statistics fetch failed: {e}")
+
 @router.post("/get_automation_traces", operation_id="get_automation_traces", summary="Get automation execution traces")
 async def get_automation_traces(request: GetAutomationTracesRequest = Body(...)):
     """Retrieve execution traces for automations and scripts."""
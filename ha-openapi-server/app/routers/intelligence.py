@@ -1,8 +1,9 @@
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any
 from fastapi import APIRouter, Body, HTTPException
 from app.core.clients import ha_api
+from app.core.history import fetch_statistics, statistics_arrays
 from app.models.common import SuccessResponse
 from app.models.intelligence import (
     AnalyzeHomeContextRequest,
@@ -273,6 +274,7 @@ async def energy_intelligence(request: EnergyIntelligenceRequest = Body(...)):
     **ANALYSIS:**
     - Current power usage
     - High-consumption devices
+    - Consumption per meter over the period (day/week/month) from recorder statistics
     - Usage patterns
     - Cost estimates
     - Saving suggestions
@@ -319,6 +321,37 @@ async def energy_intelligence(request: EnergyIntelligenceRequest = Body(...)):
             except (ValueError, TypeError):
                 pass
         
+        # Consumption over the requested period from recorder long-term statistics
+        # (hourly/daily "change" rows instead of raw state history)
+        period_hours = {"day": 24, "week": 168, "month": 720}.get(request.period or "day", 24)
+        meter_ids = [
+            s["entity_id"] for s in energy_sensors
+            if s.get("attributes", {}).get("state_class") in ("total", "total_increasing")
+        ]
+        period_consumption = []
+        if meter_ids:
+            try:
+                stats = await fetch_statistics(
+                    meter_ids,
+                    datetime.now(timezone.utc).timestamp() - period_hours * 3600,
+                    period="hour" if period_hours <= 24 else "day",
+                    types=["change"],
+                    units={"energy": "kWh"},
+                )
+                for statistic_id, stat in stats.items():
+                    if stat["unit_of_measurement"] != "kWh":
+                        continue
+                    _, changes = statistics_arrays(stat["rows"], ["change"])
+                    period_consumption.append({
+                        "entity_id": statistic_id,
+                        "name": stat.get("name") or statistic_id,
+                        "value": round(float(changes.sum()), 3),
+                        "unit": "kWh"
+                    })
+                period_consumption.sort(key=lambda x: x["value"], reverse=True)
+            except Exception as e:
+                logger.warning(f"Energy statistics unavailable: {e}")
+        
         # Combine for sorting
         device_consumption = device_power + device_energy
         
@@ -335,6 +368,9 @@ async def energy_intelligence(request: EnergyIntelligenceRequest = Body(...)):
                 suggestions.append(f"Turn off {len(lights_on)} lights currently on")
             
             # Check for high consumption devices
+            if period_consumption:
+                top_meter = period_consumption[0]
+                suggestions.append(f"{top_meter['name']} used {top_meter['value']} kWh over the last {request.period}")
             if device_consumption:
                 top_consumer = device_consumption[0]
                 suggestions.append(f"Check {top_consumer['name']} ({top_consumer['value']} {top_consumer['unit']})")
@@ -347,6 +383,8 @@ async def energy_intelligence(request: EnergyIntelligenceRequest = Body(...)):
                 "energy_sensors": len(energy_sensors),
                 "top_power_consumers": device_power[:5],
                 "top_energy_consumers": device_energy[:5],
+                "period": request.period,
+                "period_consumption": period_consumption[:10],
                 "suggestions": suggestions
             }
         )
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Body
 from app.core.clients import ha_api, http_client, get_ws_client
+from app.core.validation import config_validator
 from app.models.common import SuccessResponse
 from app.models.system import (
     GetSystemLogsNewRequest, GetIntegrationStatusNewRequest,
-    RestartHomeAssistantRequest, CheckConfigRequest, GetSystemHealthRequest
+    RestartHomeAssistantRequest, CheckConfigRequest, GetSystemHealthRequest,
+    ValidateConfigRequest
 )
 
 router = APIRouter(tags=["system"])
@@ -69,6 +71,24 @@ async def check_config(request: CheckConfigRequest = Body(...)):
     result = await ha_api.call_service("homeassistant", "check_config")
     return SuccessResponse(message="Configuration check initiated", data=result)
 
+@router.post("/validate_config", operation_id="validate_config", summary="Validate automations and scripts locally")
+async def validate_config(request: ValidateConfigRequest = Body(default_factory=ValidateConfigRequest)):
+    """Fast offline validation of automations/scripts (structure, entity_ids, services) without a reload or check_config."""
+    report = await config_validator.validate(
+        kinds=request.kinds,
+        files=request.files,
+        check_entities=request.check_entities,
+        check_services=request.check_services,
+    )
+    status = "valid" if report["valid"] else "invalid"
+    return SuccessResponse(
+        message=(
+            f"Configuration {status}: {report['errors']} errors, {report['warnings']} warnings "
+            f"in {report['objects']} objects ({report['duration_ms']} ms)"
+        ),
+        data=report
+    )
+
 @router.post("/system_health", operation_id="system_health", summary="Get system health")
 async def system_health(request: GetSystemHealthRequest = Body(...)):
     """Get Home Assistant system health info."""
@@ -1,9 +1,8 @@
 import logging
-import yaml
-import aiofiles
 from fastapi import APIRouter, Body, HTTPException
 from app.core.clients import ha_api
 from app.core.config import settings
+from app.core.config_files import config_cache
 from app.models.common import SuccessResponse
 from app.models.utilities import (
     EvalTemplateRequest, ConfigSetYamlRequest
@@ -47,28 +46,25 @@ async def config_set_yaml(request: ConfigSetYamlRequest = Body(...)):
         raise HTTPException(status_code=404, detail=f"File {request.file_path} not found")
     
     try:
-        async with aiofiles.open(file_path, 'r') as f:
-            content = await f.read()
-        
-        # Use a safe YAML loader that handles tags
-        try:
-            config = yaml.safe_load(content) or {}
-        except Exception:
-            # Manual parse for simple cases
-            config = {}
-        
-        if not isinstance(config, dict):
-            raise HTTPException(status_code=400, detail="File is not a valid YAML mapping")
-        
-        if request.action == "merge":
-            config[request.yaml_key] = request.content
-        elif request.action == "replace":
-            config[request.yaml_key] = request.content
-        elif request.action == "remove":
-            config.pop(request.yaml_key, None)
+        async with config_cache.edit_lock:
+            # Use a safe YAML loader that handles tags
+            try:
+                config = await config_cache.load(file_path, default={}, mutable=True)
+            except Exception:
+                # Manual parse for simple cases
+                config = {}
+
+            if not isinstance(config, dict):
+                raise HTTPException(status_code=400, detail="File is not a valid YAML mapping")
+
+            if request.action == "merge":
+                config[request.yaml_key] = request.content
+            elif request.action == "replace":
+                config[request.yaml_key] = request.content
+            elif request.action == "remove":
+                config.pop(request.yaml_key, None)
 
-        async with aiofiles.open(file_path, 'w') as f:
-            await f.write(yaml.dump(config, default_flow_style=False, allow_unicode=True))
+            await config_cache.dump(file_path, config, allow_unicode=True)
         
         return SuccessResponse(
             message=f"{request.action}d {request.yaml_key} in {request.file_path}"
@@ -0,0 +1,90 @@
+"""Benchmark YAML load/dump of a large automations.yaml: pure Python vs libyaml.
+
+Usage:
+    python benchmarks/yaml_bench.py                      # synthetic file, 600 automations
+    python benchmarks/yaml_bench.py --count 2000
+    python benchmarks/yaml_bench.py /config/automations.yaml
+"""
+import argparse
+import statistics
+import time
+
+import yaml
+
+
+def synthetic_automations(count: int) -> list:
+    """Automations shaped like real UI-created ones (nested triggers/conditions/actions)."""
+    return [
+        {
+            "id": f"{1700000000000 + i}",
+            "alias": f"Hallway motion light {i}",
+            "description": "Turn the light on when motion is detected after sunset",
+            "mode": "restart",
+            "trigger": [
+                {"platform": "state", "entity_id": f"binary_sensor.motion_{i}", "to": "on"},
+                {"platform": "numeric_state", "entity_id": f"sensor.lux_{i}", "below": 40, "for": {"minutes": 2}},
+            ],
+            "condition": [
+                {"condition": "sun", "after": "sunset", "after_offset": "-00:30:00"},
+                {"condition": "state", "entity_id": "input_boolean.guest_mode", "state": "off"},
+            ],
+            "action": [
+                {"service": "light.turn_on", "target": {"entity_id": f"light.hallway_{i}"},
+                 "data": {"brightness_pct": 60, "transition": 2}},
+                {"wait_for_trigger": [{"platform": "state", "entity_id": f"binary_sensor.motion_{i}",
+                                       "to": "off", "for": {"minutes": 5}}]},
+                {"service": "light.turn_off", "target": {"entity_id": f"light.hallway_{i}"}},
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of `repeat` calls, in milliseconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="YAML file to benchmark (default: synthetic automations)")
+    parser.add_argument("--count", type=int, default=600, help="Synthetic automations to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    if args.path:
+        with open(args.path, "r") as f:
+            text = f.read()
+        source = args.path
+    else:
+        text = yaml.dump(synthetic_automations(args.count), default_flow_style=False)
+        source = f"{args.count} synthetic automations"
+    data = yaml.safe_load(text)
+
+    implementations = [("pure-Python", yaml.SafeLoader, yaml.SafeDumper)]
+    if getattr(yaml, "__with_libyaml__", False):
+        implementations.append(("libyaml", yaml.CSafeLoader, yaml.CSafeDumper))
+    else:
+        print("PyYAML was built without libyaml; only the pure-Python implementation is measured")
+
+    print(f"{source}: {len(text) / 1024:.0f} KiB\n")
+    print(f"{'implementation':<14}{'load ms':>10}{'dump ms':>10}")
+    results = {}
+    for name, loader, dumper in implementations:
+        load_ms = timed(lambda: yaml.load(text, Loader=loader), args.repeat)
+        dump_ms = timed(lambda: yaml.dump(data, Dumper=dumper, default_flow_style=False), args.repeat)
+        results[name] = (load_ms, dump_ms)
+        print(f"{name:<14}{load_ms:>10.1f}{dump_ms:>10.1f}")
+
+    if len(results) == 2:
+        (pl, pd), (cl, cd) = results["pure-Python"], results["libyaml"]
+        print(f"\nspeedup: load {pl / cl:.1f}x, dump {pd / cd:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
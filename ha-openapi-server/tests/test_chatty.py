@@ -0,0 +1,33 @@
+import random
+from collections import Counter
+
+from app.core.chatty import ChattyTracker, SpaceSaving
+
+
+def test_eviction_takes_the_smallest_counter():
+    rng = random.Random(1)
+    summary = SpaceSaving(20)
+    for _ in range(20000):
+        key = f"e{int(rng.paretovariate(1.2)) % 200}"
+        full = key not in summary.counters and len(summary.counters) >= summary.capacity
+        floor = min(c[0] for c in summary.counters.values()) if full else None
+        summary.add(key, True)
+        if full:
+            assert summary.counters[key][1] == floor
+    assert sum(c[0] for c in summary.counters.values()) == summary.total
+
+
+def test_window_counts_bound_the_true_counts():
+    rng = random.Random(1)
+    tracker = ChattyTracker(5)
+    truth = Counter()
+    now = 1_000_000.0
+    for i in range(20000):
+        entity_id = f"sensor.e{int(rng.paretovariate(1.2)) % 40}"
+        now += 0.15
+        tracker.record(entity_id, True, now)
+        truth[entity_id] += 1
+    result = tracker.top("1h", limit=100, now=now)
+    assert result["total_events"] == 20000
+    for entity in result["entities"]:
+        assert entity["changes"] - entity["max_overcount"] <= truth[entity["entity_id"]] <= entity["changes"]
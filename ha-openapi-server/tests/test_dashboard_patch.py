@@ -0,0 +1,45 @@
+import copy
+
+from app.core.dashboard_patch import apply_operations
+
+CONFIG = {
+    "views": [
+        {"title": "Home", "cards": [{"type": "a"}, {"type": "entities", "entities": ["light.l1", "light.l2"]}]},
+        {"title": "Other", "cards": [{"type": "b"}]},
+    ]
+}
+
+
+def _ops(changes):
+    return [(c["op"], c.get("from"), c["path"]) for c in changes]
+
+
+def test_insert_and_move_in_one_batch_are_not_paired_by_position():
+    before = copy.deepcopy(CONFIG)
+    new, changes = apply_operations(CONFIG, [
+        {"op": "insert", "view": 0, "card_index": 0, "value": {"type": "new"}},
+        {"op": "move", "view": 0, "card_index": 1, "to_view": 1, "to_index": 0},
+    ])
+    assert [c["type"] for c in new["views"][0]["cards"]] == ["new", "entities"]
+    assert [c["type"] for c in new["views"][1]["cards"]] == ["a", "b"]
+    assert _ops(changes) == [
+        ("add", None, "/views/0/cards/0"),
+        ("move", "/views/0/cards/0", "/views/1/cards/0"),
+    ]
+    assert CONFIG == before
+
+
+def test_edited_card_is_diffed_field_by_field():
+    _, changes = apply_operations(CONFIG, [
+        {"op": "replace", "path": "/views/0/cards/1/entities/1", "value": "light.zz"},
+        {"op": "add", "path": "/views/0/cards/1/title", "value": "Lights"},
+    ])
+    assert changes == [
+        {"op": "replace", "path": "/views/0/cards/1/entities/1", "old": "light.l2", "new": "light.zz"},
+        {"op": "add", "path": "/views/0/cards/1/title", "new": "Lights"},
+    ]
+
+
+def test_replaced_card_is_removed_and_added():
+    _, changes = apply_operations(CONFIG, [{"op": "replace", "view": 1, "card_index": 0, "value": {"type": "c"}}])
+    assert _ops(changes) == [("remove", None, "/views/1/cards/0"), ("add", None, "/views/1/cards/0")]
@@ -0,0 +1,112 @@
+import asyncio
+
+import app.core.dashboards as dashboards_module
+from app.core.dashboards import DashboardCache
+from app.core.events import event_stream
+
+
+class FakeWS:
+    """lovelace/config (and /save) over a dict; `during_fetch` runs while a fetch is in flight."""
+
+    def __init__(self, configs):
+        self.configs = configs
+        self.fetches = 0
+        self.during_fetch = None
+
+    async def call_command(self, command, url_path=None, config=None):
+        if command == "lovelace/config/save":
+            self.configs[url_path or "lovelace"] = config
+            return None
+        self.fetches += 1
+        config = self.configs[url_path or "lovelace"]
+        if self.during_fetch:
+            self.during_fetch()
+        return config
+
+
+def _cache(monkeypatch, ws, connected=True):
+    async def get_ws_client():
+        return ws
+    monkeypatch.setattr(dashboards_module, "get_ws_client", get_ws_client)
+    monkeypatch.setattr(event_stream, "connected", connected)
+    return DashboardCache(ttl=3600)
+
+
+def test_update_during_fetch_is_not_cached(monkeypatch):
+    ws = FakeWS({"lovelace": {"title": "old"}})
+    cache = _cache(monkeypatch, ws)
+
+    def edited():
+        ws.configs["lovelace"] = {"title": "new"}
+        cache.on_lovelace_updated({"data": {"url_path": None}})
+    ws.during_fetch = edited
+
+    config, _ = asyncio.run(cache.get("lovelace"))
+    assert config == {"title": "old"}
+    ws.during_fetch = None
+    config, _ = asyncio.run(cache.get("lovelace"))
+    assert config == {"title": "new"} and ws.fetches == 2
+
+
+def test_entries_need_a_confirmed_subscription(monkeypatch):
+    ws = FakeWS({"d2": {"views": []}})
+    cache = _cache(monkeypatch, ws, connected=False)
+    cache.ttl = 0
+
+    asyncio.run(cache.get("d2"))
+    # Fetched before the subscription was confirmed: not trusted once it is
+    monkeypatch.setattr(event_stream, "connected", True)
+    asyncio.run(cache.get("d2"))
+    assert ws.fetches == 2
+    asyncio.run(cache.get("d2"))
+    assert ws.fetches == 2
+
+
+def test_resubscribe_starts_a_new_epoch(monkeypatch):
+    ws = FakeWS({"lovelace": {"title": "old"}})
+    cache = _cache(monkeypatch, ws)
+
+    async def idle():
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        monkeypatch.setattr(event_stream, "_task", asyncio.create_task(idle()))
+        monkeypatch.setattr(event_stream, "_listeners", dict(event_stream._listeners))
+        monkeypatch.setattr(event_stream, "reconnects", event_stream.reconnects)
+        monkeypatch.setattr(event_stream, "_run", idle)
+        await cache.get("lovelace")
+        event_stream.add_listener("test_event_type", lambda event: None)
+        assert not event_stream.connected
+        # Subscribed again, but events of the gap may have been missed
+        event_stream.connected = True
+        await cache.get("lovelace")
+        event_stream._task.cancel()
+
+    cache.ttl = 0
+    asyncio.run(scenario())
+    assert ws.fetches == 2
+
+
+def test_dashboard_version_is_returned_as_a_field_and_header(monkeypatch):
+    from fastapi import Response
+    from app.models.dashboard import GetDashboardConfigRequest, UpdateDashboardConfigRequest
+    from app.routers import dashboards as router
+
+    ws = FakeWS({"lovelace": {"views": []}})
+    monkeypatch.setattr(router, "dashboard_cache", _cache(monkeypatch, ws))
+
+    response = Response()
+    got = asyncio.run(router.get_dashboard_config(response, GetDashboardConfigRequest(dashboard_id="lovelace")))
+    assert got.data == {"views": []}
+    assert response.headers["x-dashboard-version"] == got.version
+    assert response.headers["etag"] == f'"{got.version}"'
+
+    response = Response()
+    views = asyncio.run(router.list_dashboard_views(response, GetDashboardConfigRequest(dashboard_id="lovelace")))
+    assert views.version == got.version and views.data == []
+
+    response = Response()
+    saved = asyncio.run(router.save_dashboard_config(response, UpdateDashboardConfigRequest(
+        dashboard_id="lovelace", config={"views": [{"cards": []}]}, if_version=got.version)))
+    assert saved.data is None  # HA's own result, unchanged
+    assert saved.version != got.version and response.headers["x-dashboard-version"] == saved.version
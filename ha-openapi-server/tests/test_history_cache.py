@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timezone
+
+import app.core.history_cache as history_cache_module
+from app.core.history_cache import HistoryCache
+
+NOW = 1_700_000_000.0
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class FakeRecorder:
+    """HA history API over a list of (timestamp, state) rows, recording each fetch."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetches = []
+
+    async def fetch_history_range(self, entity_ids, start, end, minimal_response=True, significant_changes_only=False):
+        self.fetches.append((start, end))
+        before = [r for r in self.rows if r[0] <= start]
+        inside = [r for r in self.rows if start < r[0] < end]
+        rows = [{"entity_id": entity_ids[0], "state": before[-1][1], "last_changed": _iso(start), "attributes": {}}] if before else []
+        rows += [{"state": state, "last_changed": _iso(ts)} for ts, state in inside]
+        return [rows] if rows else []
+
+
+def _states(rows):
+    return [r["state"] for r in rows[0]]
+
+
+def test_late_committed_row_is_picked_up(monkeypatch):
+    recorder = FakeRecorder([(NOW - 3600, "1"), (NOW - 60, "2")])
+    clock = [NOW]
+    monkeypatch.setattr(history_cache_module, "fetch_history_range", recorder.fetch_history_range)
+    monkeypatch.setattr(history_cache_module.time, "time", lambda: clock[0])
+    cache = HistoryCache(max_bytes=1 << 20, min_refresh=5.0, commit_lag=10.0)
+
+    assert _states(asyncio.run(cache.get(["sensor.t"], NOW - 600))) == ["1", "2"]
+
+    # A change at NOW - 3 is committed only after the first query ran
+    recorder.rows.append((NOW - 3, "3"))
+    clock[0] = NOW + 30
+    assert _states(asyncio.run(cache.get(["sensor.t"], NOW - 600))) == ["1", "2", "3"]
+    # The re-read starts before the commit-lag cutoff of the first fetch
+    assert recorder.fetches[-1][0] <= NOW - 10
+
+
+def test_short_tail_is_served_from_cache(monkeypatch):
+    recorder = FakeRecorder([(NOW - 3600, "1")])
+    clock = [NOW]
+    monkeypatch.setattr(history_cache_module, "fetch_history_range", recorder.fetch_history_range)
+    monkeypatch.setattr(history_cache_module.time, "time", lambda: clock[0])
+    cache = HistoryCache(max_bytes=1 << 20, min_refresh=5.0, commit_lag=10.0)
+
+    asyncio.run(cache.get(["sensor.t"], NOW - 600))
+    clock[0] = NOW + 2
+    asyncio.run(cache.get(["sensor.t"], NOW - 600))
+    assert len(recorder.fetches) == 1
+    assert cache.hits == 1
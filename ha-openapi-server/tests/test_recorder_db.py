@@ -0,0 +1,214 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.recorder_db import RecorderDatabase, _roll_up
+
+# Recorder schema (HA 2023.4+), trimmed to the columns and indexes the backend reads
+SCHEMA = """
+CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id VARCHAR(255));
+CREATE UNIQUE INDEX ix_states_meta_entity_id ON states_meta (entity_id);
+CREATE TABLE state_attributes (attributes_id INTEGER PRIMARY KEY, hash BIGINT, shared_attrs TEXT);
+CREATE TABLE states (
+    state_id INTEGER PRIMARY KEY,
+    entity_id CHAR(0),
+    state VARCHAR(255),
+    attributes CHAR(0),
+    event_id SMALLINT,
+    last_changed CHAR(0),
+    last_changed_ts FLOAT,
+    last_reported_ts FLOAT,
+    last_updated CHAR(0),
+    last_updated_ts FLOAT,
+    old_state_id INTEGER REFERENCES states (state_id),
+    attributes_id INTEGER REFERENCES state_attributes (attributes_id),
+    origin_idx SMALLINT,
+    metadata_id INTEGER REFERENCES states_meta (metadata_id)
+);
+CREATE INDEX ix_states_metadata_id_last_updated_ts ON states (metadata_id, last_updated_ts);
+CREATE TABLE statistics_meta (
+    id INTEGER PRIMARY KEY,
+    statistic_id VARCHAR(255),
+    source VARCHAR(32),
+    unit_of_measurement VARCHAR(255),
+    has_mean BOOLEAN,
+    has_sum BOOLEAN,
+    name VARCHAR(255)
+);
+CREATE UNIQUE INDEX ix_statistics_meta_statistic_id ON statistics_meta (statistic_id);
+CREATE TABLE statistics (
+    id INTEGER PRIMARY KEY,
+    created_ts FLOAT,
+    metadata_id INTEGER REFERENCES statistics_meta (id) ON DELETE CASCADE,
+    start_ts FLOAT,
+    mean FLOAT,
+    min FLOAT,
+    max FLOAT,
+    last_reset_ts FLOAT,
+    state FLOAT,
+    sum FLOAT
+);
+CREATE UNIQUE INDEX ix_statistics_statistic_id_start_ts ON statistics (metadata_id, start_ts);
+CREATE TABLE statistics_short_term (
+    id INTEGER PRIMARY KEY,
+    created_ts FLOAT,
+    metadata_id INTEGER REFERENCES statistics_meta (id) ON DELETE CASCADE,
+    start_ts FLOAT,
+    mean FLOAT,
+    min FLOAT,
+    max FLOAT,
+    last_reset_ts FLOAT,
+    state FLOAT,
+    sum FLOAT
+);
+CREATE UNIQUE INDEX ix_statistics_short_term_statistic_id_start_ts ON statistics_short_term (metadata_id, start_ts);
+"""
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()  # a Monday
+
+
+def _ts(iso: str) -> float:
+    return datetime.fromisoformat(iso).timestamp()
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "home-assistant_v2.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO states_meta VALUES (1, 'light.kitchen'), (2, 'sensor.other')")
+    conn.executemany("INSERT INTO state_attributes VALUES (?, 0, ?)", [
+        (1, json.dumps({"friendly_name": "Kitchen", "brightness": 10})),
+        (2, json.dumps({"friendly_name": "Kitchen", "brightness": 200})),
+    ])
+    # (state, last_updated_ts, last_changed_ts, attributes_id); last_changed_ts is NULL when equal to last_updated_ts
+    rows = [
+        ("off", T0 - 600, None, 1),
+        ("on", T0 + 60, None, 1),
+        ("on", T0 + 120, T0 + 60, 2),  # attribute-only update
+        ("off", T0 + 180, None, 1),
+        ("on", T0 + 3600, None, 1),  # after the queried window
+    ]
+    conn.executemany(
+        "INSERT INTO states (state, last_updated_ts, last_changed_ts, attributes_id, metadata_id) VALUES (?, ?, ?, ?, 1)",
+        rows,
+    )
+    conn.execute("INSERT INTO states (state, last_updated_ts, metadata_id) VALUES ('5', ?, 2)", (T0 + 30,))
+
+    conn.execute("INSERT INTO statistics_meta VALUES (1, 'sensor.energy', 'recorder', 'kWh', 0, 1, 'Energy')")
+    conn.execute("INSERT INTO statistics_meta VALUES (2, 'sensor.temp', 'recorder', '°C', 1, 0, NULL)")
+    for hour in range(-1, 24 * 40):
+        start = T0 + hour * 3600
+        conn.execute(
+            "INSERT INTO statistics (metadata_id, start_ts, state, sum) VALUES (1, ?, ?, ?)",
+            (start, 100 + hour, 10.0 + hour * 0.5),
+        )
+        conn.execute(
+            "INSERT INTO statistics (metadata_id, start_ts, mean, min, max) VALUES (2, ?, ?, ?, ?)",
+            (start, 20.0 + hour % 2, 19.0, 22.0 + hour % 2),
+        )
+    conn.execute(
+        "INSERT INTO statistics_short_term (metadata_id, start_ts, mean, min, max) VALUES (2, ?, 21.5, 21.0, 22.0)",
+        (T0,),
+    )
+    conn.commit()
+    conn.close()
+    return RecorderDatabase(path)
+
+
+def test_history_starts_with_state_at_window_start(db):
+    [states] = db._history(db.connect(), ["light.kitchen"], T0, T0 + 600, False, False)
+    assert [s["state"] for s in states] == ["off", "on", "on", "off"]
+    first = states[0]
+    assert _ts(first["last_changed"]) == T0 and _ts(first["last_updated"]) == T0
+    assert first["entity_id"] == "light.kitchen"
+    assert first["attributes"]["brightness"] == 10
+    # Attribute-only update keeps its last_changed and carries the new attributes
+    assert _ts(states[2]["last_changed"]) == T0 + 60
+    assert _ts(states[2]["last_updated"]) == T0 + 120
+    assert states[2]["attributes"]["brightness"] == 200
+
+
+def test_history_minimal_response(db):
+    [states] = db._history(db.connect(), ["light.kitchen"], T0, T0 + 600, True, False)
+    assert states[0]["attributes"]["friendly_name"] == "Kitchen"
+    # The attribute-only update is left out, as HA's /history/period does
+    assert states[1:] == [
+        {"state": "on", "last_changed": states[1]["last_changed"]},
+        {"state": "off", "last_changed": states[2]["last_changed"]},
+    ]
+    assert [_ts(s["last_changed"]) for s in states[1:]] == [T0 + 60, T0 + 180]
+
+
+def test_history_minimal_response_matches_significant_changes(db):
+    conn = db.connect()
+    minimal = db._history(conn, ["light.kitchen"], T0, T0 + 600, True, False)
+    significant = db._history(conn, ["light.kitchen"], T0, T0 + 600, False, True)
+    assert [s["state"] for s in minimal[0]] == [s["state"] for s in significant[0]]
+
+
+def test_history_significant_changes_only(db):
+    [states] = db._history(db.connect(), ["light.kitchen"], T0, T0 + 600, False, True)
+    assert [(s["state"], _ts(s["last_updated"])) for s in states] == [
+        ("off", T0), ("on", T0 + 60), ("off", T0 + 180),
+    ]
+
+
+def test_history_keeps_requested_entity_order(db):
+    result = db._history(db.connect(), ["sensor.other", "light.kitchen", "sensor.missing"], T0, T0 + 600, True, False)
+    assert [states[0]["entity_id"] for states in result] == ["sensor.other", "light.kitchen"]
+
+
+def test_statistics_change_from_previous_sum(db):
+    stats = db._statistics(db.connect(), ["sensor.energy", "sensor.temp"], T0, T0 + 3 * 3600, "hour")
+    energy = stats["sensor.energy"]
+    assert energy["name"] == "Energy" and energy["unit_of_measurement"] == "kWh"
+    # The first hour's change comes from the row before the window
+    assert [r["change"] for r in energy["rows"]] == [0.5, 0.5, 0.5]
+    assert [r["sum"] for r in energy["rows"]] == [10.0, 10.5, 11.0]
+    assert [r["change"] for r in stats["sensor.temp"]["rows"]] == [None, None, None]
+
+
+def test_statistics_short_term(db):
+    stats = db._statistics(db.connect(), ["sensor.temp"], T0, T0 + 3600, "5minute")
+    assert stats["sensor.temp"]["rows"] == [
+        {"start": T0, "mean": 21.5, "min": 21.0, "max": 22.0, "state": None, "sum": None, "change": None},
+    ]
+
+
+def test_statistics_day_roll_up(db):
+    rows = db._statistics(db.connect(), ["sensor.energy", "sensor.temp"], T0, T0 + 2 * 86400, "day")
+    energy, temp = rows["sensor.energy"]["rows"], rows["sensor.temp"]["rows"]
+    assert [r["start"] for r in energy] == [T0, T0 + 86400]
+    assert [r["change"] for r in energy] == [12.0, 12.0]
+    assert energy[0]["sum"] == 10.0 + 23 * 0.5 and energy[0]["state"] == 123
+    assert temp[0]["mean"] == 20.5 and temp[0]["min"] == 19.0 and temp[0]["max"] == 23.0
+
+
+def test_statistics_week_and_month_roll_up(db):
+    conn = db.connect()
+    weeks = db._statistics(conn, ["sensor.energy"], T0, T0 + 14 * 86400, "week")["sensor.energy"]["rows"]
+    assert [r["start"] for r in weeks] == [T0, T0 + 7 * 86400]
+    assert [r["change"] for r in weeks] == [84.0, 84.0]
+
+    months = db._statistics(conn, ["sensor.energy"], T0, T0 + 40 * 86400, "month")["sensor.energy"]["rows"]
+    assert [r["start"] for r in months] == [T0, datetime(2024, 2, 1, tzinfo=timezone.utc).timestamp()]
+    assert [r["change"] for r in months] == [31 * 12.0, 9 * 12.0]
+
+
+def test_roll_up_week_starts_on_monday():
+    wednesday = T0 + 2 * 86400 + 5 * 3600
+    rows = [{"start": wednesday, "mean": 1.0, "min": 1.0, "max": 1.0, "state": None, "sum": None, "change": None}]
+    assert _roll_up(rows, "week")[0]["start"] == T0
+
+
+def test_legacy_schema_is_rejected(tmp_path):
+    path = tmp_path / "home-assistant_v2.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE states (state_id INTEGER PRIMARY KEY, entity_id VARCHAR(255), state VARCHAR(255), last_updated DATETIME)")
+    conn.commit()
+    conn.close()
+    with pytest.raises(RuntimeError, match="legacy schema"):
+        RecorderDatabase(path).connect()
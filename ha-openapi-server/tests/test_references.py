@@ -0,0 +1,24 @@
+from app.core.references import extract_references
+
+
+def test_entity_keys_accept_any_domain():
+    refs = extract_references({
+        "trigger": [{"platform": "state", "entity_id": "geo_location.quake_1"}],
+        "action": [
+            {"service": "light.turn_on", "target": {"entity_id": "my_integration.pump, light.hall"}},
+            {"type": "entities", "entities": ["custom_thing.a", {"entity": "other_domain.b"}]},
+        ],
+    })
+    assert set(refs) == {"geo_location.quake_1", "my_integration.pump", "light.hall", "custom_thing.a", "other_domain.b"}
+    assert refs["my_integration.pump"] == ["action[0].target.entity_id"]
+
+
+def test_free_text_only_matches_known_domains():
+    refs = extract_references({
+        "alias": "version.2 of sensor.outdoor",
+        "message": "{{ states('sensor.outdoor') }} at file.txt",
+        "value_template": "{{ is_state('light.hall', 'on') }}",
+        "name": "light.porch",
+        "service": "light.turn_off",
+    })
+    assert set(refs) == {"sensor.outdoor", "light.hall", "light.porch"}
@@ -0,0 +1,88 @@
+from app.core.validation import _Checker
+
+TRIGGER = [{"platform": "state", "entity_id": "binary_sensor.door"}]
+ACTION = [{"service": "light.turn_on", "target": {"entity_id": "light.hall"}}]
+
+
+def _check(conditions=None, actions=None):
+    checker = _Checker()
+    checker.automation({"trigger": TRIGGER, "condition": conditions or [], "action": actions or ACTION})
+    return checker
+
+
+def _errors(checker):
+    return [(i["path"], i["message"]) for i in checker.issues if i["severity"] == "error"]
+
+
+def test_shorthand_logical_conditions():
+    checker = _check([
+        {"or": [
+            {"condition": "state", "entity_id": "sun.sun", "state": "below_horizon"},
+            {"not": [{"condition": "state", "entity_id": "person.a", "state": "home"}]},
+        ]},
+        {"and": ["{{ states('sensor.lux') | int < 10 }}"]},
+    ])
+    assert _errors(checker) == []
+    assert {"sun.sun", "person.a"} <= checker.entities
+
+
+def test_shorthand_condition_nested_errors_are_reported():
+    checker = _check([{"or": [{"condition": "state", "entity_id": "sun.sun"}]}])
+    assert _errors(checker) == [("condition[0].or[0]", "state condition requires state")]
+
+
+def test_ambiguous_condition_without_type():
+    checker = _check([{"entity_id": "sun.sun", "state": "on"}])
+    assert len(_errors(checker)) == 1
+
+
+def test_template_condition_shorthands():
+    checker = _check(
+        ["{{ is_state('sun.sun', 'above_horizon') }}", {"condition": "{{ now().hour > 6 }}"}],
+        ACTION + [{"condition": "{{ true }}"}, {"or": ["{{ false }}", "{{ true }}"]}],
+    )
+    assert _errors(checker) == []
+
+
+def test_plain_string_condition_is_rejected():
+    assert _errors(_check(["sun.sun"])) == [("condition[0]", "string conditions must be templates")]
+
+
+def test_comma_separated_entity_ids():
+    checker = _check(
+        [{"condition": "state", "entity_id": "light.a, light.b", "state": "on"}],
+        [{"service": "light.turn_off", "target": {"entity_id": "light.c,light.d"}}],
+    )
+    assert _errors(checker) == []
+    assert {"light.a", "light.b", "light.c", "light.d"} <= checker.entities
+
+
+def test_malformed_entity_id_in_list():
+    checker = _check([{"condition": "state", "entity_id": "light.a, Light B", "state": "on"}])
+    assert _errors(checker) == [("condition[0].entity_id", "malformed entity_id 'Light B'")]
+
+
+def test_automation_blueprint_instance():
+    checker = _Checker()
+    checker.automation({"alias": "Motion light", "use_blueprint": {
+        "path": "homeassistant/motion_light.yaml",
+        "input": {"motion_entity": "binary_sensor.hall", "light_target": {"entity_id": "light.hall"}},
+    }})
+    assert _errors(checker) == []
+
+    checker = _Checker()
+    checker.automation({"use_blueprint": {"input": []}})
+    assert _errors(checker) == [
+        ("use_blueprint.path", "use_blueprint requires a path"),
+        ("use_blueprint.input", "input must be a mapping"),
+    ]
+
+
+def test_script_blueprint_instance():
+    checker = _Checker()
+    checker.script({"alias": "Notify", "use_blueprint": {"path": "me/notify.yaml"}})
+    assert _errors(checker) == []
+
+    checker = _Checker()
+    checker.script({"use_blueprint": "me/notify.yaml"})
+    assert _errors(checker) == [("use_blueprint", "use_blueprint must be a mapping")]